@@ -1,3 +1,9 @@
-from .holdingsfetcher import HoldingsFetcher
+from .holdingsfetcher import HoldingsFetcher, FetchResult
+from .utils.holdings_cache import HoldingsCache
+from .utils.snapshot_archive import SnapshotArchive
+from .utils.holdings_diff import diff_holdings, HoldingChange
+from .utils.security_index import SecurityIndex, Posting
+from .utils.security_master import SecurityMaster
+from .models import HoldingsTable
 
-__all__ = ['HoldingsFetcher']
\ No newline at end of file
+__all__ = ['HoldingsFetcher', 'FetchResult', 'HoldingsCache', 'SnapshotArchive', 'diff_holdings', 'HoldingChange', 'SecurityIndex', 'Posting', 'SecurityMaster', 'HoldingsTable']
\ No newline at end of file
@@ -1,3 +1,3 @@
-from .exceptions import FundNotFoundException
+from .exceptions import FundNotFoundException, HoldingsFormatException
 
-__all__ = [FundNotFoundException]
\ No newline at end of file
+__all__ = ['FundNotFoundException', 'HoldingsFormatException']
\ No newline at end of file
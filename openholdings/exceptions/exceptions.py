@@ -10,4 +10,13 @@ class FundNotFoundException(Exception):
           the `/offline/download_ishares_funds_list.py` script to make openholdings
           aware of its existence.
     """
+    pass
+
+class HoldingsFormatException(ValueError):
+    """
+    Thrown when a provider's holdings data isn't in the format openholdings expects.
+
+    This usually means the provider has changed the layout of its holdings files or data.  Fetchers that have another
+    way of getting a fund's holdings (i.e. Vanguard's browser fallback) catch it to try that way instead.
+    """
     pass
\ No newline at end of file
@@ -1,7 +1,29 @@
+import asyncio
+import threading
+from io import BytesIO
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from ..utils.file_util import open_holdings_document, download_holdings_document_async
+from ..utils.holding_factory import copy_holding
+from ..models import HoldingsTable
+
+# Number of parsed holdings files remembered by content hash, so that downloading an unchanged file skips parsing
+PARSED_FILES_CACHE_SIZE = 32
+
+_parsed_files = OrderedDict()  # (fetcher type, lazy, holdings filter, content hash) -> parsed Holdings
+_parsed_files_lock = threading.Lock()
 
 class IFetcher(metaclass=ABCMeta):
-    """An interface that each fetcher must implement, containing a single fetch() method."""
+    """An interface that each fetcher must implement, containing a blocking fetch() method and its asyncio
+    counterpart, afetch()."""
+
+    lazy = False
+    """Whether to return lazy holding views, whose fields are converted from the raw row of the holdings file only
+    when they're first accessed.  Fetchers that don't support lazy views return fully parsed holdings regardless."""
+
+    holdings_filter = None
+    """An optional HoldingsFilter selecting which holdings to fetch.  Fetchers push its predicates down as far as
+    they can, i.e. skipping whole asset classes, or rows of the holdings file that are filtered out."""
 
     @abstractmethod
     def fetch(self, ticker):
@@ -10,4 +32,163 @@ class IFetcher(metaclass=ABCMeta):
         :param ticker: The ticker of a fund to retrieve holdings for.
         :returns: A list of Holdings (Equity, Bond, or Cash objects) that make up the ETF.
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    @classmethod
+    def probe_fund(cls, ticker):
+        """Checks whether the provider serves holdings for a fund, by requesting only the start of its holdings file.
+
+        Fetchers of the providers in the fund registry's PROBED_PROVIDERS, whose holdings files are found from the
+        ticker alone, override this method.  This default implementation is for providers whose holdings files can
+        only be found through their funds list, and always returns False.
+
+        :param ticker: The ticker of a fund that isn't in any provider's funds list.
+        :returns: True if the provider serves holdings for the fund.
+        """
+        return False
+
+    def fetch_iter(self, ticker):
+        """Fetch the holdings for a given ticker one at a time, as they're read from the provider's holdings file.
+
+        Fetchers that can parse their holdings file incrementally override this method so that holdings are yielded
+        while the file is still downloading and the full list is never held in memory.  This default implementation
+        yields from the list returned by fetch().
+
+        :param ticker: The ticker of a fund to retrieve holdings for.
+        :returns: A generator of Holdings (Equity, Bond, or Cash objects) that make up the ETF.
+        """
+        yield from self.fetch(ticker)
+
+    def fetch_table(self, ticker):
+        """Fetch the holdings for a given ticker into a columnar HoldingsTable.
+
+        Each holding is appended to the table's columns as soon as it's parsed, so no intermediate list of holdings is
+        built along the way.
+
+        :param ticker: The ticker of a fund to retrieve holdings for.
+        :returns: A HoldingsTable with one row per holding in the ETF.
+        """
+        return HoldingsTable.from_holdings(self.fetch_iter(ticker), ticker)
+
+    def download_and_parse(self, holdings_file_url):
+        """Downloads a holdings file and parses it with the fetcher's parse_holdings_file() method.
+
+        Parsed holdings are remembered by the hash of the file's contents, so if the file hasn't changed since it was
+        last parsed (i.e. it was served by the HTTP cache), it isn't parsed again.  Every call returns copies of the
+        remembered holdings, so callers never share holding objects.
+
+        :param holdings_file_url: The URL from which the holdings file can be downloaded.
+        :returns: A new list of the Holdings read from the file.
+        """
+        holdings_file, content_hash = open_holdings_document(holdings_file_url)
+        with holdings_file:
+            parsed_file_key = self.get_parsed_file_key(content_hash)
+            holdings = get_parsed_file(parsed_file_key)
+            if holdings is None:
+                holdings = list(self.parse_holdings_file(holdings_file))
+                put_parsed_file(parsed_file_key, holdings)
+        return [copy_holding(holding) for holding in holdings]
+
+    async def adownload_and_parse(self, holdings_file_url):
+        """Downloads and parses a holdings file like download_and_parse(), without blocking the event loop.
+
+        :param holdings_file_url: The URL from which the holdings file can be downloaded.
+        :returns: A new list of the Holdings read from the file.
+        """
+        holdings_file_contents, content_hash = await download_holdings_document_async(holdings_file_url)
+        parsed_file_key = self.get_parsed_file_key(content_hash)
+        holdings = get_parsed_file(parsed_file_key)
+        if holdings is None:
+            holdings_file = BytesIO(holdings_file_contents)
+            holdings = list(await self.parse_off_event_loop(self.parse_holdings_file, holdings_file))
+            put_parsed_file(parsed_file_key, holdings)
+        return [copy_holding(holding) for holding in holdings]
+
+    def get_parsed_file_key(self, content_hash):
+        # The same file parses into different holdings depending on the fetcher's settings
+        return (type(self).__name__, self.lazy, self.holdings_filter, content_hash)
+
+    def decode_rows(self, rows, compiled_schema):
+        """Decodes the rows of a holdings file with a compiled schema, into lazy views if the fetcher is lazy.
+
+        If the fetcher has a holdings filter, each row's type and weighting are checked against it first, and only
+        the rows it selects are decoded.
+
+        :param rows: An iterable of rows of the holdings file.
+        :param compiled_schema: The CompiledSchema of the file's format.
+        :returns: An iterator of Holdings.
+        """
+        decode = compiled_schema.view if self.lazy else compiled_schema.decode
+        if self.holdings_filter is None:
+            return map(decode, rows)
+        return iter(self.holdings_filter.select(rows, compiled_schema.get_holding_type, compiled_schema.get_weight,
+            decode))
+
+    def decode_table(self, rows, compiled_schema, ticker=None):
+        """Decodes the rows of a holdings file with a compiled schema straight into a HoldingsTable.
+
+        Without a holdings filter, each row is written into the table's columns as it's read, without creating a
+        Holding.  Since a filter may reorder the rows it selects, filtered rows are decoded with decode_rows() instead.
+
+        :param rows: An iterable of rows of the holdings file.
+        :param compiled_schema: The CompiledSchema of the file's format, or None if the format wasn't recognized.
+        :param ticker: The ticker of the fund whose holdings the file contains.
+        :returns: A HoldingsTable with one row per decoded holding.
+        """
+        if compiled_schema is None:
+            return HoldingsTable(ticker)
+        if self.holdings_filter is not None:
+            return HoldingsTable.from_holdings(self.decode_rows(rows, compiled_schema), ticker)
+        table = HoldingsTable(ticker)
+        decode_into = compiled_schema.decode_into
+        for row in rows:
+            decode_into(table, row)
+        return table
+
+    def filter_holdings(self, holdings):
+        """Selects the parsed holdings that pass the fetcher's holdings filter, if it has one.
+
+        :param holdings: An iterable of Holdings.
+        :returns: A list of the selected Holdings.
+        """
+        if self.holdings_filter is None:
+            return list(holdings)
+        return self.holdings_filter.apply(holdings)
+
+    async def afetch(self, ticker):
+        """Asynchronously fetch a list of holdings for a given ticker.
+
+        Fetchers that download a holdings file override this method to download it without blocking the event loop.
+        This default implementation is a fallback for fetchers that can't, and runs fetch() in the event loop's
+        default executor instead.
+
+        :param ticker: The ticker of a fund to retrieve holdings for.
+        :returns: A list of Holdings (Equity, Bond, or Cash objects) that make up the ETF.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.fetch, ticker)
+
+    async def parse_off_event_loop(self, parse_function, *args):
+        """Runs a CPU-bound parsing function in the event loop's default executor so it doesn't stall other tasks.
+
+        :param parse_function: The function to run, i.e. a fetcher's parse_holdings_file() method.
+        :param args: Positional arguments to pass to the function.
+        :returns: The function's return value.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, parse_function, *args)
+
+def get_parsed_file(parsed_file_key):
+    """Returns the remembered holdings parsed from a holdings file, or None if it hasn't been parsed recently."""
+    with _parsed_files_lock:
+        holdings = _parsed_files.get(parsed_file_key)
+        if holdings is not None:
+            _parsed_files.move_to_end(parsed_file_key)
+        return holdings
+
+def put_parsed_file(parsed_file_key, holdings):
+    """Remembers the holdings parsed from a holdings file, forgetting the least recently used file if there are too
+    many.  The holdings are kept as they are and only copies of them are handed out."""
+    with _parsed_files_lock:
+        _parsed_files[parsed_file_key] = holdings
+        _parsed_files.move_to_end(parsed_file_key)
+        if len(_parsed_files) > PARSED_FILES_CACHE_SIZE:
+            _parsed_files.popitem(last=False)
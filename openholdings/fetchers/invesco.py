@@ -1,41 +1,86 @@
 import csv
+from io import TextIOWrapper
+import requests
 from .fetcher import IFetcher
-from ..models import Holding
-from ..utils.regex_util import is_ticker_symbol
-from ..utils.file_util import download_holdings_file, delete_holdings_file
-from ..utils.string_conversion_util import (
-    convert_percentage_string_to_float, 
-    convert_comma_separated_integer_to_float, 
-    convert_dollars_string_to_float
-)
+from .schemas import SCHEMAS
+from ..utils.file_util import read_file_prefix, stream_holdings_file
+from ..utils.row_schema import detect_schema
+
+# Number of bytes of a holdings file requested to read its header when probing for a fund
+PROBE_SIZE = 4096
 
 class Invesco(IFetcher):
     """A fetcher implementation for Invesco funds."""
 
     def fetch(self, ticker):
-        # Download holdings CSV file
-        fund_holdings_csv_url = self.get_url_for_ticker(ticker)
-        downloaded_filename = download_holdings_file(fund_holdings_csv_url, 'csv', ticker)
-
-        # Parse holdings list from downloaded CSV
-        holdings = []
-        with open(downloaded_filename, mode='r', encoding='utf-8') as holdings_file:
-            reader = csv.DictReader(holdings_file)
-            for row in reader:
-                holding = Holding()
-                ticker = row['Holding Ticker'].split(' ')[0]
-                if is_ticker_symbol(ticker):
-                    holding.ticker = ticker
-                holding.name = row['Name']
-                holding.num_shares = convert_comma_separated_integer_to_float(row['Shares/Par Value'])
-                holding.asset_class = 'Equity' if 'cash' not in holding.name.lower() else 'Cash'
-                holding.market_value_usd = convert_dollars_string_to_float(row['MarketValue'])
-                holding.percent_weighting = convert_percentage_string_to_float(row['Weight'])
-                holdings.append(holding)
-
-        # Delete holdings file after reading
-        delete_holdings_file(downloaded_filename)
-        return holdings
+        return self.download_and_parse(self.get_url_for_ticker(ticker))
+
+    async def afetch(self, ticker):
+        return await self.adownload_and_parse(self.get_url_for_ticker(ticker))
+
+    def fetch_iter(self, ticker):
+        with stream_holdings_file(self.get_url_for_ticker(ticker)) as holdings_stream:
+            yield from self.iter_holdings_from_file(holdings_stream)
+
+    def fetch_table(self, ticker):
+        with stream_holdings_file(self.get_url_for_ticker(ticker)) as holdings_stream:
+            return self.read_table_from_file(holdings_stream, ticker)
+
+    def parse_holdings_file(self, holdings_file):
+        """Read holdings from an Invesco holdings CSV file.
+
+        :param holdings_file: A binary file object containing the holdings CSV.
+        :returns: A list of Holdings read from the file.
+        """
+        return list(self.iter_holdings_from_file(holdings_file))
+
+    def iter_holdings_from_file(self, holdings_file):
+        """Read holdings from an Invesco holdings CSV file one row at a time.
+
+        :param holdings_file: A binary file object containing the holdings CSV.
+        :returns: A generator of Holdings read from the file.
+        """
+        rows, compiled_schema = self.read_rows(holdings_file)
+        if compiled_schema is not None:
+            yield from self.decode_rows(rows, compiled_schema)
+
+    def read_table_from_file(self, holdings_file, ticker=None):
+        """Read an Invesco holdings CSV file straight into a HoldingsTable, without creating a Holding per row.
+
+        :param holdings_file: A binary file object containing the holdings CSV.
+        :param ticker: The ticker of the fund whose holdings the file contains.
+        :returns: A HoldingsTable with one row per holding read from the file.
+        """
+        return self.decode_table(*self.read_rows(holdings_file), ticker)
+
+    def read_rows(self, holdings_file):
+        """Starts reading the rows of an Invesco holdings CSV file.
+
+        :param holdings_file: A binary file object containing the holdings CSV.
+        :returns: A tuple of (an iterator of the file's rows, the CompiledSchema of its format), with a schema of None
+            if the file is empty or its format isn't recognized.
+        """
+        reader = csv.reader(TextIOWrapper(holdings_file, encoding='utf-8', newline=''))
+        header = next(reader, None)
+        if header is None:
+            return reader, None
+        schema = detect_schema(SCHEMAS['invesco'], header=header)
+        if schema is None:
+            return reader, None
+
+        rows = (row for row in reader if row)  # Skip blank lines
+        return rows, schema.compile(header)
+
+    @classmethod
+    def probe_fund(cls, ticker):
+        """Checks whether the fund's holdings file begins with the header of an Invesco holdings CSV."""
+        try:
+            prefix = read_file_prefix(cls().get_url_for_ticker(ticker), PROBE_SIZE)
+        except requests.RequestException:
+            return False
+        header_lines = prefix.decode('utf-8', errors='replace').splitlines()
+        header = next(csv.reader(header_lines[:1]), None)
+        return header is not None and detect_schema(SCHEMAS['invesco'], header=header) is not None
 
     def get_url_for_ticker(self, ticker):
         u = 'https://www.invesco.com/us/financial-products/etfs/holdings/main/holdings/0?audienceType=Investor&action=download&ticker={}'
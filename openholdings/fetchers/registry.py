@@ -0,0 +1,255 @@
+"""
+The fund registry knows which fetcher is responsible for each fund ticker.
+
+Each ETF provider has a funds list CSV file in the `offline` folder containing ticker-URL pairs, and the
+`offline/build_funds_catalog.py` script compiles all of them into a single `funds_catalog.json` file.  The first
+time a ticker is looked up, the compiled catalog (or, if it hasn't been built, every provider's funds list) is read
+into a single in-memory index of ticker -> FundRecord.  The index is built at most once per process, after which
+every lookup is a single dictionary access.
+
+The catalog records a checksum of each funds list it was compiled from.  If a funds list was modified after the
+catalog was written and its checksum no longer matches (i.e. it was edited by hand without rebuilding the catalog),
+the catalog is out of date, so the funds lists are read instead and a warning is issued.
+
+Some providers' funds lists only cover a few funds, but their holdings files are found from the ticker alone.  A
+ticker missing from every funds list is looked for by probing those providers (PROBED_PROVIDERS, see
+IFetcher.probe_fund()), and the fund found is added to the index, so each unknown ticker is probed at most once per
+process.  Probing makes network requests, so it's done by lookup_fund() (or, from an event loop, by
+alookup_fund() in the loop's default executor) but never by a plain get_fund_index() lookup.
+"""
+
+import os
+import csv
+import asyncio
+import json
+import threading
+import warnings
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from os.path import abspath
+from ..exceptions import FundNotFoundException
+
+FundRecord = namedtuple('FundRecord', ['ticker', 'provider', 'url'])
+"""A single fund known to openholdings: its ticker, the name of its provider, and the URL of its details page (None
+for funds found by probing their provider)."""
+
+# Provider name -> (funds list CSV file, fetcher module, fetcher class name).  When the same ticker appears in
+# more than one funds list, the provider listed first takes precedence.  The offline catalog writer uses the same order.
+PROVIDERS = {
+    'ishares': ('ishares_funds.csv', '.ishares', 'IShares'),
+    'etfmg': ('etfmg_funds.csv', '.etfmg', 'Etfmg'),
+    'invesco': ('invesco_funds.csv', '.invesco', 'Invesco'),
+    'spdr': ('spdr_funds.csv', '.spdr', 'Spdr'),
+    'vaneck': ('vaneck_funds.csv', '.vaneck', 'VanEck'),
+    'vanguard': ('vanguard_funds.csv', '.vanguard', 'Vanguard'),
+}
+
+# Providers whose holdings files are found from the ticker alone, so their fetchers can probe for funds missing from
+# every funds list.  Only these providers' fetcher modules are imported to look for a fund.
+PROBED_PROVIDERS = ('invesco', 'spdr', 'vaneck', 'vanguard')
+
+CATALOG_FILE_NAME = 'funds_catalog.json'
+CATALOG_FORMAT = 2
+
+_fund_index = None
+_catalog_revisions = {}
+_unknown_tickers = set()  # Tickers no provider was found to serve when probed
+_fund_index_lock = threading.Lock()
+
+def get_funds_list_path(csv_file_name):
+    current_directory = os.path.dirname(os.path.realpath(__file__))
+    return abspath(os.path.join(current_directory, '..', 'offline', csv_file_name))
+
+def get_funds_list_checksum(csv_file_path):
+    """Returns the CRC-32 of a funds list file's contents, or None if the file doesn't exist."""
+    try:
+        with open(csv_file_path, mode='rb') as funds_file:
+            return zlib.crc32(funds_file.read())
+    except FileNotFoundError:
+        return None
+
+def read_catalog(catalog_file_path):
+    with open(catalog_file_path, mode='r', encoding='utf-8') as catalog_file:
+        return json.load(catalog_file)
+
+def is_catalog_stale(catalog, catalog_file_path):
+    """Checks whether any provider's funds list has changed since the compiled catalog was written.
+
+    Only funds lists modified after the catalog are checksummed, so an up to date catalog is verified with a stat()
+    of each file.
+
+    :param catalog: The contents of the `funds_catalog.json` file.
+    :param catalog_file_path: The path to the `funds_catalog.json` file.
+    :returns: True if the catalog doesn't reflect the current funds lists.
+    """
+    if catalog.get('format') != CATALOG_FORMAT or catalog['providers'] != list(PROVIDERS):
+        return True
+    catalog_modified_time = os.stat(catalog_file_path).st_mtime_ns
+    checksums = catalog['checksums']
+    for provider, (csv_file_name, _, _) in PROVIDERS.items():
+        funds_csv_file_path = get_funds_list_path(csv_file_name)
+        try:
+            modified_time = os.stat(funds_csv_file_path).st_mtime_ns
+        except FileNotFoundError:
+            modified_time = None
+        if modified_time is None:
+            if checksums.get(provider) is not None:
+                return True
+        elif modified_time > catalog_modified_time \
+                and get_funds_list_checksum(funds_csv_file_path) != checksums.get(provider):
+            return True
+    return False
+
+def build_fund_index_from_catalog(catalog):
+    """Reads the compiled funds catalog into a dictionary of ticker -> FundRecord.
+
+    :param catalog: The contents of the `funds_catalog.json` file.
+    :returns: A (fund index, provider revisions) tuple.
+    """
+    providers = catalog['providers']
+    fund_index = {}
+    for ticker, provider_id, url in zip(catalog['tickers'], catalog['provider_ids'], catalog['urls']):
+        fund_index[ticker] = FundRecord(ticker, providers[provider_id], url)
+    return fund_index, catalog['revisions']
+
+def build_fund_index_from_csv_files():
+    """Reads every provider's funds list CSV file into a dictionary of ticker -> FundRecord.
+
+    :returns: A dictionary mapping each known (upper-cased) fund ticker to its FundRecord.
+    """
+    fund_index = {}
+    for provider, (csv_file_name, _, _) in PROVIDERS.items():
+        funds_csv_file_path = get_funds_list_path(csv_file_name)
+        if not os.path.exists(funds_csv_file_path):
+            continue
+        with open(funds_csv_file_path, mode='r', encoding='utf-8') as funds_file:
+            reader = csv.reader(funds_file)
+            next(reader, None)  # Skip 'Ticker', 'URL' header row
+            for fund in reader:
+                if not fund:
+                    continue
+                ticker = fund[0].upper()
+                if ticker not in fund_index:
+                    fund_index[ticker] = FundRecord(ticker, provider, fund[1])
+    return fund_index
+
+def build_fund_index():
+    """Builds the ticker -> FundRecord index, preferring the compiled catalog over the individual funds lists.
+
+    :returns: A (fund index, provider revisions) tuple.  Revisions are only available from an up to date catalog.
+    """
+    catalog_file_path = get_funds_list_path(CATALOG_FILE_NAME)
+    if os.path.exists(catalog_file_path):
+        catalog = read_catalog(catalog_file_path)
+        if not is_catalog_stale(catalog, catalog_file_path):
+            return build_fund_index_from_catalog(catalog)
+        warnings.warn('{} is out of date with the funds lists, so they are read instead.  Run '
+            'offline/build_funds_catalog.py to rebuild it.'.format(CATALOG_FILE_NAME))
+    return build_fund_index_from_csv_files(), {}
+
+def get_fund_index():
+    """Returns the ticker -> FundRecord index, building it on first use.
+
+    :returns: A dictionary mapping each known fund ticker to its FundRecord.
+    """
+    global _fund_index, _catalog_revisions
+    if _fund_index is None:
+        with _fund_index_lock:
+            if _fund_index is None:
+                _fund_index, _catalog_revisions = build_fund_index()
+    return _fund_index
+
+def get_provider_revision(provider):
+    """Returns the catalog revision of a provider's funds list.
+
+    The revision only changes when a catalog refresh adds, removes, renames, or moves one of the provider's funds,
+    so it can be used to key caches that should survive refreshes of other providers' funds lists.
+
+    :param provider: The name of a provider, as found in a FundRecord.
+    :returns: An integer revision number, or 0 if the compiled catalog isn't available or is out of date.
+    """
+    get_fund_index()
+    return _catalog_revisions.get(provider, 0)
+
+def reload_fund_index():
+    """Discards the in-memory index so that it's rebuilt from the funds lists on the next lookup.
+
+    This is only needed if the funds catalog is refreshed while the process is running.
+    """
+    global _fund_index
+    with _fund_index_lock:
+        _fund_index = None
+        _unknown_tickers.clear()
+
+def lookup_fund(ticker, discover=True):
+    """Finds the record of a fund known to openholdings.
+
+    :param ticker: The ticker of the fund to look up (case-insensitive).
+    :param discover: Whether to probe providers for a ticker that isn't in any funds list.  See discover_fund().
+    :returns: The FundRecord for the given ticker.
+    :raises FundNotFoundException: If the ticker doesn't appear in any provider's funds list, and (if discover is
+        True) no provider serves holdings for it.
+    """
+    fund_record = get_fund_index().get(ticker.upper())
+    if fund_record is None and discover:
+        fund_record = discover_fund(ticker)
+    if fund_record is None:
+        raise FundNotFoundException(ticker)
+    return fund_record
+
+async def alookup_fund(ticker):
+    """Finds the record of a fund known to openholdings from within an asyncio event loop.  See lookup_fund().
+
+    A ticker that isn't in any funds list is probed for in the event loop's default executor, so the probes' requests
+    don't block the loop.
+
+    :param ticker: The ticker of the fund to look up (case-insensitive).
+    :returns: The FundRecord for the given ticker.
+    :raises FundNotFoundException: If no provider lists or serves holdings for the ticker.
+    """
+    fund_record = get_fund_index().get(ticker.upper())
+    if fund_record is None:
+        fund_record = await asyncio.get_running_loop().run_in_executor(None, discover_fund, ticker)
+    if fund_record is None:
+        raise FundNotFoundException(ticker)
+    return fund_record
+
+def discover_fund(ticker):
+    """Looks for a fund that isn't in any funds list by probing every provider in PROBED_PROVIDERS.
+
+    Providers are probed concurrently, and if more than one serves the fund, the one with the highest precedence is
+    chosen.  The fund is added to the index so later lookups find it directly, and tickers no provider serves are
+    remembered so they aren't probed again.
+
+    :param ticker: The ticker of the fund (case-insensitive).
+    :returns: The fund's new FundRecord, or None if no provider serves holdings for it.
+    """
+    ticker = ticker.upper()
+    fund_index = get_fund_index()
+    if ticker in fund_index:
+        return fund_index[ticker]
+    if ticker in _unknown_tickers:
+        return None
+    providers = [provider for provider in PROVIDERS if provider in PROBED_PROVIDERS]  # In order of precedence
+    with ThreadPoolExecutor(max_workers=len(providers)) as executor:
+        probes = {provider: executor.submit(get_fetcher_class(provider).probe_fund, ticker) for provider in providers}
+        provider = next((provider for provider, probe in probes.items() if probe.result()), None)
+    with _fund_index_lock:
+        if provider is None:
+            _unknown_tickers.add(ticker)
+            return None
+        return fund_index.setdefault(ticker, FundRecord(ticker, provider, None))
+
+def get_fetcher_class(provider):
+    """Returns the IFetcher implementation for a provider.
+
+    Fetcher modules are imported on demand so that looking up a fund doesn't require every provider's
+    dependencies (i.e. Selenium for Vanguard) to be importable.
+
+    :param provider: The name of a provider, as found in a FundRecord.
+    :returns: The fetcher class responsible for the provider's funds.
+    """
+    _, module_name, class_name = PROVIDERS[provider]
+    return getattr(import_module(module_name, __package__), class_name)
@@ -0,0 +1,230 @@
+"""
+The row formats of each provider's holdings files, described as RowSchemas.
+
+SCHEMAS maps each provider to the formats its files come in, in the order they're checked.  Supporting a new
+format means adding a RowSchema here rather than writing a new parsing method.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from ..models import Equity, Bond, Future, Cash
+from ..utils.row_schema import Field, RowSchema, convert_date_string, date_converter, memoized_converter, valid_or_none
+from ..utils.regex_util import is_percentage, is_number
+from ..utils.validation import is_ticker_symbol, is_valid_cusip, is_valid_sedol, is_valid_isin, normalize_ticker
+from ..utils.string_conversion_util import (
+    convert_percentage_string_to_float,
+    convert_comma_separated_integer_to_float,
+    convert_dollars_string_to_float
+)
+
+convert_percentage = memoized_converter(convert_percentage_string_to_float)
+convert_comma_separated_number = memoized_converter(convert_comma_separated_integer_to_float)
+convert_dollars = memoized_converter(convert_dollars_string_to_float)
+
+def none_if_dash(value):
+    return value if value != '-' else None
+
+def constant(value):
+    return lambda: value
+
+# iShares
+
+ISHARES_CASH_ASSET_CLASSES = frozenset(['Money Market', 'Cash', 'Cash Collateral and Margins'])
+
+def convert_ishares_percentage(cell):
+    return round(cell['raw'] / 100, 4)
+
+def convert_ishares_raw_value(cell):
+    return cell['raw']
+
+def convert_ishares_raw_float(cell):
+    return float(cell['raw'])
+
+def convert_ishares_date(cell):
+    return convert_date_string(cell['display'], '%b %d, %Y')
+
+@lru_cache(maxsize=4096)
+def parse_future_expiration_date_from_description(description):
+    """Parses the expiration month of a futures contract from the end of its name, i.e. 'S&P500 EMINI MAR 21'.
+
+    :returns: The expiration month as a datetime, or None if the name doesn't end with one.
+    """
+    date_suffix = ' '.join(description.split(' ')[-2:])
+    try:
+        return datetime.strptime(date_suffix, '%b %y')
+    except ValueError:
+        return None
+
+def get_ishares_stock_holding_type(asset_class):
+    if asset_class in ISHARES_CASH_ASSET_CLASSES:
+        return Cash
+    elif asset_class == 'Futures':
+        return Future
+    return Equity
+
+def get_ishares_bond_holding_type(maturity_cell):
+    # Only bonds have a maturity date
+    return Bond if maturity_cell['display'] != '-' else Cash
+
+def get_ishares_commodities_holding_type(asset_class, maturity_cell):
+    if maturity_cell['display'] == '-':
+        return Cash
+    elif asset_class == 'Futures':
+        return Future
+    return Bond
+
+def ishares_common_fields(name_index, identifiers_index, weighting_index):
+    """The fields every holding type has, which are laid out the same way in each iShares format: the CUSIP, ISIN,
+    and SEDOL are consecutive, as are the percent weighting and market value."""
+    return [
+        Field('name', name_index, None),
+        Field('identifier_cusip', identifiers_index, valid_or_none(is_valid_cusip)),
+        Field('identifier_isin', identifiers_index + 1, valid_or_none(is_valid_isin)),
+        Field('identifier_sedol', identifiers_index + 2, valid_or_none(is_valid_sedol)),
+        Field('percent_weighting', weighting_index, convert_ishares_percentage),
+        Field('market_value', weighting_index + 1, convert_ishares_raw_value),
+    ]
+
+ISHARES_STOCK_SCHEMA = RowSchema('ishares-stock', row_length=18,
+    holding_type=Field('holding_type', 3, get_ishares_stock_holding_type),
+    fields=ishares_common_fields(name_index=1, identifiers_index=8, weighting_index=5) + [
+        Field('ticker', 0, valid_or_none(is_ticker_symbol)),
+        Field('num_shares', 7, convert_ishares_raw_float),
+        Field('sector', 2, none_if_dash),
+        Field('currency', (), constant('USD')),
+        Field('contract_code', 0, None),
+        Field('contract_expiry_date', 1, parse_future_expiration_date_from_description),
+        Field('quantity_held', 7, convert_ishares_raw_float),
+    ])
+
+ISHARES_BOND_SCHEMA = RowSchema('ishares-bond', row_length=27,
+    holding_type=Field('holding_type', 17, get_ishares_bond_holding_type),
+    fields=ishares_common_fields(name_index=0, identifiers_index=7, weighting_index=4) + [
+        Field('coupon_rate', 18, convert_ishares_percentage),
+        Field('effective_date', 25, date_converter('%b %d, %Y')),
+        Field('maturity_date', 17, convert_ishares_date),
+        Field('sector', 1, none_if_dash),
+        Field('currency', (), constant('USD')),
+    ])
+
+ISHARES_COMMODITIES_SCHEMA = RowSchema('ishares-commodities', row_length=26,
+    holding_type=Field('holding_type', (2, 17), get_ishares_commodities_holding_type),
+    fields=ishares_common_fields(name_index=0, identifiers_index=7, weighting_index=4) + [
+        Field('contract_expiry_date', 17, convert_ishares_date),
+        Field('effective_date', 24, date_converter('%b %d, %Y')),
+        Field('maturity_date', 17, convert_ishares_date),
+        Field('sector', 1, none_if_dash),
+        Field('currency', (), constant('USD')),
+    ])
+
+# ETFMG
+
+@lru_cache(maxsize=4096)
+def split_bond_description(description):
+    """ETFMG's bond ETFs list bond information (name, coupon rate, and maturity date) as a single field, i.e.
+    'HONEYWELL INTL INC 0.41138% 08/19/2022'.
+
+    :param description: A bond's description.
+    :returns: A (name, coupon rate, maturity date) tuple.
+    """
+    desc_parts = description.split(' ')
+    end_idx = 0
+    while end_idx < len(desc_parts) and not is_percentage(desc_parts[end_idx]):
+        end_idx += 1
+    name = ' '.join(desc_parts[:end_idx])
+    return name, convert_percentage(desc_parts[-2]), convert_date_string(desc_parts[-1], '%m/%d/%Y')
+
+def is_etfmg_bond_description(security_name):
+    # Bonds are recognized by the presence of a percent sign (coupon rate) in their description
+    return '%' in security_name
+
+def convert_etfmg_security_name(security_name):
+    return split_bond_description(security_name)[0] if is_etfmg_bond_description(security_name) else security_name
+
+def convert_etfmg_coupon_rate(security_name):
+    return split_bond_description(security_name)[1] if is_etfmg_bond_description(security_name) else None
+
+def convert_etfmg_maturity_date(security_name):
+    return split_bond_description(security_name)[2] if is_etfmg_bond_description(security_name) else None
+
+def convert_etfmg_sedol(cusip):
+    # Sometimes the value in the "CUSIP" field is actually a SEDOL identifier
+    return cusip if not is_valid_cusip(cusip) and is_valid_sedol(cusip) else None
+
+def convert_etfmg_ticker(ticker):
+    return normalize_ticker(ticker) if is_ticker_symbol(ticker) else None
+
+def convert_etfmg_bond_quantity(security_name, shares):
+    return float(shares) if is_etfmg_bond_description(security_name) else None
+
+def convert_etfmg_num_shares(security_name, shares):
+    return float(shares) if not is_etfmg_bond_description(security_name) else None
+
+def convert_etfmg_optional_number(value):
+    return convert_comma_separated_number(value) if is_number(value) else None
+
+def get_etfmg_stock_holding_type(cusip, security_name, ticker):
+    if cusip == 'Cash&Other':
+        return Cash
+    elif is_etfmg_bond_description(security_name) and not is_ticker_symbol(ticker):
+        return Bond
+    return Equity
+
+def get_etfmg_bond_holding_type(security_description):
+    return Cash if security_description == 'CASH AND OTHER REC PAY' else Equity
+
+ETFMG_STOCK_SCHEMA = RowSchema('etfmg-stock', required_columns=['StockTicker'],
+    holding_type=Field('holding_type', ('CUSIP', 'SecurityName', 'StockTicker'), get_etfmg_stock_holding_type),
+    fields=[
+        Field('name', 'SecurityName', convert_etfmg_security_name),
+        Field('coupon_rate', 'SecurityName', convert_etfmg_coupon_rate),
+        Field('maturity_date', 'SecurityName', convert_etfmg_maturity_date),
+        Field('identifier_cusip', 'CUSIP', valid_or_none(is_valid_cusip)),
+        Field('identifier_sedol', 'CUSIP', convert_etfmg_sedol),
+        Field('percent_weighting', 'Weightings', convert_percentage),
+        Field('market_value', 'MarketValue', convert_comma_separated_number),
+        Field('ticker', 'StockTicker', convert_etfmg_ticker),
+        Field('quantity_held', ('SecurityName', 'Shares'), convert_etfmg_bond_quantity),
+        Field('num_shares', ('SecurityName', 'Shares'), convert_etfmg_num_shares),
+        Field('currency', (), constant('USD')),
+    ])
+
+ETFMG_BOND_SCHEMA = RowSchema('etfmg-bond', required_columns=['Coupon Rate'],
+    holding_type=Field('holding_type', 'Security Description', get_etfmg_bond_holding_type),
+    fields=[
+        Field('name', 'Security Description', None),
+        Field('identifier_cusip', 'Security Cusip', valid_or_none(is_valid_cusip)),
+        Field('identifier_isin', 'Security ISIN', valid_or_none(is_valid_isin)),
+        Field('identifier_sedol', 'Security Sedol', valid_or_none(is_valid_sedol)),
+        Field('percent_weighting', '% of Net Assets', convert_percentage),
+        Field('market_value', 'Market Value Base', convert_etfmg_optional_number),
+        Field('ticker', 'Ticker Symbol', convert_etfmg_ticker),
+        Field('num_shares', 'Shares/Par', convert_etfmg_optional_number),
+        Field('currency', 'Trading Currency', None),
+    ])
+
+# Invesco
+
+def convert_invesco_ticker(holding_ticker):
+    ticker = holding_ticker.split(' ')[0]
+    return ticker if is_ticker_symbol(ticker) else None
+
+def get_invesco_holding_type(name):
+    return Cash if 'cash' in name.lower() else Equity
+
+INVESCO_SCHEMA = RowSchema('invesco', required_columns=['Holding Ticker'],
+    holding_type=Field('holding_type', 'Name', get_invesco_holding_type),
+    fields=[
+        Field('name', 'Name', None),
+        Field('ticker', 'Holding Ticker', convert_invesco_ticker),
+        Field('num_shares', 'Shares/Par Value', convert_comma_separated_number),
+        Field('market_value', 'MarketValue', convert_dollars),
+        Field('percent_weighting', 'Weight', convert_percentage),
+        Field('currency', (), constant('USD')),
+    ])
+
+SCHEMAS = {
+    'ishares': [ISHARES_STOCK_SCHEMA, ISHARES_BOND_SCHEMA, ISHARES_COMMODITIES_SCHEMA],
+    'etfmg': [ETFMG_STOCK_SCHEMA, ETFMG_BOND_SCHEMA],
+    'invesco': [INVESCO_SCHEMA],
+}
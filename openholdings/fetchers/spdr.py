@@ -1,27 +1,35 @@
-from openpyxl import load_workbook
+from contextlib import closing
 from .fetcher import IFetcher
-from ..models import Holding
+from ..models import Equity, Cash
 from ..utils.regex_util import is_ticker_symbol
-from ..utils.file_util import download_holdings_file, delete_holdings_file
+from ..utils.spreadsheet_util import iter_sheet_rows, get_cell_value, is_holdings_spreadsheet
 from ..utils.string_conversion_util import convert_percentage_string_to_float
 
 class Spdr(IFetcher):
     """A fetcher implementation for State Street SPDR funds."""
 
     def fetch(self, ticker):
-        # Download fund holdings spreadsheet file
-        fund_holdings_spreadsheet_url = self.get_url_for_ticker(ticker)
-        downloaded_filename = download_holdings_file(fund_holdings_spreadsheet_url, 'xlsx', ticker)
+        return self.download_and_parse(self.get_url_for_ticker(ticker))
 
-        # Parse holdings list from downloaded spreadsheet
-        wb = load_workbook(filename=downloaded_filename)
-        sheet = wb.active
-        holdings = self.parse_holdings_from_spreadsheet(sheet)
+    async def afetch(self, ticker):
+        return await self.adownload_and_parse(self.get_url_for_ticker(ticker))
 
-        # Delete holdings file after reading
-        wb.close()
-        delete_holdings_file(downloaded_filename)
-        return holdings
+    def parse_holdings_file(self, holdings_file):
+        """Read holdings from the active sheet of a holdings spreadsheet.
+
+        :param holdings_file: A binary file object containing the holdings spreadsheet.
+        :returns: A list of Holdings read from the spreadsheet.
+        """
+        with closing(iter_sheet_rows(holdings_file)) as rows:
+            if self.holdings_filter is None:
+                return list(self.iter_holdings_from_rows(rows))
+            # Rows are checked against the filter before their holdings are constructed
+            return self.holdings_filter.select(self.iter_table_rows(rows), self.get_row_holding_type,
+                self.get_row_weight, self.decode_row)
+
+    @classmethod
+    def probe_fund(cls, ticker):
+        return is_holdings_spreadsheet(cls().get_url_for_ticker(ticker))
 
     def get_url_for_ticker(self, ticker):
         u = 'https://www.ssga.com/us/en/institutional/etfs/library-content/products/fund-data/etfs/us/holdings-daily-us-en-{}.xlsx'
@@ -33,28 +41,55 @@ class Spdr(IFetcher):
         :param sheet: An openpyxl Worksheet to read holdings from.
         :returns: A list of Holdings read from the spreadsheet.
         """
-        holdings = []
+        return list(self.iter_holdings_from_rows(sheet.iter_rows(values_only=True)))
+
+    def iter_holdings_from_rows(self, rows):
+        """Read holdings from the rows of a holdings spreadsheet, stopping at the end of the holdings table.
+
+        :param rows: An iterable of tuples of the spreadsheet's cell values, i.e. from iter_sheet_rows().
+        :returns: A generator of Holdings read from the spreadsheet.
+        """
+        for row in self.iter_table_rows(rows):
+            yield self.decode_row(row, self.get_row_holding_type(row))
 
+    def iter_table_rows(self, rows):
+        """Yields the rows of the holdings table in a holdings spreadsheet, without reading their holdings.
+
+        :param rows: An iterable of tuples of the spreadsheet's cell values.
+        :returns: A generator of the rows that hold a holding.
+        """
         current_row_index = 0
-        for row in sheet.rows:
+        for row in rows:
             current_row_index += 1
             # Skip first 5 rows, table starts on row 6
             if current_row_index < 6:
                 continue
             # Once we've started reading the table, every row should start with the name of a holding.
             # Upon hitting a blank row, we know we've read through the entire table and can stop.
-            if row[0].value is None:
-                break
-
-            holding = Holding()
-            ticker = row[1].value.split(' ')[0]
-            if is_ticker_symbol(ticker):
-                holding.ticker = ticker
-            holding.name = row[0].value
-            if ticker != 'CASH_USD':
-                holding.num_shares = int(row[6].value[:-4])
-            holding.asset_class = 'Equity' if ticker != 'CASH_USD' and 'INSTITUTIONAL LIQ' not in holding.name else 'Cash'
-            holding.percent_weighting = convert_percentage_string_to_float(row[4].value)
-            holdings.append(holding)
-        
-        return holdings
\ No newline at end of file
+            if get_cell_value(row, 0) is None:
+                return
+            yield row
+
+    def get_row_holding_type(self, row):
+        ticker = get_cell_value(row, 1).split(' ')[0]
+        return Cash if ticker == 'CASH_USD' or 'INSTITUTIONAL LIQ' in get_cell_value(row, 0) else Equity
+
+    def get_row_weight(self, holding_type, row):
+        return convert_percentage_string_to_float(get_cell_value(row, 4))
+
+    def decode_row(self, row, holding_type):
+        """Reads the holding in a row of the holdings table.
+
+        :param row: A row yielded by iter_table_rows().
+        :param holding_type: The row's holding type, from get_row_holding_type().
+        :returns: An Equity or Cash holding.
+        """
+        name = get_cell_value(row, 0)
+        percent_weighting = self.get_row_weight(holding_type, row)
+        if holding_type is Cash:
+            return Cash(name, percent_weighting=percent_weighting)
+        ticker = get_cell_value(row, 1).split(' ')[0]
+        return Equity(name,
+            ticker=ticker if is_ticker_symbol(ticker) else None,
+            num_shares=int(get_cell_value(row, 6)[:-4]),
+            percent_weighting=percent_weighting)
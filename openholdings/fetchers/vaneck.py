@@ -1,39 +1,184 @@
-from openpyxl import load_workbook
-import requests
-import shutil
 import os
+import json
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+import requests
 from .fetcher import IFetcher
-from ..models import Holding
+from ..exceptions import FundNotFoundException
+from ..models import Equity, Cash
 from ..utils.regex_util import is_percentage, is_ticker_symbol
-from ..utils.file_util import download_holdings_file, delete_holdings_file
+from ..utils.spreadsheet_util import iter_sheet_rows, get_cell_value, is_holdings_spreadsheet
 from ..utils.string_conversion_util import (
     convert_percentage_string_to_float, 
     convert_comma_separated_integer_to_float, 
     convert_dollars_string_to_float
 )
 
+# The categories VanEck files its funds' pages under, in order of how many funds each has
+URL_CATEGORIES = ('equity', 'income', 'commodity')
+
+HOLDINGS_URL = 'https://www.vaneck.com/etf/{}/{}/holdings/download/xlsx/'
+
+class CategoryCache:
+    """A persistent mapping of VanEck fund ticker -> the URL category its holdings file is found under.
+
+    The mapping is kept in a small JSON file, which is read on first use and atomically rewritten whenever a new
+    category is learned.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: The JSON file to store the mapping in.  Defaults to `vaneck_categories.json` in the
+            OPENHOLDINGS_CACHE_DIR environment variable's directory, or in `~/.cache/openholdings` if it isn't set.
+        """
+        if path is None:
+            cache_dir = os.environ.get('OPENHOLDINGS_CACHE_DIR',
+                os.path.join(os.path.expanduser('~'), '.cache', 'openholdings'))
+            path = os.path.join(cache_dir, 'vaneck_categories.json')
+        self.path = path
+        self._categories = None
+        self._lock = threading.Lock()
+
+    def get(self, ticker):
+        with self._lock:
+            return self.load().get(ticker.upper())
+
+    def set(self, ticker, category):
+        with self._lock:
+            categories = self.load()
+            if categories.get(ticker.upper()) != category:
+                categories[ticker.upper()] = category
+                self.save()
+
+    def forget(self, ticker):
+        with self._lock:
+            if self.load().pop(ticker.upper(), None) is not None:
+                self.save()
+
+    def load(self):
+        if self._categories is None:
+            try:
+                with open(self.path, mode='r', encoding='utf-8') as categories_file:
+                    self._categories = json.load(categories_file)
+            except (FileNotFoundError, ValueError):
+                self._categories = {}
+        return self._categories
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as temp_file:
+                    json.dump(self._categories, temp_file, sort_keys=True)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except OSError:
+            pass  # The mapping is only an optimization, so it's fine to relearn it if it can't be saved
+
+_category_cache = None
+_category_cache_lock = threading.Lock()
+
+def get_category_cache():
+    """Returns the CategoryCache shared by every VanEck fetcher in the process, creating it on first use."""
+    global _category_cache
+    with _category_cache_lock:
+        if _category_cache is None:
+            _category_cache = CategoryCache()
+        return _category_cache
+
+def get_holdings_url(ticker, category):
+    return HOLDINGS_URL.format(category, ticker.lower())
+
 class VanEck(IFetcher):
     """A fetcher implementation for VanEck funds."""
 
     def fetch(self, ticker):
-        # Download holdings file (VanEck provides an Excel spreadsheet)
-        spreadsheet_url = self.get_url_for_ticker(ticker)
-        downloaded_filename = download_holdings_file(spreadsheet_url, 'xlsx', ticker)
+        category_cache = get_category_cache()
+        if category_cache.get(ticker) is not None:
+            try:
+                return self.download_and_parse(self.get_url_for_ticker(ticker))
+            except requests.HTTPError:
+                # The fund may have moved to another category since it was learned
+                category_cache.forget(ticker)
+        return self.download_and_parse(self.get_url_for_ticker(ticker))
+
+    async def afetch(self, ticker):
+        # Probing for the category makes blocking requests, so it's done on a worker thread
+        url = await asyncio.get_running_loop().run_in_executor(None, self.get_url_for_ticker, ticker)
+        return await self.adownload_and_parse(url)
+
+    def parse_holdings_file(self, holdings_file):
+        """Read holdings from the active sheet of a holdings spreadsheet.
+
+        :param holdings_file: A binary file object containing the holdings spreadsheet.
+        :returns: A list of Holdings read from the spreadsheet.
+        """
+        with closing(iter_sheet_rows(holdings_file)) as rows:
+            if self.holdings_filter is None:
+                return list(self.iter_holdings_from_rows(rows))
+            # Rows are checked against the filter before their holdings are constructed
+            return self.holdings_filter.select(self.iter_table_rows(rows), self.get_row_holding_type,
+                self.get_row_weight, self.decode_row)
 
-        # Parse holdings list from downloaded spreadsheet
-        wb = load_workbook(filename=downloaded_filename)
-        sheet = wb.active
-        holdings = self.parse_holdings_from_spreadsheet(sheet)
+    @classmethod
+    def probe_fund(cls, ticker):
+        """Probes for the fund's holdings file under every category.
 
-        # Clean up and return holdings list
-        wb.close()
-        delete_holdings_file(downloaded_filename)
-        return holdings
+        Only a category the fund is found under is remembered in the category cache.  Nothing is written for a ticker
+        that no category serves, so mistyped tickers never end up in the cache.
+        """
+        try:
+            category = cls().probe_category(ticker)
+        except FundNotFoundException:
+            return False
+        get_category_cache().set(ticker, category)
+        return True
 
     def get_url_for_ticker(self, ticker):
-        # TODO: fix the fact that the 'equity' part is sometimes 'income' or 'commodity'
-        # Maybe just brute force try each one
-        return 'https://www.vaneck.com/etf/equity/{}/holdings/download/xlsx/'.format(ticker.lower())
+        """Finds the URL of a fund's holdings file, which is filed under one of several categories (i.e. 'equity'
+        or 'income') depending on the fund.
+
+        The fund's category is read from the category cache if it's been learned before.  Otherwise, the URL under
+        every category is probed at once, and the first to serve a spreadsheet is used and remembered.
+
+        :param ticker: The ticker of the fund to fetch holdings for.
+        :returns: A string URL pointing to the fund's holdings spreadsheet.
+        :raises FundNotFoundException: If no category serves a holdings spreadsheet for the fund.
+        """
+        category_cache = get_category_cache()
+        category = category_cache.get(ticker)
+        if category is None:
+            category = self.probe_category(ticker)
+            category_cache.set(ticker, category)
+        return get_holdings_url(ticker, category)
+
+    def probe_category(self, ticker):
+        """Requests the first bytes of the holdings file URL under every category concurrently.
+
+        :param ticker: The ticker of the fund to probe for.
+        :returns: The first category found to serve a holdings spreadsheet.
+        :raises FundNotFoundException: If no category serves a holdings spreadsheet for the fund.
+        """
+        executor = ThreadPoolExecutor(max_workers=len(URL_CATEGORIES))
+        probes = {}
+        try:
+            probes = {executor.submit(is_holdings_spreadsheet, get_holdings_url(ticker, category)): category
+                for category in URL_CATEGORIES}
+            for probe in as_completed(probes):
+                if probe.result():
+                    return probes[probe]
+        finally:
+            # Don't wait on the remaining probes once one has succeeded
+            for probe in probes:
+                probe.cancel()
+            executor.shutdown(wait=False)
+        raise FundNotFoundException(ticker)
 
     def parse_holdings_from_spreadsheet(self, sheet):
         """Read holdings spreadsheet into Holding objects.
@@ -41,20 +186,55 @@ class VanEck(IFetcher):
         :param sheet: An openpyxl Worksheet to read holdings from.
         :returns: A list of Holdings read from the spreadsheet.
         """
-        holdings = []
-
-        for row in sheet.rows:
-            if row[7].value is not None and is_percentage(row[7].value):
-                holding = Holding()
-                ticker = row[1].value.split(' ')[0]
-                if is_ticker_symbol(ticker):
-                    holding.ticker = ticker
-                holding.name = row[2].value
-                if row[4].value is not None:
-                    holding.num_shares = convert_comma_separated_integer_to_float(row[4].value)
-                holding.asset_class = row[5].value
-                holding.market_value_usd = convert_dollars_string_to_float(row[6].value)
-                holding.percent_weighting = convert_percentage_string_to_float(row[7].value)
-                holdings.append(holding)
-        
-        return holdings
\ No newline at end of file
+        return list(self.iter_holdings_from_rows(sheet.iter_rows(values_only=True)))
+
+    def iter_holdings_from_rows(self, rows):
+        """Read holdings from the rows of a holdings spreadsheet.  Rows of the holdings table are recognized by the
+        percentage in their weighting column.
+
+        :param rows: An iterable of tuples of the spreadsheet's cell values, i.e. from iter_sheet_rows().
+        :returns: A generator of Holdings read from the spreadsheet.
+        """
+        for row in self.iter_table_rows(rows):
+            yield self.decode_row(row, self.get_row_holding_type(row))
+
+    def iter_table_rows(self, rows):
+        """Yields the rows of the holdings table in a holdings spreadsheet, without reading their holdings.
+
+        :param rows: An iterable of tuples of the spreadsheet's cell values.
+        :returns: A generator of the rows that have a percentage in their weighting column.
+        """
+        for row in rows:
+            weighting = get_cell_value(row, 7)
+            if isinstance(weighting, str) and is_percentage(weighting):
+                yield row
+
+    def get_row_holding_type(self, row):
+        # The asset class column reads i.e. 'Stock' or 'Cash'
+        asset_class = get_cell_value(row, 5)
+        return Cash if asset_class is not None and 'cash' in asset_class.lower() else Equity
+
+    def get_row_weight(self, holding_type, row):
+        return convert_percentage_string_to_float(get_cell_value(row, 7))
+
+    def decode_row(self, row, holding_type):
+        """Reads the holding in a row of the holdings table.
+
+        :param row: A row yielded by iter_table_rows().
+        :param holding_type: The row's holding type, from get_row_holding_type().
+        :returns: An Equity or Cash holding.
+        """
+        name = get_cell_value(row, 2)
+        market_value = convert_dollars_string_to_float(get_cell_value(row, 6))
+        percent_weighting = self.get_row_weight(holding_type, row)
+        if holding_type is Cash:
+            return Cash(name, market_value=market_value, percent_weighting=percent_weighting)
+        ticker = get_cell_value(row, 1).split(' ')[0]
+        num_shares = None
+        if get_cell_value(row, 4) is not None:
+            num_shares = convert_comma_separated_integer_to_float(get_cell_value(row, 4))
+        return Equity(name,
+            ticker=ticker if is_ticker_symbol(ticker) else None,
+            num_shares=num_shares,
+            market_value=market_value,
+            percent_weighting=percent_weighting)
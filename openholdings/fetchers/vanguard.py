@@ -1,220 +1,329 @@
-import os
-import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException
+import json
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from .fetcher import IFetcher
-from ..models import Holding
+from ..exceptions import HoldingsFormatException
+from ..models import Equity, Bond, Cash
+from ..utils.file_util import open_holdings_file
 from ..utils.regex_util import is_ticker_symbol
+from ..utils.validation import is_valid_cusip, is_valid_isin, is_valid_sedol
 from ..utils.string_conversion_util import (
     convert_percentage_string_to_float, 
     convert_comma_separated_integer_to_float,
     convert_dollars_string_to_float
 )
 
+# JSON endpoint the portfolio page loads each tab of its holdings table from, one page of holdings at a time
+API_URL = 'https://investor.vanguard.com/investment-products/etfs/profile/api/{}/portfolio-holding/{}?start={}&count={}'
+
+# Holdings table tab -> the holding type its entries are parsed into
+API_HOLDING_TYPES = {'stock': Equity, 'bond': Bond, 'short-term-reserve': Cash}
+
+# Number of holdings requested per page of the JSON endpoint
+API_PAGE_SIZE = 500
+
+# Reads the page of the holdings table currently displayed, in a single round trip to the browser.
+# Vanguard's holdings page markup actually has two <table> elements that sit on top of one another: the "left" table
+# contains the first column of the table (name and ticker symbol) while the "right" table contains all the rest of
+# the row's values.  Each row is returned as the left table's first cell followed by the right table's other cells.
+READ_TABLE_PAGE_SCRIPT = """
+var leftRows = document.querySelectorAll('.holdings-table.scrollingTableLeft tr');
+var rightRows = document.querySelectorAll('.holdings-table.scrollingTableRight tr');
+var rows = [];
+for (var i = 1; i < rightRows.length; i++) {
+    var leftCells = leftRows[i].querySelectorAll('td span');
+    var rightCells = rightRows[i].querySelectorAll('td span');
+    var row = [leftCells[0].innerText.trim()];
+    for (var j = 1; j < rightCells.length; j++) {
+        row.push(rightCells[j].innerText.trim());
+    }
+    rows.push(row);
+}
+var pagination = document.querySelector('.portfolio-pagination-links span:first-child');
+return {rows: rows, pagination: pagination ? pagination.innerText.trim() : null};
+"""
+
+GET_PAGINATION_TEXT_SCRIPT = """
+var pagination = document.querySelector('.portfolio-pagination-links span:first-child');
+return pagination ? pagination.innerText.trim() : null;
+"""
+
+# Marks the displayed table and footnotes, so that GET_TABLE_STATE_SCRIPT can tell once they've been replaced by
+# another tab's.  Otherwise the previous tab's "no holdings" footnote could be mistaken for the selected tab's.
+MARK_TABLE_SCRIPT = """
+var elements = document.querySelectorAll('.holdings-table.scrollingTableLeft, .summary-table-footnote');
+for (var i = 0; i < elements.length; i++) { elements[i].setAttribute('data-previous-tab', 'true'); }
+"""
+
+# Returns 'empty' if the selected tab has no holdings, 'table' once its table is displayed, or null while loading.
+# Only a table or footnote rendered since MARK_TABLE_SCRIPT ran counts.
+GET_TABLE_STATE_SCRIPT = """
+var footnotes = document.querySelectorAll('.summary-table-footnote:not([data-previous-tab])');
+for (var i = 0; i < footnotes.length; i++) {
+    if (footnotes[i].innerText.trim() === 'The fund includes no holdings of this type.') { return 'empty'; }
+}
+var table = document.querySelector('.holdings-table.scrollingTableLeft:not([data-previous-tab])');
+if (table && table.offsetParent !== null) { return 'table'; }
+return null;
+"""
+
 class Vanguard(IFetcher):
     """A fetcher implementation for Vanguard funds.
     
-    This fetcher requires the use of a headless Selenium browser due to the nature of Vanguard's
-    holdings page.  The fetcher opens the page, then reads through all pages of the holdings table
-    (30 holdings per page), exploring three different tabs: Stock, Bond, and Short-term reserve. 
-    An unfortunate consequence of using Selenium and paging through potentially long tables is that
-    the fetcher sometimes takes a considerable amount of time to scrape the holdings for a particular
-    fund -- it may take anywhere from 10 seconds to over a minute for funds with thousands of holdings.
-
-    Important note: since this fetcher relies on the Selenium automated browser, a Chrome driver executable
-    must be installed on your machine and its path should be available in a 'CHROME_DRIVER_PATH' environment
-    variable.  By default the browser will be configured to run headless.
+    Holdings are read from the JSON data behind Vanguard's portfolio page, the same data its holdings table is
+    rendered from, using plain HTTP requests.  The fund's stock, bond, and short-term reserve holdings are each
+    requested in pages of API_PAGE_SIZE, so even funds with thousands of holdings only take a handful of requests.
+
+    If the JSON data can't be retrieved (a requests.RequestException) or isn't in the expected shape (a
+    HoldingsFormatException), the fetcher falls back to scraping the
+    portfolio page with headless Selenium browsers, which read through all pages of the holdings table (30 holdings
+    per page) of three different tabs in parallel: Stock, Bond, and Short-term reserve.  Scraping may take anywhere
+    from several seconds to over a minute for funds with thousands of holdings.
+
+    Important note: the Selenium fallback requires a Chrome driver executable to be installed on your machine, and
+    its path should be available in a 'CHROME_DRIVER_PATH' environment variable.  Selenium is only imported, and
+    browsers are only launched, if the fallback is needed.  Browsers are kept running in a shared WebDriverPool for
+    later fetches until the process exits or `close_webdriver_pool()` is called.  Set `use_browser_fallback` to False
+    to disable the fallback.
     """
 
-    def __init__(self):
-        chrome_options = Options()
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--headless")
-        chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        self.driver = webdriver.Chrome(executable_path=os.environ['CHROME_DRIVER_PATH'], options=chrome_options)
+    use_browser_fallback = True
 
     def fetch(self, ticker):
-        self.driver.get(self.get_url_for_ticker(ticker))
+        try:
+            holdings = self.fetch_from_api(ticker)
+        except (requests.RequestException, HoldingsFormatException) as api_error:
+            if not self.use_browser_fallback:
+                raise
+            try:
+                holdings = self.fetch_with_browser(ticker)
+            except Exception as browser_error:
+                # Keep the reason the API couldn't be used, i.e. when the browser can't even be launched
+                raise browser_error from api_error
+        return self.filter_holdings(holdings)
+
+    def fetch_from_api(self, ticker):
+        """Fetch the fund's holdings from the JSON data behind its portfolio page.
+
+        Tabs whose holding type is excluded by the fetcher's holdings filter aren't requested.
+
+        :param ticker: The ticker of the fund to fetch holdings for.
+        :returns: A list of the fund's Equity, Bond, and Cash holdings.
+        :raises requests.RequestException: If the data can't be downloaded.
+        :raises HoldingsFormatException: If the data isn't in the expected shape.
+        """
+        holdings = []
+        for tab_name, holding_type in API_HOLDING_TYPES.items():
+            if self.includes_holding_type(holding_type):
+                holdings.extend(self.read_api_holdings(ticker, tab_name, holding_type))
+        return holdings
+
+    def includes_holding_type(self, holding_type):
+        return self.holdings_filter is None or self.holdings_filter.includes_type(holding_type)
+
+    def read_api_holdings(self, ticker, tab_name, holding_type):
+        """Requests every page of one tab's holdings from the JSON endpoint.
+
+        :param ticker: The ticker of the fund to fetch holdings for.
+        :param tab_name: The holdings table tab to request, i.e. 'stock'.
+        :param holding_type: The Holding subclass (Equity, Bond, or Cash) the tab's entries are parsed into.
+        :returns: A list of the tab's holdings.
+        """
         holdings = []
+        start = 1
+        while True:
+            with open_holdings_file(self.get_api_url(ticker, tab_name, start)) as holdings_page_file:
+                try:
+                    holdings_page = json.load(holdings_page_file)
+                except ValueError as error:
+                    raise HoldingsFormatException('Vanguard holdings data is not JSON') from error
+            page_holdings, total_count = self.parse_api_holdings_page(holdings_page, holding_type)
+            holdings.extend(page_holdings)
+            start += API_PAGE_SIZE
+            if not page_holdings or start > total_count:
+                return holdings
+
+    @classmethod
+    def probe_fund(cls, ticker):
+        """Checks whether the JSON endpoint serves a page of the fund's stock holdings in the expected shape."""
         try:
-            # Make sure table tabs have loaded before trying to navigate the table
-            WebDriverWait(self.driver, 10).until(
-                EC.visibility_of_element_located((By.CSS_SELECTOR, '.funds-tabsetBar'))
-            )
+            with open_holdings_file(API_URL.format(ticker.upper(), 'stock', 1, 1)) as holdings_page_file:
+                holdings_page = json.load(holdings_page_file)
+            cls().parse_api_holdings_page(holdings_page, Equity)
+        except (requests.RequestException, ValueError):
+            return False
+        return isinstance(holdings_page.get('fund'), dict)
+
+    def get_api_url(self, ticker, tab_name, start):
+        return API_URL.format(ticker.upper(), tab_name, start, API_PAGE_SIZE)
+
+    def parse_api_holdings_page(self, holdings_page, holding_type):
+        """Parses one page of holdings returned by the JSON endpoint.
 
-            # Accumulate holdings across each asset class
-            holdings.extend(self.read_stock_holdings())
-            holdings.extend(self.read_bond_holdings())
-            holdings.extend(self.read_cash_holdings())
-        finally:
-            self.driver.quit()
+        A page is of the form {"size": <total number of holdings in the tab>, "fund": {"entity": [...]}}, where each
+        entity describes one holding (i.e. {"longName": "Apple Inc.", "ticker": "AAPL", "percentWeight": "6.93",
+        "sharesHeld": "168,420,151", "marketValue": "25038930848.95", ...}).
+
+        :param holdings_page: The decoded JSON document.
+        :param holding_type: The Holding subclass (Equity, Bond, or Cash) the entities are parsed into.
+        :returns: A (list of Holdings, total number of holdings in the tab) tuple.
+        :raises HoldingsFormatException: If the document isn't in the expected shape.
+        """
+        if not isinstance(holdings_page, dict):
+            raise HoldingsFormatException('Unexpected Vanguard holdings document')
+        try:
+            fund = holdings_page.get('fund') or {}
+            entities = fund.get('entity') or []
+            total_count = int(holdings_page.get('size', len(entities)))
+            return [self.parse_api_holding(entity, holding_type) for entity in entities], total_count
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            raise HoldingsFormatException('Unexpected Vanguard holdings entry: {!r}'.format(error)) from error
+
+    def parse_api_holding(self, entity, holding_type):
+        holding = holding_type(entity['longName'].strip(),
+            percent_weighting=round(convert_api_number(entity['percentWeight']) / 100, 4),
+            market_value=convert_api_number(entity.get('marketValue')))
+        for field, key, is_valid in (('identifier_cusip', 'cusip', is_valid_cusip),
+                ('identifier_isin', 'isin', is_valid_isin), ('identifier_sedol', 'sedol', is_valid_sedol)):
+            if is_valid(entity.get(key)):
+                setattr(holding, field, entity[key])
+        if holding_type is Equity:
+            ticker = entity.get('ticker')
+            if ticker and is_ticker_symbol(ticker):
+                holding.ticker = ticker
+            holding.num_shares = convert_api_number(entity.get('sharesHeld'))
+        return holding
+
+    def fetch_with_browser(self, ticker):
+        """Fetch the fund's holdings by scraping its portfolio page with headless browsers.
+
+        The Stock, Bond, and Short-term reserve tabs of the holdings table are each scraped at the same time in a
+        separate browser borrowed from the shared WebDriverPool, so browsers stay warm between fetches.  Tabs whose
+        holding type is excluded by the fetcher's holdings filter aren't scraped.
+
+        :param ticker: The ticker of the fund to fetch holdings for.
+        :returns: A list of the fund's Equity, Bond, and Cash holdings.
+        """
+        url = self.get_url_for_ticker(ticker)
+        tab_row_parsers = [(0, Equity, self.parse_stock_row), (1, Bond, self.parse_bond_row),
+            (2, Cash, self.parse_cash_row)]
+        tab_row_parsers = [(tab_index, parse_row) for tab_index, holding_type, parse_row in tab_row_parsers
+            if self.includes_holding_type(holding_type)]
+        if not tab_row_parsers:
+            return []
+        holdings = []
+        with ThreadPoolExecutor(max_workers=len(tab_row_parsers)) as executor:
+            tab_futures = [executor.submit(self.read_tab_holdings, url, tab_index, parse_row)
+                for tab_index, parse_row in tab_row_parsers]
+            # Accumulate holdings across each asset class, in tab order
+            for tab_future in tab_futures:
+                holdings.extend(tab_future.result())
         return holdings
 
     def get_url_for_ticker(self, ticker):
         return 'https://investor.vanguard.com/etf/profile/portfolio/{}/portfolio-holdings'.format(ticker)
 
-    def read_stock_holdings(self):
-        """Page through "Stock" tab of the holdings table, collecting the fund's equities into a list.
+    def read_tab_holdings(self, url, tab_index, parse_row):
+        """Page through one tab of the holdings table, collecting its holdings into a list.
 
-        :returns: A list of Holding objects corresponding to the fund's equity holdings.
-        """
-        stock_holdings = []
-        has_stock_holdings = self.switch_to_table_tab(0)
-        if not has_stock_holdings:
-            return stock_holdings
-        table_data = self.read_table_into_2d_array()
-
-        on_last_page_of_table = False
-        while not on_last_page_of_table:
-            for table_row in table_data:
-                holding = Holding()
-                holding_name, holding_ticker = self.parse_holding_name_and_ticker(table_row[0])
-                holding.name = holding_name
-                if is_ticker_symbol(holding_ticker):
-                    holding.ticker = holding_ticker
-                holding.percent_weighting = convert_percentage_string_to_float(table_row[3])
-                holding.num_shares = convert_comma_separated_integer_to_float(table_row[4])
-                holding.market_value_usd = convert_dollars_string_to_float(table_row[5])
-                holding.asset_class = 'Stock'
-                stock_holdings.append(holding)
-
-            on_last_page_of_table = self.is_on_last_page_of_table()
-            self.maybe_advance_table_page(on_last_page_of_table)
-        return stock_holdings
-
-    def read_bond_holdings(self):
-        """Page through "Bond" tab of the holdings table, collecting the fund's bonds into a list.
-
-        :returns: A list of Holding objects corresponding to the fund's bond holdings.
+        :param url: The URL of the fund's portfolio page.
+        :param tab_index: Integer index of the tab to read (i.e. "Stock" tab is index 0).
+        :param parse_row: A function that converts a row of the tab's table into a Holding.
+        :returns: A list of Holding objects corresponding to the tab's holdings.
         """
-        bond_holdings = []
-        has_bond_holdings = self.switch_to_table_tab(1)
-        if not has_bond_holdings:
-            return bond_holdings
-        table_data = self.read_table_into_2d_array()
-
-        on_last_page_of_table = False
-        while not on_last_page_of_table:
-            for table_row in table_data:
-                holding = Holding()
-                holding_name, holding_ticker = self.parse_holding_name_and_ticker(table_row[0])
-                holding.name = holding_name
-                if is_ticker_symbol(holding_ticker):
-                    holding.ticker = holding_ticker
-                holding.percent_weighting = convert_percentage_string_to_float(table_row[6])
-                holding.market_value_usd = convert_dollars_string_to_float(table_row[7])
-                holding.asset_class = 'Bond'
-                bond_holdings.append(holding)
-
-            on_last_page_of_table = self.is_on_last_page_of_table()
-            self.maybe_advance_table_page(on_last_page_of_table)
-        return bond_holdings
-
-    def read_cash_holdings(self):
-        """Page through "Short-term reserves" tab of the holdings table, collecting the fund's reserves into a list.
-
-        :returns: A list of Holding objects corresponding to the fund's cash holdings.
-        """
-        cash_holdings = []
-        has_cash_holdings = self.switch_to_table_tab(2)
-        if not has_cash_holdings:
-            return cash_holdings
-        table_data = self.read_table_into_2d_array()
-        
-        on_last_page_of_table = False
-        while not on_last_page_of_table:
-            for table_row in table_data:
-                holding = Holding()
-                holding_name, holding_ticker = self.parse_holding_name_and_ticker(table_row[0])
-                holding.name = holding_name
-                if is_ticker_symbol(holding_ticker):
-                    holding.ticker = holding_ticker
-                holding.percent_weighting = convert_percentage_string_to_float(table_row[4])
-                holding.market_value_usd = convert_dollars_string_to_float(table_row[3])
-                holding.asset_class = 'Cash'
-                cash_holdings.append(holding)
-
-            on_last_page_of_table = self.is_on_last_page_of_table()
-            self.maybe_advance_table_page(on_last_page_of_table)
-        return cash_holdings
-
-    def switch_to_table_tab(self, tab_index):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from ..utils.webdriver_pool import get_webdriver_pool
+        with get_webdriver_pool().driver() as driver:
+            driver.get(url)
+            # Make sure table tabs have loaded before trying to navigate the table
+            WebDriverWait(driver, 10).until(
+                EC.visibility_of_element_located((By.CSS_SELECTOR, '.funds-tabsetBar'))
+            )
+            if not self.switch_to_table_tab(driver, tab_index):
+                return []
+
+            holdings = []
+            while True:
+                table_page = driver.execute_script(READ_TABLE_PAGE_SCRIPT)
+                holdings.extend(parse_row(table_row) for table_row in table_page['rows'])
+                if self.is_last_page_of_table(table_page['pagination']):
+                    return holdings
+                self.advance_table_page(driver, table_page['pagination'])
+
+    def parse_stock_row(self, table_row):
+        holding_name, holding_ticker = self.parse_holding_name_and_ticker(table_row[0])
+        return Equity(holding_name,
+            ticker=holding_ticker if is_ticker_symbol(holding_ticker) else None,
+            percent_weighting=convert_percentage_string_to_float(table_row[3]),
+            num_shares=convert_comma_separated_integer_to_float(table_row[4]),
+            market_value=convert_dollars_string_to_float(table_row[5]))
+
+    def parse_bond_row(self, table_row):
+        holding_name, _ = self.parse_holding_name_and_ticker(table_row[0])
+        return Bond(holding_name,
+            percent_weighting=convert_percentage_string_to_float(table_row[6]),
+            market_value=convert_dollars_string_to_float(table_row[7]))
+
+    def parse_cash_row(self, table_row):
+        holding_name, _ = self.parse_holding_name_and_ticker(table_row[0])
+        return Cash(holding_name,
+            percent_weighting=convert_percentage_string_to_float(table_row[4]),
+            market_value=convert_dollars_string_to_float(table_row[3]))
+
+    def switch_to_table_tab(self, driver, tab_index):
         """Uses the webdriver to switch to a tab with the given index (i.e. "Stock" tab is index 0).
 
+        Rather than sleeping for a fixed time after clicking the tab, this waits until either the tab's table has
+        been rendered in place of the previous one, or the note that the fund has no holdings of the tab's type.  The
+        previous tab's table and note are marked before clicking, so neither is mistaken for the new tab's.
+
+        :param driver: The WebDriver displaying the fund's portfolio page.
         :param tab_index: Integer index representing the tab to switch to.
         :returns: True if the fund has holdings of the switched-to tab type, False otherwise.
         """
-        table_tab_bar_element = self.driver.find_element_by_css_selector('.funds-tabsetBar')
-        tab_link_elements = table_tab_bar_element.find_elements_by_css_selector('li a')
+        from selenium.webdriver.support.ui import WebDriverWait
+        # The Stock tab is displayed when the page loads, so only what another tab rendered has to be replaced
+        if tab_index > 0:
+            driver.execute_script(MARK_TABLE_SCRIPT)
+        tab_link_elements = driver.find_elements_by_css_selector('.funds-tabsetBar li a')
         tab_link_elements[tab_index].click()
+        table_state = WebDriverWait(driver, 10).until(lambda d: d.execute_script(GET_TABLE_STATE_SCRIPT))
+        return table_state == 'table'
 
-        # Table may be empty, otherwise wait for table to load
-        try:
-            time.sleep(.5)
-            footnote_element = self.driver.find_element_by_css_selector('.summary-table-footnote')
-            if footnote_element is not None and footnote_element.text == 'The fund includes no holdings of this type.':
-                return False
-        except NoSuchElementException:
-            WebDriverWait(self.driver, 10).until(
-                EC.visibility_of_element_located((By.CSS_SELECTOR, '.holdings-table.scrollingTableLeft'))
-            )
+    def is_last_page_of_table(self, table_pagination_text):
+        """Checks the table's pagination text (i.e. '1 - 30 of 512') to tell whether the last page is displayed."""
+        if not table_pagination_text:
             return True
-
-    def is_on_last_page_of_table(self):
-        table_pagination_text = self.driver.find_element_by_css_selector('.portfolio-pagination-links span:first-child').text
         pagination_split = table_pagination_text.split(' ')
         end_of_page_range = int(pagination_split[-3])
         total_holdings_count = int(pagination_split[-1])
         return end_of_page_range == total_holdings_count
 
-    def read_table_into_2d_array(self):
-        """Returns a 2D array populated with string values of a single page of a table's contents.
+    def advance_table_page(self, driver, table_pagination_text):
+        """Clicks the "Next" button below the table, then waits for the next page of the table to be displayed.
 
-        For reasons beyond our understanding, Vanguard's holdings page markup actually has two <table> elements that
-        seem to sit on top of one another.  The "left" table contains the first column of the table (name and ticker symbol)
-        while the "right" table contains all the rest of the row's values.  This method abstracts this strange detail
-        away from methods that are interested in the table's full contents.
-
-        :returns: 2D array of strings representing the values of the holdings table currently displayed in the browser.
-        """
-        table = []
-        # The stock names/tickers are populated in the "left" table, and the rest of the info is in the "right" table
-        data_table_element_left = self.driver.find_element_by_css_selector('.holdings-table.scrollingTableLeft')
-        data_table_element_right = self.driver.find_element_by_css_selector('.holdings-table.scrollingTableRight')
-        table_row_elements_left = data_table_element_left.find_elements_by_css_selector('tr')
-        table_row_elements_right = data_table_element_right.find_elements_by_css_selector('tr')
-
-        for row_index in range(1, len(table_row_elements_right)):
-            row_element_left = table_row_elements_left[row_index]
-            row_element_right = table_row_elements_right[row_index]
-            table_cell_elements_left = row_element_left.find_elements_by_css_selector('td span')
-            table_cell_elements_right = row_element_right.find_elements_by_css_selector('td span')
-
-            # Get the stock name from the "left" table
-            table_row = [table_cell_elements_left[0].text]
-            # Get the stock info (percent weighting, num shares, etc.) from the "right" table
-            for i in range(1, len(table_cell_elements_right)):
-                table_row.append(table_cell_elements_right[i].text)
-            table.append(table_row)
-
-        return table
-
-    def maybe_advance_table_page(self, on_last_page_of_table):
-        """Clicks the "Next" button below the table to move to the next page, if a next page exists.
-
-        :param on_last_page_of_table: Boolean indicating whether the table is currently on its last page.
+        :param driver: The WebDriver displaying the fund's portfolio page.
+        :param table_pagination_text: The pagination text of the page currently displayed.
         """
-        if not on_last_page_of_table:
-            next_page_button_element = self.driver.find_element_by_css_selector('.portfolio-pagination-links span:last-child')
-            next_page_button_element.click()
+        from selenium.webdriver.support.ui import WebDriverWait
+        next_page_button_element = driver.find_element_by_css_selector('.portfolio-pagination-links span:last-child')
+        next_page_button_element.click()
+        WebDriverWait(driver, 10).until(
+            lambda d: d.execute_script(GET_PAGINATION_TEXT_SCRIPT) != table_pagination_text
+        )
 
     def parse_holding_name_and_ticker(self, name_and_ticker):
         last_paren_index = name_and_ticker.rfind('(')
         holding_name = name_and_ticker[:last_paren_index]
         holding_ticker = name_and_ticker[last_paren_index + 1:-1]
-        return (holding_name, holding_ticker)
\ No newline at end of file
+        return (holding_name, holding_ticker)
+
+def convert_api_number(value):
+    """Converts a number from the JSON endpoint, which may be given as a number or a string like '1,234.56'."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        return float(value.replace(',', '').replace('$', '').replace('%', ''))
+    return float(value)
@@ -1,13 +1,216 @@
-from .fetchers.vaneck import VanEck
-from .fetchers.vanguard import Vanguard
-from .fetchers.ishares import IShares
-from .fetchers.etfmg import Etfmg
-from .fetchers.spdr import Spdr
-from .fetchers.invesco import Invesco
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .fetchers.registry import lookup_fund, alookup_fund, discover_fund, get_fetcher_class
+from .exceptions import FundNotFoundException
+from .models import HoldingsTable
+from .utils.holdings_filter import create_holdings_filter
+
+FetchResult = namedtuple('FetchResult', ['ticker', 'holdings', 'error'])
+"""The outcome of fetching one fund in a batch: the ticker as it was given, and either a list of holdings or the
+exception that was raised."""
 
 class HoldingsFetcher:
-    def __init__(self, etf_ticker):
+    def __init__(self, etf_ticker, cache=None, lazy=False, archive=None):
+        """
+        :param etf_ticker: The ticker of the fund to fetch holdings for.
+        :param cache: An optional HoldingsCache to serve the fund's holdings from, if it has fetched them today.
+        :param lazy: Whether to return lazy holding views, which only convert a field from the holdings file when
+            it's first accessed.  Useful when only a few fields (i.e. ticker and weighting) of each holding are read.
+        :param archive: An optional SnapshotArchive that every full fetch of the fund's holdings is appended to, as
+            of the date it was fetched.
+        """
         self.etf_ticker = etf_ticker
+        self.cache = cache
+        self.lazy = lazy
+        self.archive = archive
+
+    def fetch(self, asset_classes=None, top_n=None, min_weight=None):
+        """Fetch the fund's holdings, optionally only those matching the given predicates.
+
+        Predicates are pushed down into the fetcher, so a partial fetch skips whatever work the provider's format
+        allows, i.e. requesting unwanted asset classes or decoding rows that are filtered out.  Partial fetches are
+        served from the cache if it contains the full fund, but aren't added to it.
+
+        :param asset_classes: An iterable of asset classes to include: 'equity', 'bond', 'future', or 'cash' (or the
+            corresponding Holding subclasses).  Defaults to all of them.
+        :param top_n: If given, only this many of the holdings with the largest percent weightings are returned, in
+            order of descending weighting.
+        :param min_weight: If given, only holdings with at least this percent weighting (as a fraction, i.e. 0.01 for
+            1%) are returned.
+        :returns: A list of Holdings that make up the ETF.
+        """
+        holdings_filter = create_holdings_filter(asset_classes, top_n, min_weight)
+        return _fetch_fund(lookup_fund(self.etf_ticker), self.cache, self.lazy, holdings_filter, self.archive)
+
+    def fetch_iter(self):
+        """Fetch the fund's holdings one at a time as they're parsed, without building the full list first.
+
+        Holdings are served from the cache if it contains the fund, but holdings fetched through this method aren't
+        added to it.
+
+        :returns: A generator of Holdings that make up the ETF.
+        """
+        fund_record = lookup_fund(self.etf_ticker)
+        if self.cache is not None:
+            holdings = self.cache.get(fund_record.provider, fund_record.ticker, lazy=self.lazy)
+            if holdings is not None:
+                yield from holdings
+                return
+        yield from _create_fetcher(fund_record, self.lazy).fetch_iter(fund_record.ticker)
+
+    def fetch_table(self):
+        """Fetch the fund's holdings into a columnar HoldingsTable, for vectorized analysis with NumPy, Arrow, or pandas.
+
+        Holdings are served from the cache if it contains the fund.  Otherwise the provider's fetcher reads its
+        holdings file into the table, decoding rows straight into its columns where the provider's format allows.
+
+        :returns: A HoldingsTable with one row per holding in the ETF.
+        """
+        fund_record = lookup_fund(self.etf_ticker)
+        if self.cache is not None:
+            holdings = self.cache.get(fund_record.provider, fund_record.ticker, lazy=self.lazy)
+            if holdings is not None:
+                return HoldingsTable.from_holdings(holdings, fund_record.ticker)
+        return _create_fetcher(fund_record).fetch_table(fund_record.ticker)
+
+    async def afetch(self, asset_classes=None, top_n=None, min_weight=None):
+        """Asynchronously fetch the fund's holdings, for use from within an asyncio event loop.
+
+        :param asset_classes: An iterable of asset classes to include.  See fetch().
+        :param top_n: If given, only this many of the holdings with the largest percent weightings are returned.
+        :param min_weight: If given, only holdings with at least this percent weighting are returned.
+        :returns: A list of Holdings that make up the ETF.
+        """
+        holdings_filter = create_holdings_filter(asset_classes, top_n, min_weight)
+        fund_record = await alookup_fund(self.etf_ticker)
+        if self.cache is not None:
+            holdings = self.cache.get(fund_record.provider, fund_record.ticker, lazy=self.lazy)
+            if holdings is not None:
+                return _filter_holdings(holdings, holdings_filter)
+        holdings = await _create_fetcher(fund_record, self.lazy, holdings_filter).afetch(fund_record.ticker)
+        if holdings_filter is None:
+            _store_fund(fund_record, holdings, self.cache, self.archive, self.lazy)
+        return holdings
+
+    @staticmethod
+    def fetch_many(tickers, max_workers=8, per_host_limit=2, callback=None, cache=None, lazy=False,
+            asset_classes=None, top_n=None, min_weight=None, archive=None):
+        """Fetch the holdings of many funds concurrently using a pool of threads.
+
+        Tickers are grouped by provider, and since each provider serves its holdings files from its own host, no
+        more than `per_host_limit` requests are ever in flight against the same provider.  A fund that fails to
+        fetch doesn't abort the batch; its exception is reported in its FetchResult instead.
+
+        :param tickers: An iterable of fund tickers to fetch holdings for.
+        :param max_workers: The maximum number of funds fetched at the same time across all providers.
+        :param per_host_limit: The maximum number of funds fetched at the same time from any single provider.
+        :param callback: An optional function called with each FetchResult as soon as it's available.  If given,
+            fetch_many blocks until the whole batch is done instead of returning an iterator.
+        :param cache: An optional HoldingsCache to serve funds from, and to add newly fetched funds to.
+        :param lazy: Whether to return lazy holding views, which only convert a field when it's first accessed.
+        :param asset_classes: An iterable of asset classes to include in each fund's holdings.  See fetch().
+        :param top_n: If given, only this many of each fund's holdings with the largest percent weightings are
+            returned.
+        :param min_weight: If given, only holdings with at least this percent weighting are returned.
+        :param archive: An optional SnapshotArchive that each fund's holdings are appended to once they're fetched.
+        :returns: An iterator of FetchResults in the order they complete (or None if a callback is given).
+        """
+        holdings_filter = create_holdings_filter(asset_classes, top_n, min_weight)
+        results = _fetch_as_completed(tickers, max_workers, per_host_limit, cache, lazy, holdings_filter, archive)
+        if callback is None:
+            return results
+        for result in results:
+            callback(result)
+
+def _create_fetcher(fund_record, lazy=False, holdings_filter=None):
+    fetcher = get_fetcher_class(fund_record.provider)()
+    fetcher.lazy = lazy
+    fetcher.holdings_filter = holdings_filter
+    return fetcher
+
+def _filter_holdings(holdings, holdings_filter):
+    return holdings if holdings_filter is None else holdings_filter.apply(holdings)
+
+def _fetch_fund(fund_record, cache=None, lazy=False, holdings_filter=None, archive=None):
+    if cache is not None:
+        holdings = cache.get(fund_record.provider, fund_record.ticker, lazy=lazy)
+        if holdings is not None:
+            return _filter_holdings(holdings, holdings_filter)
+    return _download_fund(fund_record, cache, lazy, holdings_filter, archive)
+
+def _download_fund(fund_record, cache=None, lazy=False, holdings_filter=None, archive=None):
+    holdings = _create_fetcher(fund_record, lazy, holdings_filter).fetch(fund_record.ticker)
+    # Only full holdings lists are stored, since a partial list can't answer other fetches
+    if holdings_filter is None:
+        _store_fund(fund_record, holdings, cache, archive, lazy)
+    return holdings
+
+def _store_fund(fund_record, holdings, cache=None, archive=None, lazy=False):
+    if cache is not None:
+        cache.put(fund_record.provider, fund_record.ticker, holdings, lazy=lazy)
+    if archive is not None:
+        archive.append(fund_record.provider, fund_record.ticker, holdings)
+
+def _fetch_as_completed(tickers, max_workers, per_host_limit, cache, lazy, holdings_filter, archive):
+    # Group funds into a queue per provider.  Tickers missing from the funds lists are probed for on the pool, since
+    # probing makes network requests.
+    queued_funds = {}
+    undiscovered_tickers = []
+
+    def queue_fund(ticker, fund_record):
+        """Queues a fund for download, or returns its FetchResult if it's served from the cache."""
+        if cache is not None:
+            holdings = cache.get(fund_record.provider, fund_record.ticker, lazy=lazy)
+            if holdings is not None:
+                return FetchResult(ticker, _filter_holdings(holdings, holdings_filter), None)
+        queued_funds.setdefault(fund_record.provider, deque()).append((ticker, fund_record))
+        return None
+
+    for ticker in tickers:
+        try:
+            fund_record = lookup_fund(ticker, discover=False)
+        except FundNotFoundException:
+            undiscovered_tickers.append(ticker)
+            continue
+        result = queue_fund(ticker, fund_record)
+        if result is not None:
+            yield result
+
+    in_flight_counts = {}
+    in_flight_futures = {}  # Future -> (ticker, FundRecord), with a FundRecord of None while probing for the fund
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for ticker in undiscovered_tickers:
+                in_flight_futures[executor.submit(discover_fund, ticker)] = (ticker, None)
+            while True:
+                # Top up each provider's in-flight requests without exceeding its limit
+                for provider, fund_queue in queued_funds.items():
+                    while fund_queue and in_flight_counts.get(provider, 0) < per_host_limit:
+                        ticker, fund_record = fund_queue.popleft()
+                        future = executor.submit(_download_fund, fund_record, cache, lazy, holdings_filter, archive)
+                        in_flight_futures[future] = (ticker, fund_record)
+                        in_flight_counts[provider] = in_flight_counts.get(provider, 0) + 1
+                if not in_flight_futures:
+                    break
 
-    def fetch(self):
-        return IShares().fetch(self.etf_ticker)
\ No newline at end of file
+                done_futures, _ = wait(in_flight_futures, return_when=FIRST_COMPLETED)
+                for future in done_futures:
+                    ticker, fund_record = in_flight_futures.pop(future)
+                    error = future.exception()
+                    if fund_record is None:
+                        if error is None and future.result() is None:
+                            error = FundNotFoundException(ticker)
+                        result = FetchResult(ticker, None, error) if error is not None \
+                            else queue_fund(ticker, future.result())
+                        if result is not None:
+                            yield result
+                        continue
+                    in_flight_counts[fund_record.provider] -= 1
+                    if error is None:
+                        yield FetchResult(ticker, future.result(), None)
+                    else:
+                        yield FetchResult(ticker, None, error)
+        finally:
+            # If the caller stops iterating early, don't start any funds that haven't been started yet
+            for future in in_flight_futures:
+                future.cancel()
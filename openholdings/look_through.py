@@ -0,0 +1,272 @@
+"""
+Look-through exposure of a portfolio of ETFs: the underlying securities, sectors, and asset classes it's invested in.
+
+Some funds hold other funds, listed as Equity holdings whose ticker is a fund openholdings knows about.  Those
+holdings are expanded into the held fund's own holdings, recursively.  Funds are fetched a level at a time with
+HoldingsFetcher.fetch_many(), so every fund needed at one level of nesting is fetched concurrently, and each fund's
+fully expanded exposure is memoized as a pair of arrays (security IDs and weights).  Aggregating a portfolio is then a
+matter of scaling and concatenating each position's arrays and summing them by security ID with NumPy.
+
+Cycles (a fund that directly or indirectly holds itself) are cut where they're found: the holding that closes the
+cycle is counted as a security rather than expanded again.  Since where a cycle is cut depends on which of its funds
+the expansion started from, expansions that cut a cycle aren't memoized, so each fund's exposure is the same no matter
+which funds were resolved before it.
+
+When the security master merges two IDs it's learned are the same security, the funds' holdings are re-keyed by
+canonical ID and the memoized expansions are dropped.
+
+Requires NumPy, which is installed with the `analytics` extra (`pip install openholdings[analytics]`).
+"""
+
+import threading
+from collections import namedtuple
+import numpy as np
+from .holdingsfetcher import HoldingsFetcher
+from .fetchers.registry import get_fund_index
+from .models import Equity
+from .models.holdings_table import ASSET_CLASSES, get_asset_class_code
+from .utils.security_master import SecurityMaster
+from .utils.validation import normalize_ticker
+
+SecurityExposure = namedtuple('SecurityExposure', ['security_id', 'name', 'ticker', 'sector', 'asset_class',
+    'weight', 'value'])
+"""A portfolio's exposure to one underlying security: its weight as a fraction of the portfolio, and its value as
+that fraction of the portfolio's total value."""
+
+FundComposition = namedtuple('FundComposition', ['security_ids', 'weights', 'funds'])
+"""A fund's direct holdings: arrays of the IDs and weights of the securities it holds, and a list of (fund ticker,
+weight) tuples of the funds it holds."""
+
+class LookThrough:
+    """Resolves portfolios of ETF positions into their underlying exposures.
+
+    Fetched funds and their expansions are remembered by the LookThrough object, so later portfolios that hold the
+    same funds are resolved without fetching or expanding them again.
+    """
+
+    def __init__(self, cache=None, max_depth=5, max_workers=8, per_host_limit=2, security_ids=None):
+        """
+        :param cache: An optional HoldingsCache that funds are fetched through.
+        :param max_depth: The maximum number of levels of funds held by funds to expand.  Funds nested deeper are
+            counted as securities.
+        :param max_workers: The maximum number of funds fetched at the same time.  See HoldingsFetcher.fetch_many().
+        :param per_host_limit: The maximum number of funds fetched at the same time from any single provider.
+        :param security_ids: The object that assigns securities their IDs, with get_id(holding) and
+            get_id_for_keys(keys) methods, and merge_count and canonical_ids() if it merges IDs.  Defaults to a new
+            SecurityMaster.
+        """
+        self.cache = cache
+        self.max_depth = max_depth
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.security_ids = security_ids if security_ids is not None else SecurityMaster()
+
+        self.unresolved = {}
+        """Fund ticker -> the exception raised fetching it, for funds that were counted as securities because they
+        couldn't be fetched."""
+
+        self._compositions = {}  # Fund ticker -> FundComposition
+        self._expansions = {}  # Fund ticker -> (security IDs, weights) arrays of its fully expanded exposure
+        self._securities = []  # Security ID -> (name, ticker, sector, asset class), the first value seen of each
+        self._merge_count = getattr(self.security_ids, 'merge_count', 0)  # Merge count the IDs are keyed as of
+        self._lock = threading.RLock()
+
+    def resolve(self, positions):
+        """Computes the look-through exposure of a portfolio.
+
+        :param positions: A dictionary (or iterable of pairs) of ticker -> the position's market value (or weight).
+            Tickers of funds openholdings doesn't know about are counted as securities.
+        :returns: A PortfolioExposure.
+        """
+        positions = list(positions.items() if isinstance(positions, dict) else positions)
+        total_value = sum(value for _, value in positions)
+        with self._lock:
+            self._load([ticker for ticker, _ in positions])
+            self._canonicalize()
+            security_ids = []
+            weights = []
+            for ticker, value in positions:
+                position_ids, position_weights, _ = self._expand(ticker.upper(), set())
+                security_ids.append(position_ids)
+                weights.append(position_weights * (value / total_value if total_value else 0.0))
+            exposure = np.bincount(np.concatenate(security_ids), weights=np.concatenate(weights),
+                minlength=len(self.security_ids)) if security_ids else np.zeros(len(self.security_ids))
+            return PortfolioExposure(exposure, total_value, list(self._securities))
+
+    def fund_exposure(self, ticker):
+        """Computes the look-through exposure of a single fund.  See resolve()."""
+        return self.resolve({ticker: 1.0})
+
+    def _load(self, tickers):
+        """Fetches every fund needed to expand the given tickers, a level of nesting at a time."""
+        fund_index = get_fund_index()
+        pending = {ticker.upper() for ticker in tickers}
+        depth = 0
+        while depth <= self.max_depth:
+            pending = {ticker for ticker in pending if ticker in fund_index
+                and ticker not in self._compositions and ticker not in self.unresolved}
+            if not pending:
+                return
+            held_funds = set()
+            for result in HoldingsFetcher.fetch_many(sorted(pending), max_workers=self.max_workers,
+                    per_host_limit=self.per_host_limit, cache=self.cache):
+                ticker = result.ticker.upper()
+                if result.error is not None:
+                    self.unresolved[ticker] = result.error
+                    continue
+                composition = self._compositions[ticker] = self._compose(result.holdings, fund_index)
+                held_funds.update(fund for fund, _ in composition.funds)
+            pending = held_funds
+            depth += 1
+
+    def _canonicalize(self):
+        """Re-keys the funds' holdings by canonical security ID if the security master has merged any IDs since they
+        were keyed, dropping the expansions computed from the old IDs."""
+        merge_count = getattr(self.security_ids, 'merge_count', 0)
+        if merge_count == self._merge_count:
+            return
+        canonical_ids = self.security_ids.canonical_ids()
+        for security_id, canonical_id in enumerate(canonical_ids[:len(self._securities)]):
+            if canonical_id != security_id and self._securities[security_id] is not None:
+                self._register(canonical_id, *self._securities[security_id])
+        canonical_ids = np.array(canonical_ids, dtype=np.int64)
+        self._compositions = {ticker: composition._replace(security_ids=canonical_ids[composition.security_ids])
+            for ticker, composition in self._compositions.items()}
+        self._merge_count = merge_count
+        self._expansions = {}
+
+    def _compose(self, holdings, fund_index):
+        security_ids = []
+        weights = []
+        funds = []
+        for holding in holdings:
+            weight = holding.percent_weighting
+            if not weight:
+                continue
+            if isinstance(holding, Equity) and holding.ticker:
+                ticker = normalize_ticker(holding.ticker)
+                if ticker in fund_index:
+                    funds.append((ticker, weight))
+                    continue
+            security_ids.append(self._register(self.security_ids.get_id(holding), holding.name,
+                getattr(holding, 'ticker', None), getattr(holding, 'sector', None), get_asset_class(holding)))
+            weights.append(weight)
+        return FundComposition(np.array(security_ids, dtype=np.int64), np.array(weights, dtype=np.float64), funds)
+
+    def _expand(self, ticker, expanding):
+        """Returns the IDs and weights of the securities a fund is invested in, through the funds it holds.
+
+        :param ticker: The fund's ticker.
+        :param expanding: The tickers of the funds currently being expanded, to detect cycles.
+        :returns: A (security IDs, weights, is_cut) tuple: arrays with each security ID appearing once, and whether a
+            cycle was cut anywhere in the expansion.
+        """
+        expansion = self._expansions.get(ticker)
+        if expansion is not None:
+            return expansion + (False,)
+        composition = self._compositions.get(ticker)
+        if composition is None:
+            # Not a fund, or one that couldn't be fetched or is nested too deeply to expand
+            return np.array([self._get_ticker_security_id(ticker)], dtype=np.int64), np.ones(1), False
+
+        expanding.add(ticker)
+        security_ids = [composition.security_ids]
+        weights = [composition.weights]
+        is_cut = False
+        for fund, fund_weight in composition.funds:
+            if fund in expanding:
+                fund_ids, fund_weights = np.array([self._get_ticker_security_id(fund)], dtype=np.int64), np.ones(1)
+                is_cut = True
+            else:
+                fund_ids, fund_weights, is_fund_cut = self._expand(fund, expanding)
+                is_cut = is_cut or is_fund_cut
+            security_ids.append(fund_ids)
+            weights.append(fund_weights * fund_weight)
+        expanding.discard(ticker)
+
+        unique_ids, inverse = np.unique(np.concatenate(security_ids), return_inverse=True)
+        expansion = (unique_ids, np.bincount(inverse, weights=np.concatenate(weights), minlength=len(unique_ids)))
+        # Where a cycle is cut depends on which fund the expansion started from, so only whole expansions are reused
+        if not is_cut:
+            self._expansions[ticker] = expansion
+        return expansion + (is_cut,)
+
+    def _get_ticker_security_id(self, ticker):
+        return self._register(self.security_ids.get_id_for_keys([('ticker', ticker)]), ticker, ticker, None,
+            'Equity')
+
+    def _register(self, security_id, name, ticker, sector, asset_class):
+        """Records the attributes of a security, keeping the first value seen of each."""
+        while len(self._securities) <= security_id:
+            self._securities.append(None)
+        attributes = self._securities[security_id]
+        if attributes is None:
+            self._securities[security_id] = (name, ticker, sector, asset_class)
+        elif None in attributes:
+            self._securities[security_id] = tuple(value if value is not None else new_value
+                for value, new_value in zip(attributes, (name, ticker, sector, asset_class)))
+        return security_id
+
+class PortfolioExposure:
+    """The look-through exposure of a portfolio, as weights indexed by security ID."""
+
+    def __init__(self, weights, total_value, securities):
+        """
+        :param weights: A numpy.ndarray of the portfolio's weight in each security, indexed by security ID.
+        :param total_value: The sum of the portfolio's positions.
+        :param securities: A list of the (name, ticker, sector, asset class) of each security, indexed by ID.
+        """
+        self.weights = weights
+        self.total_value = total_value
+        self.securities = securities
+
+    def by_security(self, top_n=None):
+        """Lists the securities the portfolio is exposed to.
+
+        :param top_n: If given, only this many of the securities with the largest weights are listed.
+        :returns: A list of SecurityExposures, in order of descending weight.
+        """
+        security_ids = np.flatnonzero(self.weights)
+        security_ids = security_ids[np.argsort(-self.weights[security_ids], kind='stable')]
+        if top_n is not None:
+            security_ids = security_ids[:top_n]
+        exposures = []
+        for security_id in security_ids.tolist():
+            name, ticker, sector, asset_class = self.securities[security_id] or (None, None, None, None)
+            weight = float(self.weights[security_id])
+            exposures.append(SecurityExposure(security_id, name, ticker, sector, asset_class, weight,
+                weight * self.total_value))
+        return exposures
+
+    def by_sector(self):
+        """Sums the portfolio's exposure by sector.
+
+        :returns: A dictionary of sector -> weight, with securities without a sector under None.
+        """
+        return self.aggregate_by(2)
+
+    def by_asset_class(self):
+        """Sums the portfolio's exposure by asset class.
+
+        :returns: A dictionary of asset class ('Equity', 'Bond', 'Future', or 'Cash') -> weight.
+        """
+        return self.aggregate_by(3)
+
+    def aggregate_by(self, attribute_index):
+        labels = [security[attribute_index] if security is not None else None for security in self.securities]
+        label_values, label_codes = unique_labels(labels)
+        totals = np.bincount(label_codes, weights=self.weights[:len(label_codes)], minlength=len(label_values))
+        return {label: float(total) for label, total in zip(label_values, totals) if total}
+
+def get_asset_class(holding):
+    """Returns the name of a holding's asset class ('Equity', 'Bond', 'Future', or 'Cash'), including for lazy views of
+    holdings."""
+    code = get_asset_class_code(type(holding))
+    return ASSET_CLASSES[code] if code >= 0 else type(holding).__name__
+
+def unique_labels(labels):
+    """Dictionary-encodes a list of labels into (distinct labels, array of each label's code)."""
+    codes = {}
+    label_codes = np.fromiter((codes.setdefault(label, len(codes)) for label in labels), dtype=np.int64,
+        count=len(labels))
+    return list(codes), label_codes
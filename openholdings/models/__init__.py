@@ -3,5 +3,6 @@ from .equity import Equity
 from .bond import Bond
 from .future import Future
 from .cash import Cash
+from .holdings_table import HoldingsTable
 
-__all__ = [Holding, Equity, Bond, Future, Cash]
\ No newline at end of file
+__all__ = [Holding, Equity, Bond, Future, Cash, HoldingsTable]
\ No newline at end of file
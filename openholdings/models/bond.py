@@ -4,28 +4,32 @@ from .holding import Holding
 class Bond(Holding):
     """A holding in the form of a bond, some fixed income security such as a bill, note, or long-term loan."""
 
-    def __init__(self, name):
-        super().__init__(name)
+    __slots__ = ('coupon_rate', 'rating', 'effective_date', 'maturity_date', 'next_call_date', 'quantity_held',
+        'sector')
 
-        self.coupon_rate = None
+    def __init__(self, name, coupon_rate=None, rating=None, effective_date=None, maturity_date=None,
+            next_call_date=None, quantity_held=None, sector=None, **holding_fields):
+        super().__init__(name, **holding_fields)
+
+        self.coupon_rate = coupon_rate
         """The coupon rate of this bond."""
 
-        self.rating = None
+        self.rating = rating
         """The rating of this bond."""
 
-        self.effective_date = None
+        self.effective_date = effective_date
         """The date at which this bond was issued."""
 
-        self.maturity_date = None
+        self.maturity_date = maturity_date
         """The future date when this bond will mature."""
 
-        self.next_call_date = None
+        self.next_call_date = next_call_date
         """The next upcoming call date for the bond."""
 
-        self.quantity_held = None
+        self.quantity_held = quantity_held
         """The quantity of this bond held by the fund."""
 
-        self.sector = None
+        self.sector = sector
         """The sector to which the bond belongs."""
 
     def __repr__(self):
@@ -3,10 +3,12 @@ from .holding import Holding
 class Cash(Holding):
     """A holding in the form of cash or an otherwise highly liquid account."""
 
-    def __init__(self, name):
-        super().__init__(name)
+    __slots__ = ('currency',)
 
-        self.currency = 'USD'
+    def __init__(self, name, currency='USD', **holding_fields):
+        super().__init__(name, **holding_fields)
+
+        self.currency = currency
         """The currency of this cash holding."""
 
     def __repr__(self):
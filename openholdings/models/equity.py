@@ -3,16 +3,18 @@ from .holding import Holding
 class Equity(Holding):
     """A holding in the form of an equity, stock held in a company."""
 
-    def __init__(self, name):
-        super().__init__(name)
+    __slots__ = ('ticker', 'num_shares', 'sector')
 
-        self.ticker = None
+    def __init__(self, name, ticker=None, num_shares=None, sector=None, **holding_fields):
+        super().__init__(name, **holding_fields)
+
+        self.ticker = ticker
         """The ticker symbol for the equity."""
 
-        self.num_shares = None
+        self.num_shares = num_shares
         """The number of shares the ETF holds of this equity."""
 
-        self.sector = None
+        self.sector = sector
         """The sector to which the equity belongs."""
 
     def __repr__(self):
@@ -4,16 +4,18 @@ from .holding import Holding
 class Future(Holding):
     """A holding in the form of a futures contract, likely for a currency or a commodity."""
 
-    def __init__(self, name):
-        super().__init__(name)
+    __slots__ = ('contract_code', 'contract_expiry_date', 'quantity_held')
 
-        self.contract_code = None
+    def __init__(self, name, contract_code=None, contract_expiry_date=None, quantity_held=None, **holding_fields):
+        super().__init__(name, **holding_fields)
+
+        self.contract_code = contract_code
         """A four- or five-character code uniquely identifying the futures contract."""
 
-        self.contract_expiry_date = None
+        self.contract_expiry_date = contract_expiry_date
         """The date at which this futures contract expires."""
 
-        self.quantity_held = None
+        self.quantity_held = quantity_held
         """The number of futures contracts of this type that are held."""
 
     def __repr__(self):
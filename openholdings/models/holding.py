@@ -1,25 +1,33 @@
 class Holding:
-    """A single holding in a fund.  Subclasses of Holding include Equity, Bond, and Cash."""
+    """A single holding in a fund.  Subclasses of Holding include Equity, Bond, and Cash.
+
+    Holdings declare their fields in __slots__ rather than keeping a per-instance __dict__, since a fund can have
+    thousands of them.  Every field can be given as a keyword argument, so a holding can be built in a single step.
+    """
+
+    __slots__ = ('name', 'identifier_cusip', 'identifier_isin', 'identifier_figi', 'identifier_sedol',
+        'percent_weighting', 'market_value')
     
-    def __init__(self, name):
+    def __init__(self, name, identifier_cusip=None, identifier_isin=None, identifier_figi=None, identifier_sedol=None,
+            percent_weighting=None, market_value=None):
         self.name = name
         """The name of the security."""
 
-        self.identifier_cusip = None
+        self.identifier_cusip = identifier_cusip
         """The CUSIP identifier for the security, if available and applicable."""
 
-        self.identifier_isin = None
+        self.identifier_isin = identifier_isin
         """The ISIN identifier for the security, if available and applicable."""
 
-        self.identifier_figi = None
+        self.identifier_figi = identifier_figi
         """The FIGI identifier for the security, if available and applicable."""
 
-        self.identifier_sedol = None
+        self.identifier_sedol = identifier_sedol
         """The SEDOL identifier for the security, if available and applicable."""
 
-        self.percent_weighting = None
+        self.percent_weighting = percent_weighting
         """The percentage of the fund's resources that are contributed to this holding."""
 
-        self.market_value = None
+        self.market_value = market_value
         """The total market value of this holding.  In almost all cases this will be in US Dollars unless 
-        otherwise indicated by the Cash object's currency field."""
\ No newline at end of file
+        otherwise indicated by the Cash object's currency field."""
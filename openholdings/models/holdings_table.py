@@ -0,0 +1,185 @@
+from array import array
+from .equity import Equity
+from .bond import Bond
+from .future import Future
+from .cash import Cash
+
+# Asset class code -> holding type stored in a HoldingsTable's 'asset_class' column
+ASSET_CLASSES = ('Equity', 'Bond', 'Future', 'Cash')
+ASSET_CLASS_CODES = {Equity: 0, Bond: 1, Future: 2, Cash: 3}
+
+_asset_class_codes_by_type = dict(ASSET_CLASS_CODES)  # Every holding type seen -> its asset class code
+
+NUMERIC_COLUMNS = ('percent_weighting', 'market_value', 'num_shares', 'quantity_held', 'coupon_rate')
+STRING_COLUMNS = ('name', 'ticker', 'identifier_cusip', 'identifier_isin', 'identifier_sedol', 'sector', 'currency')
+
+class DictionaryColumn:
+    """A column of strings stored as integer codes into a list of its distinct values.
+
+    A code of -1 represents a missing value.
+    """
+
+    def __init__(self):
+        self.codes = array('i')
+        """The code of each row's value, as an index into `values`."""
+
+        self.values = []
+        """The distinct values of the column, in order of first appearance."""
+
+        self._value_codes = {}
+
+    @classmethod
+    def from_codes(cls, codes, values):
+        """Builds a column from existing codes and distinct values, i.e. ones read back from a SnapshotArchive.
+
+        :param codes: An array('i') of the code of each row's value.
+        :param values: The list of distinct values the codes index into.
+        :returns: A DictionaryColumn.
+        """
+        column = cls()
+        column.codes = codes
+        column.values = list(values)
+        column._value_codes = {value: code for code, value in enumerate(column.values)}
+        return column
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self._value_codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._value_codes[value] = code
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+        return self.values[code] if code >= 0 else None
+
+    def __len__(self):
+        return len(self.codes)
+
+class HoldingsTable:
+    """A columnar representation of a fund's holdings.
+
+    Rather than one Holding object per security, each field is stored as a single typed array: numeric fields as
+    arrays of doubles (NaN where the field doesn't apply), string fields as dictionary-encoded DictionaryColumns, and
+    the holding type as a small integer code into ASSET_CLASSES (-1 if it's none of them).  The arrays can be handed
+    to NumPy, Arrow, or pandas without copying the numeric data, so aggregations over many funds can be vectorized.
+    """
+
+    def __init__(self, ticker=None):
+        """
+        :param ticker: The ticker of the fund whose holdings the table contains.
+        """
+        self.ticker = ticker
+        self.asset_class = array('b')
+        self.numeric_columns = {column: array('d') for column in NUMERIC_COLUMNS}
+        self.string_columns = {column: DictionaryColumn() for column in STRING_COLUMNS}
+
+    @classmethod
+    def from_holdings(cls, holdings, ticker=None):
+        """Builds a table from Holdings as they're produced, i.e. by a fetcher's fetch_iter(), without first
+        collecting them into a list.
+
+        :param holdings: An iterable of Holdings.
+        :param ticker: The ticker of the fund the holdings belong to.
+        :returns: A HoldingsTable with one row per holding.
+        """
+        table = cls(ticker)
+        for holding in holdings:
+            table.append(holding)
+        return table
+
+    def append(self, holding):
+        """Adds a holding to the end of the table.
+
+        :param holding: An Equity, Bond, Future, or Cash object.
+        """
+        self.asset_class.append(get_asset_class_code(type(holding)))
+        for column, values in self.numeric_columns.items():
+            value = getattr(holding, column, None)
+            values.append(float(value) if value is not None else float('nan'))
+        for column, values in self.string_columns.items():
+            values.append(getattr(holding, column, None))
+
+    def __len__(self):
+        return len(self.asset_class)
+
+    def __getitem__(self, column):
+        """Returns a column by name: an array('d') for numeric columns, a DictionaryColumn for string columns, or
+        an array('b') of codes into ASSET_CLASSES for the 'asset_class' column."""
+        if column == 'asset_class':
+            return self.asset_class
+        if column in self.numeric_columns:
+            return self.numeric_columns[column]
+        return self.string_columns[column]
+
+    def to_numpy(self):
+        """Converts the table into a dictionary of column name -> NumPy array.
+
+        Numeric columns and the asset class code column share memory with the table.  String columns are decoded
+        into object arrays, with None for missing values.  Requires NumPy to be installed.
+
+        :returns: A dictionary of column name -> numpy.ndarray.
+        """
+        import numpy as np
+        columns = {'asset_class': np.frombuffer(self.asset_class, dtype=np.int8)}
+        for column, values in self.numeric_columns.items():
+            columns[column] = np.frombuffer(values, dtype=np.float64)
+        for column, values in self.string_columns.items():
+            codes = np.frombuffer(values.codes, dtype=np.int32)
+            decoded = np.array(values.values + [None], dtype=object)
+            columns[column] = decoded[codes]  # Code -1 selects the trailing None
+        return columns
+
+    def to_arrow(self):
+        """Converts the table into a pyarrow.Table, keeping string columns dictionary-encoded.
+
+        Requires NumPy and pyarrow to be installed.
+
+        :returns: A pyarrow.Table with one column per field.
+        """
+        import numpy as np
+        import pyarrow as pa
+        asset_class_codes = np.frombuffer(self.asset_class, dtype=np.int8)
+        arrays = [pa.DictionaryArray.from_arrays(pa.array(asset_class_codes, mask=asset_class_codes < 0),
+            pa.array(ASSET_CLASSES))]
+        names = ['asset_class']
+        for column, values in self.numeric_columns.items():
+            arrays.append(pa.array(np.frombuffer(values, dtype=np.float64)))
+            names.append(column)
+        for column, values in self.string_columns.items():
+            codes = np.frombuffer(values.codes, dtype=np.int32)
+            indices = pa.array(codes, type=pa.int32(), mask=codes < 0)
+            arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(values.values, type=pa.string())))
+            names.append(column)
+        return pa.Table.from_arrays(arrays, names=names)
+
+    def to_pandas(self):
+        """Converts the table into a pandas.DataFrame, with string columns as Categoricals.
+
+        Requires NumPy and pandas to be installed.
+
+        :returns: A pandas.DataFrame with one row per holding.
+        """
+        import numpy as np
+        import pandas as pd
+        columns = {'asset_class': pd.Categorical.from_codes(np.frombuffer(self.asset_class, dtype=np.int8), ASSET_CLASSES)}
+        for column, values in self.numeric_columns.items():
+            columns[column] = np.frombuffer(values, dtype=np.float64)
+        for column, values in self.string_columns.items():
+            codes = np.frombuffer(values.codes, dtype=np.int32)
+            columns[column] = pd.Categorical.from_codes(codes, pd.Index(values.values, dtype=object))
+        return pd.DataFrame(columns)
+
+def get_asset_class_code(holding_type):
+    """Returns the code of a holding type's asset class in ASSET_CLASSES, found through the type's base classes so that
+    subclasses (i.e. LazyEquity views) have the same code as the holding type they extend, or -1 if it's none of them.
+    """
+    code = _asset_class_codes_by_type.get(holding_type)
+    if code is None:
+        code = next((ASSET_CLASS_CODES[cls] for cls in holding_type.__mro__ if cls in ASSET_CLASS_CODES), -1)
+        _asset_class_codes_by_type[holding_type] = code
+    return code
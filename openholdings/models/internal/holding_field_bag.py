@@ -3,32 +3,33 @@ class HoldingFieldBag:
 
     An object of this type is created as an intermediate step in parsing individual ETF providers' holdings list documents,
     and based on the presence and value of certain fields, they are eventually copied into a concrete Holding instance
-    (either an Equity, Bond, Future, or Cash object)."""
+    (either an Equity, Bond, Future, or Cash object).
 
-    def __init__(self):
+    Parsers can skip this intermediate step by describing a holding with a plain dictionary of fields and passing it
+    to holding_factory.create_holding_from_fields()."""
+
+    __slots__ = (
         # Generic holding fields
-        self.name = None
-        self.identifier_cusip = None
-        self.identifier_isin = None
-        self.identifier_figi = None
-        self.identifier_sedol = None
-        self.percent_weighting = None
-        self.market_value = None
+        'name', 'identifier_cusip', 'identifier_isin', 'identifier_figi', 'identifier_sedol', 'percent_weighting',
+        'market_value',
         # Equity-specific fields
-        self.ticker = None
-        self.num_shares = None
+        'ticker', 'num_shares',
         # Bond-specific fields
-        self.coupon_rate = None
-        self.rating = None
-        self.effective_date = None
-        self.maturity_date = None
-        self.next_call_date = None
+        'coupon_rate', 'rating', 'effective_date', 'maturity_date', 'next_call_date',
         # Bond and Equity shared fields
-        self.sector = None
+        'sector',
         # Future-specific fields
-        self.contract_code = None
-        self.contract_expiry_date = None
+        'contract_code', 'contract_expiry_date',
         # Bond and Future shared fields
-        self.quantity_held = None
+        'quantity_held',
         # Cash-specific fields
-        self.currency = None
\ No newline at end of file
+        'currency',
+    )
+
+    def __init__(self):
+        for field in self.__slots__:
+            setattr(self, field, None)
+
+    def as_dict(self):
+        """Returns the fields that have been set in the bag as a dictionary of field name -> value."""
+        return {field: getattr(self, field) for field in self.__slots__ if getattr(self, field) is not None}
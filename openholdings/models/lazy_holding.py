@@ -0,0 +1,57 @@
+from .equity import Equity
+from .bond import Bond
+from .future import Future
+from .cash import Cash
+
+class LazyHolding:
+    """A mixin that turns a Holding subclass into a lightweight view over a raw row of a holdings file.
+
+    A lazy holding is constructed without setting any of its fields.  The first time a field is read, the slot is
+    still empty, so Python falls back to __getattr__(), which converts the field from the raw row using the field's
+    decoder and stores the result in the slot.  Every later read of the field is an ordinary slot lookup.
+
+    Fields without a decoder are None.  Since conversion and validation are deferred, a malformed value in the raw row
+    raises when its field is first read rather than when the holdings file is parsed.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, row, decoders):
+        """
+        :param row: The raw row of the holdings file the holding was read from.
+        :param decoders: A dictionary of field name -> function that converts the raw row into the field's value.
+        """
+        self._row = row
+        self._decoders = decoders
+
+    def __getattr__(self, field):
+        # Only called when a slot hasn't been set yet
+        if field.startswith('_') or field not in type(self).field_names:
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, field))
+        decode = self._decoders.get(field)
+        value = decode(self._row) if decode is not None else None
+        setattr(self, field, value)
+        return value
+
+def get_field_names(holding_type):
+    return frozenset(field for cls in holding_type.__mro__ for field in getattr(cls, '__slots__', ())
+        if not field.startswith('_'))
+
+class LazyEquity(LazyHolding, Equity):
+    """An Equity whose fields are decoded from its raw row on first access."""
+    __slots__ = ('_row', '_decoders')
+
+class LazyBond(LazyHolding, Bond):
+    """A Bond whose fields are decoded from its raw row on first access."""
+    __slots__ = ('_row', '_decoders')
+
+class LazyFuture(LazyHolding, Future):
+    """A Future whose fields are decoded from its raw row on first access."""
+    __slots__ = ('_row', '_decoders')
+
+class LazyCash(LazyHolding, Cash):
+    """A Cash holding whose fields are decoded from its raw row on first access."""
+    __slots__ = ('_row', '_decoders')
+
+for lazy_holding_type in (LazyEquity, LazyBond, LazyFuture, LazyCash):
+    lazy_holding_type.field_names = get_field_names(lazy_holding_type)
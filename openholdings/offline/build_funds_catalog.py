@@ -0,0 +1,19 @@
+"""
+Stand-alone script that compiles every provider's funds list CSV file into a single `funds_catalog.json` file saved
+locally within the same folder.  The fund registry loads this catalog in place of the individual CSV files.
+
+The download scripts keep the catalog up to date incrementally, so this script is only needed after a funds list
+CSV file is edited by hand.
+
+To run: python build_funds_catalog.py
+"""
+
+from utils.catalog_writing import build_catalog
+
+def main():
+    print('Compiling funds lists into catalog...')
+    fund_count = build_catalog()
+    print('Done! Catalog contains {} funds.'.format(fund_count))
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ To run: python download_etfmg_funds_list.py
 import requests
 from bs4 import BeautifulSoup
 from utils.csv_writing import write_funds_to_csv
+from utils.catalog_writing import refresh_catalog_provider, print_catalog_changes
 
 def main():
     funds = []
@@ -17,6 +18,7 @@ def main():
         funds.append([fund_link_element.get_text(), fund_link_element['href']])
 
     write_funds_to_csv(funds, 'etfmg_funds.csv')
+    print_catalog_changes(refresh_catalog_provider('etfmg', funds))
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
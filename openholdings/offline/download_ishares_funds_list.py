@@ -20,6 +20,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from utils.csv_writing import write_funds_to_csv
+from utils.catalog_writing import refresh_catalog_provider, print_catalog_changes
 
 def main():
     chrome_options = Options()
@@ -52,6 +53,8 @@ def main():
 
     print('Writing fund ticker symbols and URLs to csv file...')
     write_funds_to_csv(funds, 'ishares_funds.csv')
+    print('Updating funds catalog...')
+    print_catalog_changes(refresh_catalog_provider('ishares', funds))
     print('Done!')
 
 if __name__ == '__main__':
@@ -0,0 +1,185 @@
+"""
+Builds and incrementally refreshes `funds_catalog.json`, the compiled catalog of every provider's funds list.
+
+The catalog is a single compact JSON document that the fund registry loads instead of parsing each provider's CSV
+file.  Funds are stored as three parallel columns sorted by ticker:
+
+    {
+        "format": 2,
+        "version": 12,                   <- bumped whenever any fund is added, removed, or changed
+        "build_date": "2021-10-23T18:04:11",
+        "providers": ["ishares", ...],   <- in order of precedence
+        "revisions": {"ishares": 4, ...},  <- bumped only when that provider's funds change
+        "checksums": {"ishares": 2913645081, ...},  <- CRC-32 of each funds list the catalog was compiled from
+        "tickers": ["AAA", "AAXJ", ...],
+        "provider_ids": [0, 0, ...],     <- index into "providers"
+        "urls": ["https://...", ...]
+    }
+
+A ticker listed by more than one provider belongs to the provider with the highest precedence, so the owner of every
+ticker is always resolved from all of the funds lists together.  That way a provider that loses a ticker to another
+(or gets one back when the other drops it) has its revision bumped too.
+
+Providers and their order of precedence are taken from the fund registry.
+"""
+
+import os
+import csv
+import json
+import sys
+from datetime import datetime
+
+# The offline scripts are run from their own folder rather than as part of the package, so the package's parent
+# folder is made importable to share the fund registry's list of providers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', '..', '..'))
+from openholdings.fetchers.registry import (PROVIDERS, CATALOG_FILE_NAME, CATALOG_FORMAT, get_funds_list_path,
+    get_funds_list_checksum)
+
+# Provider name -> funds list CSV file, in the fund registry's order of precedence
+PROVIDER_FUNDS_LISTS = [(provider, csv_file_name) for provider, (csv_file_name, _, _) in PROVIDERS.items()]
+PROVIDER_NAMES = [provider for provider, _ in PROVIDER_FUNDS_LISTS]
+
+def read_funds_from_csv(csv_file_name):
+    csv_file_path = get_funds_list_path(csv_file_name)
+    if not os.path.exists(csv_file_path):
+        return []
+    with open(csv_file_path, mode='r', encoding='utf-8') as funds_file:
+        reader = csv.reader(funds_file)
+        next(reader, None)  # Skip 'Ticker', 'URL' header row
+        return [fund for fund in reader if fund]
+
+def read_funds_checksums():
+    """Returns a dictionary of provider name -> the checksum of its funds list CSV file, or None if it has none."""
+    return {provider: get_funds_list_checksum(get_funds_list_path(csv_file_name))
+        for provider, csv_file_name in PROVIDER_FUNDS_LISTS}
+
+def resolve_funds(provider_funds_lists):
+    """Resolves the owner of every ticker across the providers' funds lists by order of precedence.
+
+    :param provider_funds_lists: A dictionary of provider name -> list of [ticker, url] pairs.
+    :returns: A dictionary of (upper-cased) ticker -> (provider, url).
+    """
+    funds = {}
+    for provider in PROVIDER_NAMES:
+        for ticker, url in provider_funds_lists.get(provider, ()):
+            funds.setdefault(ticker.upper(), (provider, url))
+    return funds
+
+def load_catalog():
+    """Reads the compiled catalog back into its version, provider revisions, funds, and funds list checksums.
+
+    :returns: A (version, revisions, funds, checksums) tuple where funds is a dictionary of ticker -> (provider, url),
+        or None if the catalog hasn't been built yet.
+    """
+    catalog_file_path = get_funds_list_path(CATALOG_FILE_NAME)
+    if not os.path.exists(catalog_file_path):
+        return None
+    with open(catalog_file_path, mode='r', encoding='utf-8') as catalog_file:
+        catalog = json.load(catalog_file)
+    providers = catalog['providers']
+    funds = {}
+    for ticker, provider_id, url in zip(catalog['tickers'], catalog['provider_ids'], catalog['urls']):
+        funds[ticker] = (providers[provider_id], url)
+    return catalog['version'], catalog['revisions'], funds, catalog.get('checksums', {})
+
+def write_catalog(version, revisions, funds, checksums):
+    """Writes the catalog, replacing the previous one atomically so that readers never see a partial file.
+
+    :param version: The catalog version number.
+    :param revisions: A dictionary of provider name -> revision number.
+    :param funds: A dictionary of ticker -> (provider, url).
+    :param checksums: A dictionary of provider name -> the checksum of the funds list the catalog was compiled from.
+    """
+    tickers = sorted(funds)
+    catalog = {
+        'format': CATALOG_FORMAT,
+        'version': version,
+        'build_date': datetime.now().replace(microsecond=0).isoformat(),
+        'providers': PROVIDER_NAMES,
+        'revisions': {provider: revisions[provider] for provider in PROVIDER_NAMES if provider in revisions},
+        'checksums': checksums,
+        'tickers': tickers,
+        'provider_ids': [PROVIDER_NAMES.index(funds[ticker][0]) for ticker in tickers],
+        'urls': [funds[ticker][1] for ticker in tickers],
+    }
+    catalog_file_path = get_funds_list_path(CATALOG_FILE_NAME)
+    temp_file_path = catalog_file_path + '.tmp'
+    with open(temp_file_path, mode='w', encoding='utf-8') as catalog_file:
+        json.dump(catalog, catalog_file, separators=(',', ':'))
+    os.replace(temp_file_path, catalog_file_path)
+
+def update_catalog(funds):
+    """Replaces the catalog's funds, bumping the catalog version and the revision of every provider that gained,
+    lost, or changed a fund.
+
+    The file is only rewritten if a fund changed or a funds list's checksum differs from the one recorded, so
+    consumers keyed on the version or a revision stay valid across no-op refreshes.
+
+    :param funds: A dictionary of ticker -> (provider, url) resolved from every provider's funds list.
+    :returns: The set of names of the providers whose funds changed.
+    """
+    version, revisions, existing_funds, existing_checksums = load_catalog() or (0, {}, {}, {})
+    checksums = read_funds_checksums()
+    changed_providers = {provider for ticker, (provider, url) in funds.items() ^ existing_funds.items()}
+    if changed_providers or version == 0:
+        for provider in changed_providers:
+            revisions[provider] = revisions.get(provider, 0) + 1
+        write_catalog(version + 1, revisions, funds, checksums)
+    elif checksums != existing_checksums:
+        write_catalog(version, revisions, funds, checksums)
+    return changed_providers
+
+def build_catalog():
+    """Builds the catalog from scratch out of every provider's funds list CSV file.
+
+    :returns: The number of funds in the catalog.
+    """
+    funds = resolve_funds({provider: read_funds_from_csv(csv_file_name)
+        for provider, csv_file_name in PROVIDER_FUNDS_LISTS})
+    update_catalog(funds)
+    return len(funds)
+
+def refresh_catalog_provider(provider, provider_funds):
+    """Applies a provider's latest funds list to the catalog.
+
+    Every ticker's owner is resolved again from the new list and the other providers' funds list CSV files, so a
+    ticker the provider takes over from a lower precedence provider (or gives back to it) changes both providers'
+    revisions.  Nothing is bumped (and the file isn't rewritten) if no fund was added, removed, renamed, or moved to a
+    new URL.
+
+    :param provider: The name of the provider whose funds list was downloaded.
+    :param provider_funds: A list of [ticker, url] pairs making up the provider's current funds list.
+    :returns: A dictionary with 'added', 'removed', 'renamed', and 'moved' lists describing the changes to the
+        provider's funds.
+    """
+    _, _, funds, _ = load_catalog() or (0, {}, {}, {})
+    provider_funds_lists = {name: read_funds_from_csv(csv_file_name) for name, csv_file_name in PROVIDER_FUNDS_LISTS}
+    provider_funds_lists[provider] = provider_funds
+    new_catalog_funds = resolve_funds(provider_funds_lists)
+
+    old_funds = {ticker: url for ticker, (owner, url) in funds.items() if owner == provider}
+    new_funds = {ticker: url for ticker, (owner, url) in new_catalog_funds.items() if owner == provider}
+
+    added = sorted(set(new_funds) - set(old_funds))
+    removed = sorted(set(old_funds) - set(new_funds))
+    moved = sorted(ticker for ticker in set(new_funds) & set(old_funds) if new_funds[ticker] != old_funds[ticker])
+
+    # A fund whose ticker changed but whose URL didn't is reported as a rename rather than a removal and addition
+    removed_by_url = {old_funds[ticker]: ticker for ticker in removed}
+    renamed = [(removed_by_url[new_funds[ticker]], ticker) for ticker in added if new_funds[ticker] in removed_by_url]
+    for old_ticker, new_ticker in renamed:
+        added.remove(new_ticker)
+        removed.remove(old_ticker)
+
+    update_catalog(new_catalog_funds)
+    return {'added': added, 'removed': removed, 'renamed': renamed, 'moved': moved}
+
+def print_catalog_changes(changes):
+    for ticker in changes['added']:
+        print('  + {}'.format(ticker))
+    for ticker in changes['removed']:
+        print('  - {}'.format(ticker))
+    for old_ticker, new_ticker in changes['renamed']:
+        print('  {} -> {}'.format(old_ticker, new_ticker))
+    for ticker in changes['moved']:
+        print('  ~ {}'.format(ticker))
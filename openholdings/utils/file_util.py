@@ -1,22 +1,290 @@
+"""
+Downloading of holdings list files.
+
+Requests are made through HTTP sessions that are shared for the lifetime of the process: one requests.Session per
+provider host (scheme + domain), and one aiohttp.ClientSession per event loop.  Sessions keep connections alive
+between fetches, so fetching many funds from the same provider only pays the TCP and TLS handshake once per pooled
+connection.  Responses are negotiated with gzip/deflate compression and read in chunks into an in-memory buffer that
+fetchers parse directly, without writing anything to the working directory.
+
+Downloads can optionally go through a persistent HttpCache (see `enable_http_cache`), in which case unchanged
+holdings files are served from disk instead of being downloaded again.
+
+aiohttp is only imported once an asynchronous download is made, so blocking fetches don't require it to be installed.
+"""
+
+import io
+import threading
+import tempfile
+import hashlib
+import weakref
+import asyncio
+from contextlib import contextmanager
+from io import BytesIO
+from urllib.parse import urlsplit
 import requests
-import os
+from requests.adapters import HTTPAdapter
+from .http_cache import HttpCache
+
+REQUEST_HEADERS = {'User-Agent': 'Mozilla/5.0', 'Accept-Encoding': 'gzip, deflate'}
+
+# Seconds allowed to establish a connection, and to wait between bytes of the response
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+
+# Maximum number of keep-alive connections pooled per provider host
+POOL_MAXSIZE = 8
+
+# Size in bytes of the chunks response bodies are read in
+CHUNK_SIZE = 64 * 1024
+
+# Whether downloaded holdings files are written to a temporary file instead of being kept in memory
+SPOOL_TO_DISK = False
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_async_sessions = weakref.WeakKeyDictionary()
+_http_cache = None
+
+def configure_http(connect_timeout=None, read_timeout=None, pool_maxsize=None, spool_to_disk=None):
+    """Changes the timeouts, connection pool size, and buffering used for downloading holdings files.
+
+    Changes to the pool size only apply to sessions created afterwards, so this should be called before fetching.
+
+    :param connect_timeout: Seconds allowed to establish a connection to a provider's host.
+    :param read_timeout: Seconds allowed to wait for the next bytes of a response.
+    :param pool_maxsize: Maximum number of keep-alive connections pooled per provider host.
+    :param spool_to_disk: Whether downloaded holdings files are written to temporary files instead of memory.
+    """
+    global CONNECT_TIMEOUT, READ_TIMEOUT, POOL_MAXSIZE, SPOOL_TO_DISK
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+    if pool_maxsize is not None:
+        POOL_MAXSIZE = pool_maxsize
+    if spool_to_disk is not None:
+        SPOOL_TO_DISK = spool_to_disk
+
+def get_session(url):
+    """Returns the shared session for the host a URL points to, creating it on first use.
 
-def download_holdings_file(holdings_file_url, file_extension, ticker):
-    """Download a holdings list file (CSV, Excel, PDF, Json) from a URL and save it locally.
+    The session's connection pool is thread-safe, so the same session is used by every thread fetching from a host.
+
+    :param url: A URL on the host to get a session for.
+    :returns: A requests.Session with a keep-alive connection pool for the URL's host.
+    """
+    url_parts = urlsplit(url)
+    host = '{}://{}'.format(url_parts.scheme, url_parts.netloc)
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                session.headers.update(REQUEST_HEADERS)
+                session.mount(host, HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE))
+                _sessions[host] = session
+    return session
+
+def close_sessions():
+    """Closes every shared session, releasing their pooled connections."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+def enable_http_cache(cache_dir=None, ttl=3600, max_size=512 * 1024 * 1024):
+    """Routes every holdings file download through a persistent on-disk cache.
+
+    :param cache_dir: The directory to store cached files in, which may be shared by several processes.  Defaults
+        to the OPENHOLDINGS_CACHE_DIR environment variable, or `~/.cache/openholdings/http` if it isn't set.
+    :param ttl: Seconds a cached file is served without revalidating it with the provider.
+    :param max_size: Maximum total size in bytes of cached holdings files.
+    :returns: The HttpCache that downloads now go through.
+    """
+    global _http_cache
+    _http_cache = HttpCache(cache_dir, ttl, max_size)
+    return _http_cache
+
+def disable_http_cache():
+    """Stops routing downloads through the on-disk cache.  Files already in the cache are left in place."""
+    global _http_cache
+    _http_cache = None
+
+def open_holdings_file(holdings_file_url, spool_to_disk=None):
+    """Download a holdings list file (CSV, Excel, PDF, Json) from a URL into a binary file object.
+
+    By default the file is held in memory, so nothing is written to the working directory and concurrent fetches of
+    the same fund can't interfere with one another.  Very large files can instead be spooled to an anonymous
+    temporary file, which the operating system deletes as soon as it's closed.
 
     :param holdings_file_url: The URL from which the holdings file can be downloaded.
-    :param file_extension: The expected file type ('csv', 'xlsx', 'pdf', 'json').
-    :param ticker: The fund ticker symbol to ensure a unique file name when saved.
-    :returns: The filename of the downloaded holdings file.
+    :param spool_to_disk: Whether to write the file to a temporary file rather than keep it in memory.  Defaults
+        to the SPOOL_TO_DISK setting.
+    :returns: A binary file object positioned at the start of the holdings file.  Should be closed by the caller.
+    :raises requests.HTTPError: If the provider responds with an error status.
     """
-    r = requests.get(holdings_file_url, headers={'User-Agent': 'Mozilla/5.0'}, allow_redirects=True)
-    filename = 'holdings-{}.{}'.format(ticker, file_extension)
-    open(filename, 'wb').write(r.content)
-    return filename
+    holdings_file, _ = open_holdings_document(holdings_file_url, spool_to_disk)
+    return holdings_file
 
-def delete_holdings_file(holdings_filename):
-    """Deletes a downloaded holdings file from the local filesystem.
+def open_holdings_document(holdings_file_url, spool_to_disk=None):
+    """Download a holdings list file like `open_holdings_file`, also returning a hash of its contents.
 
-    :param holdings_filename: The name of the holdings file to delete.
+    Identical holdings files have identical content hashes, which lets fetchers skip parsing a file they've already
+    parsed.  If the HTTP cache is enabled, the file is served from it whenever it's still fresh or unchanged.
+
+    :param holdings_file_url: The URL from which the holdings file can be downloaded.
+    :param spool_to_disk: Whether to write the file to a temporary file rather than keep it in memory.  Defaults
+        to the SPOOL_TO_DISK setting.  Ignored if the HTTP cache is enabled.
+    :returns: A (binary file object, SHA-256 hex digest) tuple.  The file object should be closed by the caller.
+    :raises requests.HTTPError: If the provider responds with an error status.
     """
-    os.remove(holdings_filename)
\ No newline at end of file
+    session = get_session(holdings_file_url)
+    http_cache = _http_cache
+    if http_cache is not None:
+        return http_cache.open(holdings_file_url, session, (CONNECT_TIMEOUT, READ_TIMEOUT), CHUNK_SIZE)
+
+    if spool_to_disk is None:
+        spool_to_disk = SPOOL_TO_DISK
+    holdings_file = tempfile.TemporaryFile() if spool_to_disk else BytesIO()
+    hasher = hashlib.sha256()
+    try:
+        with session.get(holdings_file_url, allow_redirects=True, stream=True,
+                         timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as r:
+            r.raise_for_status()
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                hasher.update(chunk)
+                holdings_file.write(chunk)
+    except Exception:
+        holdings_file.close()
+        raise
+    holdings_file.seek(0)
+    return holdings_file, hasher.hexdigest()
+
+def read_file_prefix(file_url, byte_count):
+    """Downloads only the first bytes of a file, i.e. to check its type by its signature before downloading it.
+
+    The response is streamed and closed as soon as enough bytes have arrived, so the rest of the file isn't
+    transferred.
+
+    :param file_url: The URL of the file.
+    :param byte_count: The number of bytes to read.
+    :returns: Up to `byte_count` bytes from the start of the file.
+    :raises requests.HTTPError: If the server responds with an error status.
+    """
+    session = get_session(file_url)
+    with session.get(file_url, allow_redirects=True, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as r:
+        r.raise_for_status()
+        prefix = b''
+        for chunk in r.iter_content(chunk_size=byte_count):
+            prefix += chunk
+            if len(prefix) >= byte_count:
+                break
+        return prefix[:byte_count]
+
+@contextmanager
+def stream_holdings_file(holdings_file_url):
+    """Opens a holdings list file as a binary stream that's read directly off the HTTP response.
+
+    Unlike `open_holdings_file`, the file is never held in full: only the chunk currently being read is in memory,
+    which lets fetchers parse holdings as the file arrives.  If the HTTP cache is enabled, the stream reads from the
+    cached file instead.
+
+    :param holdings_file_url: The URL from which the holdings file can be downloaded.
+    :returns: A context manager yielding a readable binary file object.
+    :raises requests.HTTPError: If the provider responds with an error status.
+    """
+    if _http_cache is not None:
+        holdings_file, _ = open_holdings_document(holdings_file_url)
+        with holdings_file:
+            yield holdings_file
+        return
+
+    session = get_session(holdings_file_url)
+    with session.get(holdings_file_url, allow_redirects=True, stream=True,
+                     timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as r:
+        r.raise_for_status()
+        yield io.BufferedReader(ResponseStream(r.iter_content(chunk_size=CHUNK_SIZE)), buffer_size=CHUNK_SIZE)
+
+class ResponseStream(io.RawIOBase):
+    """A read-only raw stream over an iterator of byte chunks, such as a streamed response's iter_content()."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.current_chunk = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.current_chunk:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return 0
+            self.current_chunk = memoryview(chunk)
+        byte_count = min(len(buffer), len(self.current_chunk))
+        buffer[:byte_count] = self.current_chunk[:byte_count]
+        self.current_chunk = self.current_chunk[byte_count:]
+        return byte_count
+
+def get_async_session():
+    """Returns the shared aiohttp session for the running event loop, creating it on first use.
+
+    aiohttp sessions can't be shared between event loops, so each loop gets its own session.  Its connector pools
+    keep-alive connections to every provider host, up to POOL_MAXSIZE connections per host.
+
+    Requires aiohttp to be installed.
+
+    :returns: An aiohttp.ClientSession bound to the current event loop.
+    """
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        import aiohttp
+        timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        connector = aiohttp.TCPConnector(limit_per_host=POOL_MAXSIZE)
+        session = aiohttp.ClientSession(headers=REQUEST_HEADERS, timeout=timeout, connector=connector)
+        _async_sessions[loop] = session
+    return session
+
+async def close_async_session():
+    """Closes the shared aiohttp session of the running event loop.  Should be awaited before the loop is closed."""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+async def download_holdings_content_async(holdings_file_url):
+    """Download a holdings list file from a URL without blocking the event loop.
+
+    :param holdings_file_url: The URL from which the holdings file can be downloaded.
+    :returns: The contents of the holdings file as bytes.
+    :raises aiohttp.ClientResponseError: If the provider responds with an error status.
+    """
+    holdings_file_contents, _ = await download_holdings_document_async(holdings_file_url)
+    return holdings_file_contents
+
+async def download_holdings_document_async(holdings_file_url):
+    """Download a holdings list file like `download_holdings_content_async`, also returning a hash of its contents.
+
+    If the HTTP cache is enabled, the file is served from it whenever it's still fresh or unchanged, exactly as for
+    blocking downloads.
+
+    :param holdings_file_url: The URL from which the holdings file can be downloaded.
+    :returns: A (contents as bytes, SHA-256 hex digest) tuple.
+    :raises aiohttp.ClientResponseError: If the provider responds with an error status.
+    """
+    http_cache = _http_cache
+    if http_cache is not None:
+        holdings_file, content_hash = await http_cache.aopen(holdings_file_url, get_async_session(), CHUNK_SIZE)
+        with holdings_file:
+            return holdings_file.read(), content_hash
+
+    chunks = []
+    hasher = hashlib.sha256()
+    async with get_async_session().get(holdings_file_url, allow_redirects=True) as r:
+        r.raise_for_status()
+        async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+            hasher.update(chunk)
+            chunks.append(chunk)
+    return b''.join(chunks), hasher.hexdigest()
@@ -0,0 +1,310 @@
+"""
+Pairwise overlap and similarity of funds' holdings, computed with sparse matrix operations.
+
+Each fund's holdings are mapped onto a shared space of integer security IDs and stored as one row of a sparse
+fund x security matrix of percent weightings.  Three measures are supported:
+
+    * 'weight': the sum over securities of the smaller of the two funds' weights, i.e. the fraction of either fund
+      that's invested in the same securities in the same proportions.
+    * 'jaccard': the number of securities both funds hold, divided by the number either holds.
+    * 'cosine': the cosine similarity of the funds' weight vectors.
+
+The Jaccard and cosine matrices are a single sparse matrix product.  The weight overlap isn't a product, so it's
+computed a row at a time: the columns of the fund's securities are sliced out of the matrix, clipped to the fund's
+weights, and summed per fund, which only touches the entries of funds that share a security with it.  Slicing
+columns needs the matrix in CSC format, which is kept between updates: updating a fund's holdings removes the fund's
+old entries from it and adds the new ones, rather than rebuilding it from every fund's holdings.
+
+When the security master merges two IDs it's learned are the same security, the stored rows are re-keyed by canonical
+ID and the remembered matrices are dropped, so holdings identified differently by different funds still overlap.
+
+Only long positions in securities (holdings other than cash with a positive weight) are counted.  Requires NumPy
+and SciPy, which are installed with the `analytics` extra (`pip install openholdings[analytics]`).
+"""
+
+import threading
+import numpy as np
+from scipy import sparse
+from ..models import Cash
+from .security_master import SecurityMaster
+
+METRICS = ('weight', 'jaccard', 'cosine')
+
+class FundOverlap:
+    """The holdings of a universe of funds, for computing the overlap between each pair of them.
+
+    Overlap matrices are remembered once computed, and refreshing one fund's holdings with update() recomputes only
+    that fund's row and column of each remembered matrix.
+    """
+
+    def __init__(self, security_ids=None):
+        """
+        :param security_ids: The object that assigns securities their IDs, with a get_id(holding) method, and
+            merge_count and canonical_ids() if it merges IDs.  Defaults to a new SecurityMaster.
+        """
+        self.security_ids = security_ids if security_ids is not None else SecurityMaster()
+        self.funds = []
+        """The tickers of the funds, in the order of the overlap matrices' rows and columns."""
+
+        self._fund_rows = {}  # Fund ticker -> row index
+        self._rows = []  # Row index -> (security IDs, weights) arrays, sorted by security ID
+        self._matrix = None
+        self._columns = None  # The weight matrix in CSC format, for slicing out securities' columns
+        self._matrices = {}  # Metric -> remembered overlap matrix
+        self._merge_count = getattr(self.security_ids, 'merge_count', 0)  # Merge count the rows' IDs are keyed as of
+        self._lock = threading.RLock()
+
+    def update(self, fund, holdings):
+        """Sets a fund's holdings, adding the fund if it's new.
+
+        Weights of holdings of the same security are summed.
+
+        :param fund: The fund's ticker.
+        :param holdings: An iterable of the fund's Holdings.
+        """
+        security_ids = []
+        weights = []
+        with self._lock:
+            for holding in holdings:
+                weight = holding.percent_weighting
+                if weight is not None and weight > 0 and not isinstance(holding, Cash):
+                    security_ids.append(self.security_ids.get_id(holding))
+                    weights.append(weight)
+            row = sum_by_id(np.array(security_ids, dtype=np.int64), np.array(weights, dtype=np.float64))
+
+            fund = fund.upper()
+            row_index = self._fund_rows.get(fund)
+            old_row = None
+            if row_index is None:
+                row_index = self._fund_rows[fund] = len(self.funds)
+                self.funds.append(fund)
+                self._rows.append(row)
+                for metric, matrix in self._matrices.items():
+                    self._matrices[metric] = np.pad(matrix, ((0, 1), (0, 1)))
+            else:
+                old_row = self._rows[row_index]
+                self._rows[row_index] = row
+            self._matrix = None
+            self._canonicalize()
+            if self._columns is not None:
+                self._update_columns(row_index, old_row, row)
+            for metric, matrix in self._matrices.items():
+                scores = self._compute_row(row_index, metric)
+                matrix[row_index, :] = scores
+                matrix[:, row_index] = scores
+
+    def update_from_results(self, fetch_results):
+        """Sets the holdings of every fund fetched successfully, i.e. by HoldingsFetcher.fetch_many().
+
+        :param fetch_results: An iterable of FetchResults.  Funds that failed to fetch are left as they were.
+        :returns: The number of funds updated.
+        """
+        updated_count = 0
+        for result in fetch_results:
+            if result.error is None:
+                self.update(result.ticker, result.holdings)
+                updated_count += 1
+        return updated_count
+
+    def overlap_matrix(self, metric='weight'):
+        """Computes the overlap between every pair of funds.
+
+        :param metric: 'weight', 'jaccard', or 'cosine'.
+        :returns: A square numpy.ndarray whose rows and columns are in the order of `funds`.  The array is shared
+            with later calls and kept up to date by update(), so it should be copied before being modified.
+        """
+        check_metric(metric)
+        with self._lock:
+            self._canonicalize()
+            matrix = self._matrices.get(metric)
+            if matrix is None:
+                matrix = self._matrices[metric] = self._compute_matrix(metric)
+            return matrix
+
+    def overlap(self, fund, other_fund, metric='weight'):
+        """Computes the overlap between two funds."""
+        with self._lock:
+            return float(self.overlaps(fund, metric)[self._fund_rows[other_fund.upper()]])
+
+    def overlaps(self, fund, metric='weight'):
+        """Computes the overlap between a fund and every fund, without computing the full matrix.
+
+        :param fund: The fund's ticker.
+        :param metric: 'weight', 'jaccard', or 'cosine'.
+        :returns: A numpy.ndarray of the overlap with each fund, in the order of `funds`.
+        """
+        check_metric(metric)
+        with self._lock:
+            self._canonicalize()
+            row_index = self._fund_rows[fund.upper()]
+            matrix = self._matrices.get(metric)
+            if matrix is not None:
+                return matrix[row_index].copy()
+            return self._compute_row(row_index, metric)
+
+    def most_similar(self, fund, k=10, metric='weight'):
+        """Finds the funds that overlap the most with a fund.
+
+        :param fund: The fund's ticker.
+        :param k: The number of funds to return.
+        :param metric: 'weight', 'jaccard', or 'cosine'.
+        :returns: A list of up to k (fund ticker, overlap) tuples, in order of descending overlap.
+        """
+        with self._lock:
+            scores = self.overlaps(fund, metric)
+            scores[self._fund_rows[fund.upper()]] = -np.inf  # A fund always overlaps fully with itself
+            return [(self.funds[index], float(scores[index])) for index in top_k_indexes(scores, k)
+                if scores[index] > -np.inf]
+
+    def top_k(self, k=10, metric='weight'):
+        """Finds the funds that overlap the most with each fund, from the full overlap matrix.
+
+        :param k: The number of funds to find for each fund.
+        :param metric: 'weight', 'jaccard', or 'cosine'.
+        :returns: A dictionary of fund ticker -> list of up to k (fund ticker, overlap) tuples, in order of
+            descending overlap.
+        """
+        with self._lock:
+            scores = self.overlap_matrix(metric).copy()
+            np.fill_diagonal(scores, -np.inf)
+            k = min(k, max(len(self.funds) - 1, 0))
+            if k == 0:
+                return {fund: [] for fund in self.funds}
+            top_indexes = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top_indexes, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top_indexes = np.take_along_axis(top_indexes, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            return {fund: [(self.funds[index], float(score)) for index, score in zip(indexes, fund_scores)]
+                for fund, indexes, fund_scores in zip(self.funds, top_indexes, top_scores)}
+
+    def weight_matrix(self):
+        """Returns the sparse fund x security matrix of weights, as a scipy.sparse.csr_matrix whose rows are in the
+        order of `funds` and whose columns are security IDs."""
+        with self._lock:
+            self._canonicalize()
+            if self._matrix is None:
+                row_lengths = [len(security_ids) for security_ids, _ in self._rows]
+                indptr = np.concatenate([[0], np.cumsum(row_lengths, dtype=np.int64)])
+                indices = np.concatenate([security_ids for security_ids, _ in self._rows] or [np.empty(0, np.int64)])
+                data = np.concatenate([weights for _, weights in self._rows] or [np.empty(0)])
+                self._matrix = sparse.csr_matrix((data, indices, indptr),
+                    shape=(len(self._rows), len(self.security_ids)))
+            return self._matrix
+
+    def _canonicalize(self):
+        """Re-keys the rows by canonical security ID if the security master has merged any IDs since they were keyed,
+        dropping the matrices computed from the old IDs."""
+        merge_count = getattr(self.security_ids, 'merge_count', 0)
+        if merge_count == self._merge_count:
+            return
+        canonical_ids = np.array(self.security_ids.canonical_ids(), dtype=np.int64)
+        self._rows = [sum_by_id(canonical_ids[security_ids], weights) for security_ids, weights in self._rows]
+        self._merge_count = merge_count
+        self._matrix = None
+        self._columns = None
+        self._matrices = {}
+
+    def _get_columns(self):
+        """Returns the weight matrix in CSC format, converting it on first use."""
+        if self._columns is None:
+            self._columns = self.weight_matrix().tocsc()
+        return self._columns
+
+    def _update_columns(self, row_index, old_row, new_row):
+        """Replaces a fund's entries in the CSC weight matrix, growing it for new funds and securities.
+
+        The old entries are subtracted (leaving exact zeros, which are eliminated) before the new ones are added, so
+        the stored weights are exactly the fund's new weights.
+
+        :param row_index: The fund's row.
+        :param old_row: The fund's previous (security IDs, weights) arrays, or None if the fund is new.
+        :param new_row: The fund's new (security IDs, weights) arrays.
+        """
+        shape = (len(self._rows), len(self.security_ids))
+        columns = self._columns
+        if columns.shape != shape:
+            columns.resize(shape)
+        if old_row is not None and len(old_row[0]):
+            columns = columns - create_row_matrix(row_index, old_row, shape)
+            columns.eliminate_zeros()
+        if len(new_row[0]):
+            columns = columns + create_row_matrix(row_index, new_row, shape)
+        self._columns = columns.tocsc()
+
+    def _compute_matrix(self, metric):
+        if metric == 'weight':
+            matrix = np.zeros((len(self.funds), len(self.funds)))
+            columns = self._get_columns()
+            for row_index in range(len(self.funds)):
+                matrix[row_index] = self._compute_weight_overlap(row_index, columns)
+            return matrix
+        weights = self.weight_matrix()
+        if metric == 'jaccard':
+            holds = (weights > 0).astype(np.float64)
+            intersections = (holds @ holds.T).toarray()
+            counts = np.asarray(holds.sum(axis=1)).ravel()
+            return safe_divide(intersections, counts[:, None] + counts[None, :] - intersections)
+        normalized = sparse.diags(safe_divide(1.0, row_norms(weights))) @ weights
+        return (normalized @ normalized.T).toarray()
+
+    def _compute_row(self, row_index, metric):
+        if metric == 'weight':
+            return self._compute_weight_overlap(row_index, self._get_columns())
+        security_ids, fund_weights = self._rows[row_index]
+        columns = self._get_columns()[:, security_ids]
+        holder_rows = columns.indices
+        if metric == 'jaccard':
+            intersections = np.bincount(holder_rows, minlength=len(self.funds)).astype(np.float64)
+            counts = np.array([len(row_security_ids) for row_security_ids, _ in self._rows], dtype=np.float64)
+            return safe_divide(intersections, len(security_ids) + counts - intersections)
+        fund_weight_per_entry = np.repeat(fund_weights, np.diff(columns.indptr))
+        dots = np.bincount(holder_rows, weights=columns.data * fund_weight_per_entry, minlength=len(self.funds))
+        norms = np.array([np.linalg.norm(row_weights) for _, row_weights in self._rows])
+        return safe_divide(dots, np.linalg.norm(fund_weights) * norms)
+
+    def _compute_weight_overlap(self, row_index, columns):
+        """Sums the smaller of the fund's and each other fund's weight of each of the fund's securities.
+
+        :param row_index: The fund's row.
+        :param columns: The weight matrix in CSC format.
+        :returns: A numpy.ndarray of the weight overlap with each fund.
+        """
+        security_ids, fund_weights = self._rows[row_index]
+        fund_columns = columns[:, security_ids]
+        fund_weight_per_entry = np.repeat(fund_weights, np.diff(fund_columns.indptr))
+        return np.bincount(fund_columns.indices, weights=np.minimum(fund_columns.data, fund_weight_per_entry),
+            minlength=len(self.funds))
+
+def sum_by_id(security_ids, weights):
+    """Sums the weights of each distinct security ID, returning (IDs, weights) arrays sorted by ID."""
+    unique_ids, inverse = np.unique(security_ids, return_inverse=True)
+    return unique_ids, np.bincount(inverse, weights=weights, minlength=len(unique_ids))
+
+def create_row_matrix(row_index, row, shape):
+    """Creates a CSC matrix of the given shape whose only entries are one fund's weights, in the fund's row."""
+    security_ids, weights = row
+    return sparse.csc_matrix((weights, (np.full(len(security_ids), row_index), security_ids)), shape=shape)
+
+def check_metric(metric):
+    if metric not in METRICS:
+        raise ValueError('Unrecognized overlap metric "{}", expected one of {}'.format(metric, ', '.join(METRICS)))
+
+def row_norms(matrix):
+    return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+
+def safe_divide(numerator, denominator):
+    """Divides element-wise, with a result of 0 wherever the denominator is 0."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    result = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=result, where=denominator != 0)
+    return result
+
+def top_k_indexes(scores, k):
+    """Returns the indexes of the k largest scores, in order of descending score."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    top_indexes = np.argpartition(-scores, k - 1)[:k]
+    return top_indexes[np.argsort(-scores[top_indexes], kind='stable')]
@@ -1,52 +1,59 @@
 """
-The "holding factory" converts a HoldingFieldBag object, which contains the union of the fields of each 
-holding type, to an instance of the appropriate Holding subclass (either Equity, Bond, Future, or Cash).
+The "holding factory" determines which Holding subclass (either Equity, Bond, Future, or Cash) a parsed holding 
+should be, based on the presence and value of its fields, and constructs an instance of it.
 
-It does so through the create_holding() function, which accepts a HoldingFieldBag object and returns a Holding subclass.
+Parsers describe a holding with a dictionary of field name -> value and pass it to create_holding_from_fields(), 
+which constructs the typed holding in a single step.  create_holding() does the same for a HoldingFieldBag object, 
+which contains the union of the fields of each holding type.
+
+copy_holding() creates an independent copy of a parsed holding, so parsed holdings can be handed out more than once.
 """
 
-from ..models import Equity, Bond, Future, Cash
+from ..models import Holding, Equity, Bond, Future, Cash
+from .holdings_cache import get_slot_names
 
 # Fields of the Holding superclass that all subclasses inherit
-COMMON_HOLDING_FIELDS = ['identifier_cusip', 'identifier_isin', 'identifier_figi', 'identifier_sedol', 'percent_weighting', 'market_value']
-
-def copy_over_fields(source_obj, destination_obj, fields_to_copy):
-    for field in fields_to_copy:
-        setattr(destination_obj, field, getattr(source_obj, field))
-
-def is_cash(field_bag):
-    return field_bag.currency is not None
-
-def is_bond(field_bag):
-    return field_bag.ticker is None and field_bag.contract_code is None \
-        and (field_bag.maturity_date is not None or field_bag.effective_date is not None or field_bag.coupon_rate is not None)
-
-def is_future(field_bag):
-    return field_bag.contract_code is not None or field_bag.contract_expiry_date is not None
-
-def create_cash_holding(field_bag):
-    cash = Cash(field_bag.name)
-    cash_fields = ['currency']
-    copy_over_fields(field_bag, cash, COMMON_HOLDING_FIELDS + cash_fields)
-    return cash
-
-def create_bond_holding(field_bag):
-    bond = Bond(field_bag.name)
-    bond_fields = ['coupon_rate', 'rating', 'effective_date', 'maturity_date', 'next_call_date', 'quantity_held', 'sector']
-    copy_over_fields(field_bag, bond, COMMON_HOLDING_FIELDS + bond_fields)
-    return bond
-
-def create_future_holding(field_bag):
-    future = Future(field_bag.name)
-    future_fields = ['contract_code', 'contract_expiry_date', 'quantity_held']
-    copy_over_fields(field_bag, future, COMMON_HOLDING_FIELDS + future_fields)
-    return future
-
-def create_equity_holding(field_bag):
-    equity = Equity(field_bag.name)
-    equity_fields = ['ticker', 'num_shares', 'sector']
-    copy_over_fields(field_bag, equity, COMMON_HOLDING_FIELDS + equity_fields)
-    return equity
+COMMON_HOLDING_FIELDS = list(Holding.__slots__)
+
+# Holding subclass -> fields it accepts as keyword arguments, other than its name
+HOLDING_TYPE_FIELDS = {
+    holding_type: frozenset(COMMON_HOLDING_FIELDS + list(holding_type.__slots__)) - {'name'}
+    for holding_type in (Equity, Bond, Future, Cash)
+}
+
+def is_cash(fields):
+    return fields.get('currency') is not None
+
+def is_bond(fields):
+    return fields.get('ticker') is None and fields.get('contract_code') is None \
+        and (fields.get('maturity_date') is not None or fields.get('effective_date') is not None 
+        or fields.get('coupon_rate') is not None)
+
+def is_future(fields):
+    return fields.get('contract_code') is not None or fields.get('contract_expiry_date') is not None
+
+def get_holding_type(fields):
+    if is_cash(fields):
+        return Cash
+    elif is_bond(fields):
+        return Bond
+    elif is_future(fields):
+        return Future
+    else:  # Equity is the catch-all
+        return Equity
+
+def create_holding_from_fields(fields):
+    """Factory method that accepts a dictionary of parsed holding fields, determines the appropriate entity type,
+    and returns a new instance of that entity constructed from the fields that apply to it.
+
+    :param fields: A dictionary of field name -> value produced by parsing a row of a fund's holdings list.  Fields
+        that are missing are treated as None, and fields that don't apply to the holding's type are ignored.
+    :returns: A Holding subclass of the appropriate type based on the available fields.
+    """
+    holding_type = get_holding_type(fields)
+    type_fields = HOLDING_TYPE_FIELDS[holding_type]
+    return holding_type(fields.get('name'), 
+        **{field: value for field, value in fields.items() if value is not None and field in type_fields})
 
 def create_holding(field_bag):
     """Factory method that accepts a HoldingFieldBag, determines the appropriate entity type,
@@ -55,11 +62,24 @@ def create_holding(field_bag):
     :param field_bag: A HoldingFieldBag produced as a result of parsing a fund's holdings list.
     :returns: A Holding subclass of the appropriate type based on the available fields in the bag.
     """
-    if is_cash(field_bag):
-        return create_cash_holding(field_bag)
-    elif is_bond(field_bag):
-        return create_bond_holding(field_bag)
-    elif is_future(field_bag):
-        return create_future_holding(field_bag)
-    else:  # Equity is the catch-all
-        return create_equity_holding(field_bag)
\ No newline at end of file
+    return create_holding_from_fields(field_bag.as_dict())
+
+def copy_holding(holding):
+    """Creates a copy of a holding that can be modified without affecting the original.
+
+    Only the slots that are set are copied, so a lazy holding view is copied without decoding any fields it hasn't
+    decoded yet.  The copy shares the view's raw row, which is never modified.
+
+    :param holding: A Holding, or a lazy holding view.
+    :returns: A new instance of the holding's type with the same field values.
+    """
+    holding_type = type(holding)
+    holding_copy = object.__new__(holding_type)
+    for slot in get_slot_names(holding_type):
+        try:
+            # Read through the slot's descriptor, so that a lazy view's unset fields aren't decoded
+            value = getattr(holding_type, slot).__get__(holding, holding_type)
+        except AttributeError:
+            continue
+        setattr(holding_copy, slot, value)
+    return holding_copy
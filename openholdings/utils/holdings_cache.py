@@ -0,0 +1,140 @@
+"""
+An optional in-process cache of parsed holdings lists, placed in front of HoldingsFetcher.
+
+Entries are keyed by (provider, ticker, as-of date, lazy).  Since providers publish holdings once a day, the as-of
+date defaults to the current date, so a fund's holdings are never served from a previous day's entry.  Lazy holding
+views and fully parsed holdings of the same fund are cached separately, so a fetch is always served the kind of holdings
+it asked for.
+"""
+
+import sys
+import time
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date
+
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'evictions', 'entries', 'memory'])
+
+class HoldingsCache:
+    """A thread-safe memo of parsed holdings lists with TTL, entry count, and memory based eviction.
+
+    Lists returned from the cache are new lists, but the Holding objects in them are shared with every other caller
+    that got the same entry, so they shouldn't be modified.
+    """
+
+    def __init__(self, ttl=3600, max_entries=256, max_memory=256 * 1024 * 1024):
+        """
+        :param ttl: Seconds an entry is served before the fund is fetched again.
+        :param max_entries: Maximum number of holdings lists kept in the cache.
+        :param max_memory: Approximate maximum number of bytes taken up by the cached holdings.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # Key -> (expiry time, estimated size, holdings), least recently used first
+        self._memory = 0
+        self._lock = threading.Lock()
+
+    def get(self, provider, ticker, as_of=None, lazy=False):
+        """Looks up a fund's cached holdings.
+
+        :param provider: The name of the fund's provider.
+        :param ticker: The fund's ticker.
+        :param as_of: The date the holdings are as of.  Defaults to today.
+        :param lazy: Whether to look up the fund's lazy holding views rather than its fully parsed holdings.
+        :returns: A new list of the cached Holdings, or None if there's no fresh entry for the fund.
+        """
+        key = (provider, ticker.upper(), as_of or date.today(), lazy)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[2])
+
+    def put(self, provider, ticker, holdings, as_of=None, lazy=False):
+        """Adds a fund's holdings to the cache, evicting the least recently used entries if it's full.
+
+        :param provider: The name of the fund's provider.
+        :param ticker: The fund's ticker.
+        :param holdings: The list of Holdings fetched for the fund.
+        :param as_of: The date the holdings are as of.  Defaults to today.
+        :param lazy: Whether the holdings are lazy holding views rather than fully parsed holdings.
+        """
+        key = (provider, ticker.upper(), as_of or date.today(), lazy)
+        size = estimate_holdings_size(holdings)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, list(holdings))
+            self._memory += size
+            while self._entries and (len(self._entries) > self.max_entries or self._memory > self.max_memory):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, provider=None, ticker=None, as_of=None):
+        """Removes every entry matching the given provider, ticker, and as-of date, whether of lazy or fully parsed
+        holdings.  Omitted arguments match anything.
+
+        :param provider: Only remove entries of funds belonging to this provider.
+        :param ticker: Only remove entries of the fund with this ticker.
+        :param as_of: Only remove entries of holdings as of this date.
+        :returns: The number of entries removed.
+        """
+        ticker = ticker.upper() if ticker is not None else None
+        with self._lock:
+            matching_keys = [key for key in self._entries
+                if (provider is None or key[0] == provider)
+                and (ticker is None or key[1] == ticker)
+                and (as_of is None or key[2] == as_of)]
+            for key in matching_keys:
+                self._remove(key)
+            return len(matching_keys)
+
+    def clear(self):
+        """Removes every entry from the cache.  Hit and miss counters are left as they are."""
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
+
+    def stats(self):
+        """Returns a CacheStats snapshot of the cache's hit, miss, and eviction counters and its current size."""
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions, len(self._entries), self._memory)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._memory -= size
+
+def estimate_holdings_size(holdings, sample_size=16):
+    """Estimates the number of bytes taken up by a list of holdings from the size of a sample of them.
+
+    :param holdings: A list of Holdings.
+    :param sample_size: The number of holdings to measure.
+    :returns: The approximate size of the list and its holdings in bytes.
+    """
+    sample = holdings[:sample_size]
+    sample_bytes = 0
+    for holding in sample:
+        sample_bytes += sys.getsizeof(holding)
+        attributes = getattr(holding, '__dict__', None)
+        if attributes is not None:
+            sample_bytes += sys.getsizeof(attributes)
+            values = attributes.values()
+        else:  # Holdings keep their fields in __slots__, whose storage getsizeof() already counts
+            values = [getattr(holding, field, None) for field in get_slot_names(type(holding))]
+        sample_bytes += sum(sys.getsizeof(value) for value in values if value is not None)
+    average_bytes = sample_bytes / len(sample) if sample else 0
+    return sys.getsizeof(holdings) + int(average_bytes * len(holdings))
+
+def get_slot_names(cls):
+    """Returns the names of every slot declared by a class and its superclasses."""
+    return [slot for klass in cls.__mro__ for slot in getattr(klass, '__slots__', ())]
@@ -0,0 +1,155 @@
+"""
+Diffing of a fund's holdings between two fetches or archived snapshots, i.e. to monitor rebalances.
+
+Providers fill in identifiers inconsistently, and even the same provider may leave an identifier out one day, so
+holdings are matched on the first of several keys that both sides have, in MATCH_KEYS order: ISIN, CUSIP, SEDOL,
+ticker (without its exchange suffix), and finally name.  The old holdings are put into one hash index per key, which
+is only built once a new holding needs it; each new holding looks up its keys in order and claims the first old
+holding that isn't matched yet.  Matching and comparing are done in a single pass over the new holdings, so diffing
+is linear in the size of the fund.
+"""
+
+from collections import namedtuple
+from .validation import normalize_ticker
+
+HoldingChange = namedtuple('HoldingChange', ['change', 'key', 'name', 'old_index', 'new_index', 'old_weight',
+    'new_weight', 'weight_delta', 'old_shares', 'new_shares', 'shares_delta'])
+"""A difference between two versions of a fund's holdings.
+
+`change` is 'added', 'removed', or 'changed' (or 'unchanged', if requested).  `key` is the (key name, value) tuple the
+holding was matched on, or its first available key if it wasn't matched.  `old_index` and `new_index` are the
+holding's positions in the old and new holdings, or None on the side it's missing from.  Weights are percent
+weightings as fractions, and shares are the number of shares held (or the quantity held, for bonds and futures).
+Deltas are new minus old, treating a missing side as zero."""
+
+# Keys holdings are matched on, in order of preference, as (key name, field) tuples
+MATCH_KEYS = (('isin', 'identifier_isin'), ('cusip', 'identifier_cusip'), ('sedol', 'identifier_sedol'),
+    ('ticker', 'ticker'), ('name', 'name'))
+
+def diff_holdings(old_holdings, new_holdings, weight_tolerance=0.0, shares_tolerance=0.0, include_unchanged=False):
+    """Finds the holdings added, removed, and changed between two versions of a fund's holdings.
+
+    :param old_holdings: The earlier holdings: an iterable of Holdings, a HoldingsTable, or an ArchivedSnapshot.
+    :param new_holdings: The later holdings, in any of the same forms.
+    :param weight_tolerance: Weight changes no larger than this aren't reported.
+    :param shares_tolerance: Changes in the number of shares no larger than this aren't reported.
+    :param include_unchanged: Whether to report matched holdings that didn't change, as 'unchanged' records.
+    :returns: A list of HoldingChanges: those of the new holdings in their order, followed by the removed holdings
+        in their old order.
+    """
+    old_keys, old_weights, old_shares = get_diff_columns(old_holdings)
+    new_keys, new_weights, new_shares = get_diff_columns(new_holdings)
+    old_names = old_keys[-1]
+    new_names = new_keys[-1]
+
+    # One hash index per key, of value -> positions of the old holdings with that value, built on first use
+    old_indexes = [None] * len(MATCH_KEYS)
+
+    matched = [False] * len(old_weights)
+    changes = []
+    for new_position in range(len(new_weights)):
+        old_position = None
+        match_key = None
+        for key_index, new_values in enumerate(new_keys):
+            value = new_values[new_position]
+            if value is None:
+                continue
+            old_index = old_indexes[key_index]
+            if old_index is None:
+                old_index = old_indexes[key_index] = build_position_index(old_keys[key_index])
+            for candidate in old_index.get(value, ()):
+                if not matched[candidate]:
+                    old_position = candidate
+                    match_key = (MATCH_KEYS[key_index][0], value)
+                    break
+            if old_position is not None:
+                break
+
+        new_weight = new_weights[new_position]
+        new_share_count = new_shares[new_position]
+        if old_position is None:
+            changes.append(HoldingChange('added', get_first_key(new_keys, new_position), new_names[new_position],
+                None, new_position, None, new_weight, subtract(new_weight, None), None, new_share_count,
+                subtract(new_share_count, None)))
+            continue
+
+        matched[old_position] = True
+        old_weight = old_weights[old_position]
+        old_share_count = old_shares[old_position]
+        if new_weight == old_weight and new_share_count == old_share_count and not include_unchanged:
+            continue
+        weight_delta = subtract(new_weight, old_weight)
+        shares_delta = subtract(new_share_count, old_share_count)
+        is_changed = (weight_delta is not None and abs(weight_delta) > weight_tolerance) \
+            or (shares_delta is not None and abs(shares_delta) > shares_tolerance) \
+            or ((new_weight is None) != (old_weight is None)) \
+            or ((new_share_count is None) != (old_share_count is None))
+        if is_changed or include_unchanged:
+            changes.append(HoldingChange('changed' if is_changed else 'unchanged', match_key, new_names[new_position],
+                old_position, new_position, old_weight, new_weight, weight_delta, old_share_count, new_share_count,
+                shares_delta))
+
+    for old_position, is_matched in enumerate(matched):
+        if not is_matched:
+            old_weight = old_weights[old_position]
+            old_share_count = old_shares[old_position]
+            changes.append(HoldingChange('removed', get_first_key(old_keys, old_position), old_names[old_position],
+                old_position, None, old_weight, None, subtract(None, old_weight), old_share_count, None,
+                subtract(None, old_share_count)))
+    return changes
+
+def build_position_index(values):
+    index = {}
+    for position, value in enumerate(values):
+        if value is not None:
+            positions = index.get(value)
+            if positions is None:
+                index[value] = [position]
+            else:
+                positions.append(position)
+    return index
+
+def get_first_key(keys, position):
+    for key_index, values in enumerate(keys):
+        if values[position] is not None:
+            return (MATCH_KEYS[key_index][0], values[position])
+    return None
+
+def subtract(new_value, old_value):
+    if new_value is None and old_value is None:
+        return None
+    return (new_value or 0.0) - (old_value or 0.0)
+
+def get_diff_columns(holdings):
+    """Reads the match keys, weights, and share counts of a fund's holdings into columns.
+
+    :param holdings: An iterable of Holdings, or a columnar HoldingsTable or ArchivedSnapshot.
+    :returns: A (keys, weights, shares) tuple, where keys is a list with one column per key in MATCH_KEYS order.
+        Each column is a list with one entry per holding, and None where the holding doesn't have the value.
+    """
+    if hasattr(holdings, 'string_columns') and hasattr(holdings, 'numeric_columns'):
+        keys = [decode_string_column(holdings[field]) for _, field in MATCH_KEYS]
+        weights = [value if value == value else None for value in holdings['percent_weighting']]  # NaN -> None
+        shares = [num_shares if num_shares == num_shares else quantity if quantity == quantity else None
+            for num_shares, quantity in zip(holdings['num_shares'], holdings['quantity_held'])]
+    else:
+        holdings = list(holdings)
+        keys = [[getattr(holding, field, None) or None for holding in holdings] for _, field in MATCH_KEYS]
+        weights = [holding.percent_weighting for holding in holdings]
+        shares = [get_share_count(holding) for holding in holdings]
+    # Tickers are matched without their exchange suffix, i.e. 'MSFT UN' matches 'MSFT'
+    tickers = keys[3]
+    keys[3] = [ticker if ticker is None or (ticker.isalnum() and ticker.isupper()) else normalize_ticker(ticker) or None
+        for ticker in tickers]
+    return keys, weights, shares
+
+def decode_string_column(column):
+    # Decode each distinct string only once, rather than once per row
+    values = column.values + [None]
+    return [values[code] for code in column.codes]  # Code -1 selects the trailing None
+
+def get_share_count(holding):
+    share_count = getattr(holding, 'num_shares', None)
+    if share_count is None:
+        share_count = getattr(holding, 'quantity_held', None)
+    return share_count
@@ -0,0 +1,118 @@
+"""
+Predicates for partial fetches, i.e. only a fund's equities, or only its 25 largest holdings.
+
+A HoldingsFilter is handed to the fetcher rather than applied to the full list of holdings afterwards, so that each
+fetcher can push its predicates as far down as the provider's format allows: fetchers skip requesting tabs of
+holdings whose asset class isn't wanted, and rows of a holdings file are checked against the filter using only their
+holding type and weighting, so rows that are filtered out are never fully decoded.
+
+The largest holdings are selected with a heap bounded to the number requested, so a top-N fetch never sorts (or, for
+schema-decoded formats, decodes) every holding in the fund.
+"""
+
+import heapq
+from collections import namedtuple
+from ..models import Equity, Bond, Future, Cash
+
+# Asset class name -> the Holding subclass its holdings are parsed into
+ASSET_CLASSES = {'equity': Equity, 'bond': Bond, 'future': Future, 'cash': Cash}
+
+class HoldingsFilter(namedtuple('HoldingsFilter', ['asset_classes', 'top_n', 'min_weight'])):
+    """Which of a fund's holdings to fetch.
+
+    Filters are immutable and hashable, so they can be part of the key that fetchers remember the holdings parsed from
+    a holdings file by.
+    """
+
+    __slots__ = ()
+
+    def includes_type(self, holding_type):
+        """Checks whether holdings of a type pass the asset class predicate.
+
+        :param holding_type: A Holding subclass (i.e. Equity, or a LazyEquity view of one).
+        :returns: True if holdings of the type may be included.
+        """
+        return self.asset_classes is None or issubclass(holding_type, self.asset_classes)
+
+    def select(self, rows, get_holding_type, get_weight, decode):
+        """Selects and decodes the rows that pass the filter.
+
+        Rows are checked using only their holding type and weighting, and decoded only once they're known to be
+        included (or, with top_n, to be among the largest so far).  Rows without a weighting never pass a
+        min_weight or top_n predicate.
+
+        :param rows: An iterable of rows (or already parsed holdings).
+        :param get_holding_type: A function that accepts a row and returns the Holding subclass it decodes into.
+        :param get_weight: A function that accepts a holding type and row and returns the row's percent weighting.
+        :param decode: A function that accepts a row and its holding type and returns its holding.
+        :returns: A list of the selected holdings: in their original order, or in order of descending weighting if
+            top_n is given.
+        """
+        if self.top_n is None:
+            holdings = []
+            for row in rows:
+                holding_type = get_holding_type(row)
+                if self.includes_type(holding_type) and self.includes_weight(get_weight(holding_type, row)):
+                    holdings.append(decode(row, holding_type))
+            return holdings
+
+        if self.top_n <= 0:
+            return []
+        # Min-heap of the largest holdings so far, as (weight, -position, holding) so that ties keep earlier rows
+        largest_holdings = []
+        for position, row in enumerate(rows):
+            holding_type = get_holding_type(row)
+            if not self.includes_type(holding_type):
+                continue
+            weight = get_weight(holding_type, row)
+            if weight is None or not self.includes_weight(weight):
+                continue
+            if len(largest_holdings) < self.top_n:
+                heapq.heappush(largest_holdings, (weight, -position, decode(row, holding_type)))
+            elif weight > largest_holdings[0][0]:
+                heapq.heapreplace(largest_holdings, (weight, -position, decode(row, holding_type)))
+        largest_holdings.sort(key=lambda entry: entry[:2], reverse=True)
+        return [holding for _, _, holding in largest_holdings]
+
+    def includes_weight(self, weight):
+        return self.min_weight is None or (weight is not None and weight >= self.min_weight)
+
+    def apply(self, holdings):
+        """Selects the parsed holdings that pass the filter.  See select().
+
+        :param holdings: An iterable of Holdings.
+        :returns: A list of the selected Holdings.
+        """
+        return self.select(holdings, type, get_holding_weight, return_holding)
+
+def get_holding_weight(holding_type, holding):
+    return holding.percent_weighting
+
+def return_holding(holding, holding_type):
+    return holding
+
+def create_holdings_filter(asset_classes=None, top_n=None, min_weight=None):
+    """Creates a HoldingsFilter from the predicates given to a fetch.
+
+    :param asset_classes: An iterable of asset class names ('equity', 'bond', 'future', or 'cash') or Holding
+        subclasses to include.  Defaults to all of them.
+    :param top_n: If given, only the holdings with the largest percent weightings, up to this many, are included.
+    :param min_weight: If given, only holdings with at least this percent weighting (as a fraction, i.e. 0.01 for
+        1%) are included.
+    :returns: A HoldingsFilter, or None if no predicates are given.
+    :raises ValueError: If an asset class isn't recognized.
+    """
+    if asset_classes is None and top_n is None and min_weight is None:
+        return None
+    if asset_classes is not None:
+        if isinstance(asset_classes, (str, type)):
+            asset_classes = [asset_classes]
+        holding_types = []
+        for asset_class in asset_classes:
+            holding_type = ASSET_CLASSES.get(asset_class.lower()) if isinstance(asset_class, str) else asset_class
+            if holding_type not in ASSET_CLASSES.values():
+                raise ValueError('Unrecognized asset class "{}"'.format(asset_class))
+            holding_types.append(holding_type)
+        # Sorted so that equal sets of asset classes make equal filters
+        asset_classes = tuple(sorted(set(holding_types), key=lambda holding_type: holding_type.__name__))
+    return HoldingsFilter(asset_classes, top_n, min_weight)
@@ -0,0 +1,259 @@
+"""
+A persistent, on-disk cache of downloaded holdings files that can be shared by several processes.
+
+Cached files are content-addressed: each response body is stored once under the SHA-256 hash of its contents, and
+each URL has a small metadata file recording which body it last returned along with the ETag and Last-Modified
+headers the provider sent.  Within the TTL a cached file is served without touching the network.  Once it expires,
+the cache revalidates it with a conditional GET, so an unchanged holdings file costs a single 304 response rather
+than a multi-megabyte download.
+
+Every file is written to a temporary name and atomically moved into place, so processes sharing a cache directory
+never observe partially written entries.  When the bodies grow beyond the size limit, the least recently used ones
+are evicted.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+class HttpCache:
+    """An on-disk cache of HTTP response bodies keyed by URL, with conditional revalidation and LRU eviction."""
+
+    def __init__(self, cache_dir=None, ttl=3600, max_size=512 * 1024 * 1024):
+        """
+        :param cache_dir: The directory to store cached files in.  Defaults to the OPENHOLDINGS_CACHE_DIR environment
+            variable, or `~/.cache/openholdings/http` if it isn't set.
+        :param ttl: Seconds a cached file is served without revalidating it with the provider.
+        :param max_size: Maximum total size in bytes of cached response bodies.
+        """
+        if cache_dir is None:
+            cache_dir = os.environ.get('OPENHOLDINGS_CACHE_DIR',
+                os.path.join(os.path.expanduser('~'), '.cache', 'openholdings', 'http'))
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_size = max_size
+        self.bodies_dir = os.path.join(cache_dir, 'bodies')
+        self.urls_dir = os.path.join(cache_dir, 'urls')
+        os.makedirs(self.bodies_dir, exist_ok=True)
+        os.makedirs(self.urls_dir, exist_ok=True)
+
+    def open(self, url, session, timeout, chunk_size):
+        """Returns the body of a URL, from the cache if it's fresh or unchanged, otherwise from the network.
+
+        :param url: The URL to download.
+        :param session: The requests.Session to make the request with.
+        :param timeout: The (connect, read) timeout to make the request with.
+        :param chunk_size: Size in bytes of the chunks the response body is read in.
+        :returns: A (binary file object, content hash) tuple.  The file object should be closed by the caller.
+        :raises requests.HTTPError: If the provider responds with an error status.
+        """
+        metadata_path = self.get_metadata_path(url)
+        metadata = self.read_metadata(metadata_path)
+        cached_document = self.open_fresh(metadata)
+        if cached_document is not None:
+            return cached_document
+
+        with session.get(url, headers=self.get_conditional_headers(metadata), allow_redirects=True, stream=True,
+                         timeout=timeout) as r:
+            if r.status_code == 304 and metadata is not None:
+                cached_document = self.open_revalidated(metadata_path, metadata)
+                if cached_document is not None:
+                    return cached_document
+                # The body was evicted after revalidation began, so download it again unconditionally
+                self.forget(url)
+                return self.open(url, session, timeout, chunk_size)
+            r.raise_for_status()
+            content_hash = self.store_body(r.iter_content(chunk_size=chunk_size))
+            self.record_response(url, metadata_path, r.headers, content_hash)
+
+        return self.open_stored(content_hash)
+
+    async def aopen(self, url, session, chunk_size):
+        """Returns the body of a URL like open(), but downloads it with aiohttp without blocking the event loop.
+
+        Reading and writing the cache's own files is still done on the calling thread, since they're local files.
+
+        :param url: The URL to download.
+        :param session: The aiohttp.ClientSession to make the request with.
+        :param chunk_size: Size in bytes of the chunks the response body is read in.
+        :returns: A (binary file object, content hash) tuple.  The file object should be closed by the caller.
+        :raises aiohttp.ClientResponseError: If the provider responds with an error status.
+        """
+        metadata_path = self.get_metadata_path(url)
+        metadata = self.read_metadata(metadata_path)
+        cached_document = self.open_fresh(metadata)
+        if cached_document is not None:
+            return cached_document
+
+        async with session.get(url, headers=self.get_conditional_headers(metadata), allow_redirects=True) as r:
+            if r.status == 304 and metadata is not None:
+                cached_document = self.open_revalidated(metadata_path, metadata)
+                if cached_document is not None:
+                    return cached_document
+                self.forget(url)
+                return await self.aopen(url, session, chunk_size)
+            r.raise_for_status()
+            chunks = [chunk async for chunk in r.content.iter_chunked(chunk_size)]
+            content_hash = self.store_body(chunks)
+            self.record_response(url, metadata_path, r.headers, content_hash)
+
+        return self.open_stored(content_hash)
+
+    def open_fresh(self, metadata):
+        """Opens a URL's cached body if it was fetched or revalidated within the TTL.
+
+        :param metadata: The URL's metadata, or None if it isn't cached.
+        :returns: A (binary file object, content hash) tuple, or None if the URL has to be requested.
+        """
+        if metadata is None or time.time() - metadata['fetched_at'] >= self.ttl:
+            return None
+        cached_body = self.open_body(metadata['content_hash'])
+        if cached_body is None:  # Body was evicted
+            return None
+        return cached_body, metadata['content_hash']
+
+    def get_conditional_headers(self, metadata):
+        """Returns the headers that make a request for a cached URL conditional on it having changed."""
+        request_headers = {}
+        # A body that's been evicted can't be served on a 304 response, so it's requested unconditionally
+        if metadata is not None and os.path.exists(os.path.join(self.bodies_dir, metadata['content_hash'])):
+            if metadata.get('etag'):
+                request_headers['If-None-Match'] = metadata['etag']
+            if metadata.get('last_modified'):
+                request_headers['If-Modified-Since'] = metadata['last_modified']
+        return request_headers
+
+    def open_revalidated(self, metadata_path, metadata):
+        """Opens a URL's cached body after the provider confirmed it's unchanged, restarting its TTL.
+
+        :returns: A (binary file object, content hash) tuple, or None if the body has been evicted in the meantime.
+        """
+        cached_body = self.open_body(metadata['content_hash'])
+        if cached_body is None:
+            return None
+        metadata['fetched_at'] = time.time()
+        self.write_metadata(metadata_path, metadata)
+        return cached_body, metadata['content_hash']
+
+    def record_response(self, url, metadata_path, response_headers, content_hash):
+        """Records the body and validators a URL returned, so it can be served and revalidated later."""
+        self.write_metadata(metadata_path, {
+            'url': url,
+            'etag': response_headers.get('ETag'),
+            'last_modified': response_headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'content_hash': content_hash,
+        })
+
+    def open_stored(self, content_hash):
+        """Opens a body that was just stored, then evicts other bodies if the cache has outgrown its size limit."""
+        cached_body = self.open_body(content_hash)
+        self.evict()
+        return cached_body, content_hash
+
+    def forget(self, url):
+        """Removes a URL's metadata so that it's downloaded unconditionally next time.
+
+        :param url: The URL to forget.
+        """
+        try:
+            os.remove(self.get_metadata_path(url))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Removes every cached file."""
+        for directory in (self.urls_dir, self.bodies_dir):
+            for filename in os.listdir(directory):
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except FileNotFoundError:
+                    pass
+
+    def get_metadata_path(self, url):
+        return os.path.join(self.urls_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def read_metadata(self, metadata_path):
+        try:
+            with open(metadata_path, mode='r', encoding='utf-8') as metadata_file:
+                return json.load(metadata_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_metadata(self, metadata_path, metadata):
+        self.write_atomically(metadata_path, json.dumps(metadata).encode('utf-8'))
+
+    def open_body(self, content_hash):
+        """Opens a cached body and marks it as recently used.
+
+        :param content_hash: The SHA-256 hash of the body's contents.
+        :returns: A binary file object, or None if the body has been evicted.
+        """
+        body_path = os.path.join(self.bodies_dir, content_hash)
+        try:
+            body_file = open(body_path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(body_path)
+        except OSError:
+            pass
+        return body_file
+
+    def store_body(self, chunks):
+        """Writes a response body into the cache while hashing it.
+
+        :param chunks: An iterable of the body's bytes.
+        :returns: The SHA-256 hash of the body's contents.
+        """
+        hasher = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.bodies_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    temp_file.write(chunk)
+            content_hash = hasher.hexdigest()
+            os.replace(temp_path, os.path.join(self.bodies_dir, content_hash))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return content_hash
+
+    def write_atomically(self, path, data):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def evict(self):
+        """Deletes the least recently used bodies until the cache fits within its size limit."""
+        bodies = []
+        total_size = 0
+        for filename in os.listdir(self.bodies_dir):
+            if filename.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.bodies_dir, filename))
+            except FileNotFoundError:
+                continue  # Evicted by another process
+            bodies.append((stat.st_mtime, stat.st_size, filename))
+            total_size += stat.st_size
+
+        bodies.sort()
+        for _, size, filename in bodies:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.bodies_dir, filename))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue  # Still open on a platform that doesn't allow deleting open files
+            total_size -= size
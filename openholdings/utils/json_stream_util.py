@@ -0,0 +1,69 @@
+import json
+
+def iter_json_array(text_stream, array_key, chunk_size=64 * 1024):
+    """Incrementally decodes the items of an array inside a JSON document, i.e. the rows of {"aaData": [...]}.
+
+    Only as much of the document as is needed to decode the next item is held in memory, so the items of a very
+    large array can be processed one at a time as the document is read.
+
+    :param text_stream: A text file object containing the JSON document.
+    :param array_key: The key of the array whose items should be decoded.  The first occurrence of the key is used.
+    :param chunk_size: The number of characters read from the stream at a time.
+    :returns: A generator of the array's decoded items.
+    :raises ValueError: If the document doesn't contain the array or ends before the array does.
+    """
+    decoder = json.JSONDecoder()
+    marker = '"{}"'.format(array_key)
+    buffer = ''
+    position = 0
+    at_end_of_stream = False
+
+    def read_more():
+        nonlocal buffer, position, at_end_of_stream
+        chunk = text_stream.read(chunk_size)
+        if not chunk:
+            at_end_of_stream = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    # Skip ahead to the opening bracket of the array
+    while True:
+        marker_index = buffer.find(marker)
+        if marker_index >= 0:
+            bracket_index = buffer.find('[', marker_index + len(marker))
+            if bracket_index >= 0:
+                position = bracket_index + 1
+                break
+            position = marker_index
+        else:
+            # Keep enough of the buffer to match a marker that's split across two chunks
+            position = max(0, len(buffer) - len(marker))
+        if at_end_of_stream:
+            raise ValueError('JSON document has no "{}" array'.format(array_key))
+        read_more()
+
+    while True:
+        # Skip the whitespace and commas separating items
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer):
+            if at_end_of_stream:
+                raise ValueError('JSON document ended inside the "{}" array'.format(array_key))
+            read_more()
+            continue
+        if buffer[position] == ']':
+            return
+
+        try:
+            item, end_position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if at_end_of_stream:
+                raise
+            read_more()  # The item is cut off at the end of the buffer
+            continue
+        if not at_end_of_stream and not isinstance(item, (list, dict, str)) \
+                and (end_position == len(buffer) or buffer[end_position] not in ' \t\r\n,]'):
+            read_more()  # A number cut off at the end of the buffer (i.e. '4.' of '4.5') decodes without error
+            continue
+        position = end_position
+        yield item
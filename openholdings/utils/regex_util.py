@@ -1,4 +1,10 @@
-import re
+from .validation import (
+    PERCENTAGE_PATTERN,
+    CUSIP_PATTERN,
+    SEDOL_PATTERN,
+    is_ticker_symbol,
+    is_valid_isin
+)
 
 def is_percentage(value):
     """Checks whether a string is a percentage (i.e. 1.50%, 13.00%, .85%).
@@ -6,17 +12,7 @@ def is_percentage(value):
     :param value: A string to evaluate.
     :returns: True if string is in the form of a percentage value.
     """
-    return re.match(r'-?\d*(.\d+)?%', value)
-
-def is_ticker_symbol(value):
-    """Checks whether a string is a possibly valid stock ticker symbol.
-
-    Examples: 'GOOG', 'BRK/B', '263750 KS', 'EMBRAC B SS'
-
-    :param value: A string to evaluate.
-    :returns: True if string is in the form of a valid stock ticker symbol.
-    """
-    return re.match(r'^[A-Z0-9/]{1,7}(\s+[ABC])?(\s+[A-Z]{1,3})?$', value)
+    return PERCENTAGE_PATTERN.match(value)
 
 def is_cusip(value):
     """Checks whether a string is a valid CUSIP identifier.
@@ -25,7 +21,7 @@ def is_cusip(value):
 
     :param value: A string to evaluate.
     :returns: True if string is in the form of a valid CUSIP number."""
-    return re.match(r'^([\w\d]{6})([\w\d]{2})([\w\d]{1})$', value)
+    return CUSIP_PATTERN.match(value)
 
 def is_sedol(value):
     """Checks whether a string is a valid SEDOL identifier.
@@ -34,14 +30,14 @@ def is_sedol(value):
 
     :param value: A string to evaluate.
     :returns: True if string is in the form of a valid SEDOL identifier."""
-    return re.match(r'^[0-9BCDFGHJKLMNPQRSTVWXYZ]{6}\d$', value)
+    return SEDOL_PATTERN.match(value)
 
 def is_isin(value):
-    """Checks whether a string is an ISIN identifier.
+    """Checks whether a string is an ISIN identifier, including its check digit.
 
     :param value: A string to evaluate.
     :returns: True if string is in the form of a valid ISIN identifier."""
-    return True
+    return is_valid_isin(value)
 
 def is_number(value):
     """Checks whether a string is a floating point number.
@@ -0,0 +1,231 @@
+"""
+Declarative descriptions of the row formats of providers' holdings files, compiled into fast row decoders.
+
+A RowSchema describes one format once, as data: which columns each holding field is read from and how the raw
+values are converted, which columns decide a holding's type, and a fingerprint (the length of a row, or columns the
+header must contain) used to recognize files in the format.  Compiling a schema against a file's header resolves
+every column to a position and groups the fields by holding type, so decoding a row is a series of positional
+lookups and converter calls with no per-row format checks, and fields that don't apply to the holding's type are
+never converted at all.  A compiled schema can also decode a row straight into the columns of a HoldingsTable, so a
+fund's holdings can be read into a table without creating a Holding object per row.
+
+Converters that parse strings are memoized, since holdings files repeat the same few hundred dates and values.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
+from ..exceptions import HoldingsFormatException
+from ..models.lazy_holding import LazyEquity, LazyBond, LazyFuture, LazyCash
+from ..models import Equity, Bond, Future, Cash
+from ..models.holdings_table import ASSET_CLASS_CODES, NUMERIC_COLUMNS, STRING_COLUMNS
+from .holding_factory import HOLDING_TYPE_FIELDS
+
+Field = namedtuple('Field', ['name', 'columns', 'converter'])
+"""A holding field, read from one column (an index or header name) or a tuple of columns, and converted by passing
+the values of those columns to the converter.  A converter of None takes the value as is, and a converter of an empty
+tuple of columns is called with no arguments, for fields with a constant value.  A converted value of None leaves
+the field unset."""
+
+NAN = float('nan')
+
+LAZY_HOLDING_TYPES = {Equity: LazyEquity, Bond: LazyBond, Future: LazyFuture, Cash: LazyCash}
+
+class RowSchema:
+    """The description of one row format of a provider's holdings file."""
+
+    def __init__(self, name, fields, holding_type, row_length=None, required_columns=()):
+        """
+        :param name: A name for the format, i.e. 'ishares-stock'.
+        :param fields: A list of Fields describing how each holding field is read from a row.
+        :param holding_type: A Field whose converter returns the Holding subclass (Equity, Bond, Future, or Cash) that
+            a row should be decoded into.
+        :param row_length: If given, files in this format have rows of exactly this many columns.
+        :param required_columns: Header names that files in this format always have.
+        """
+        self.name = name
+        self.fields = fields
+        self.holding_type = holding_type
+        self.row_length = row_length
+        self.required_columns = frozenset(required_columns)
+        self._compiled_schemas = {}
+
+    def matches(self, header=None, row=None):
+        """Checks a file's header and/or first row against the format's fingerprint.
+
+        :param header: The list of column names in the file's header, for formats with one.
+        :param row: The first row of the file.
+        :returns: True if the file is in this format.
+        """
+        if self.row_length is not None and (row is None or len(row) != self.row_length):
+            return False
+        if self.required_columns and (header is None or not self.required_columns.issubset(header)):
+            return False
+        return True
+
+    def compile(self, header=None):
+        """Compiles the schema into a decoder for rows laid out according to the given header.
+
+        Compiled schemas are remembered per header, so a format is only compiled once per distinct header.
+
+        :param header: The list of column names in the file's header.  Required if any column is given by name.
+        :returns: A CompiledSchema.
+        """
+        key = tuple(header) if header is not None else None
+        compiled_schema = self._compiled_schemas.get(key)
+        if compiled_schema is None:
+            compiled_schema = self._compiled_schemas[key] = CompiledSchema(self, header)
+        return compiled_schema
+
+class CompiledSchema:
+    """A RowSchema resolved against a particular header, which decodes rows into holdings."""
+
+    def __init__(self, schema, header=None):
+        self.schema = schema
+        self.get_holding_type = compile_field(schema.holding_type, header)
+        self.fields_by_type = {}
+        self.decoders_by_type = {}
+        for holding_type, type_fields in HOLDING_TYPE_FIELDS.items():
+            compiled_fields = [(field.name, compile_field(field, header)) for field in schema.fields
+                if field.name == 'name' or field.name in type_fields]
+            self.fields_by_type[holding_type] = compiled_fields
+            self.decoders_by_type[holding_type] = dict(compiled_fields)
+
+        # Holding type -> (asset class code, [(numeric column, decoder, default)], [(string column, decoder, default)]),
+        # with a decoder of None for columns the schema doesn't read, and the holding type's default for each column
+        self.table_columns_by_type = {}
+        for holding_type, decoders in self.decoders_by_type.items():
+            defaults = holding_type(None)
+            self.table_columns_by_type[holding_type] = (ASSET_CLASS_CODES[holding_type],
+                [(column, decoders.get(column), getattr(defaults, column, None)) for column in NUMERIC_COLUMNS],
+                [(column, decoders.get(column), getattr(defaults, column, None)) for column in STRING_COLUMNS])
+
+    def decode(self, row, holding_type=None):
+        """Decodes a row into a holding of the type the schema assigns it, converting only the fields of that type.
+
+        :param row: A row of the holdings file.
+        :param holding_type: The row's holding type, if it's already been determined.
+        :returns: An Equity, Bond, Future, or Cash object.
+        """
+        if holding_type is None:
+            holding_type = self.get_holding_type(row)
+        fields = {}
+        for field_name, decode_field in self.fields_by_type[holding_type]:
+            value = decode_field(row)
+            if value is not None:
+                fields[field_name] = value
+        return holding_type(**fields)
+
+    def decode_into(self, table, row, holding_type=None):
+        """Decodes a row straight into a new row of a HoldingsTable, converting only the fields the table stores.
+
+        The table ends up with the same values as if the row were decoded into a holding and appended to it.
+
+        :param table: The HoldingsTable to append the row to.
+        :param row: A row of the holdings file.
+        :param holding_type: The row's holding type, if it's already been determined.
+        """
+        if holding_type is None:
+            holding_type = self.get_holding_type(row)
+        asset_class_code, numeric_decoders, string_decoders = self.table_columns_by_type[holding_type]
+        table.asset_class.append(asset_class_code)
+        numeric_columns = table.numeric_columns
+        for column, decode_field, default in numeric_decoders:
+            value = decode_field(row) if decode_field is not None else None
+            if value is None:
+                value = default
+            numeric_columns[column].append(float(value) if value is not None else NAN)
+        string_columns = table.string_columns
+        for column, decode_field, default in string_decoders:
+            value = decode_field(row) if decode_field is not None else None
+            string_columns[column].append(value if value is not None else default)
+
+    def view(self, row, holding_type=None):
+        """Wraps a row in a lazy holding view, which converts each field only when it's first accessed.
+
+        :param row: A row of the holdings file.
+        :param holding_type: The row's holding type, if it's already been determined.
+        :returns: A LazyEquity, LazyBond, LazyFuture, or LazyCash object.
+        """
+        if holding_type is None:
+            holding_type = self.get_holding_type(row)
+        return LAZY_HOLDING_TYPES[holding_type](row, self.decoders_by_type[holding_type])
+
+    def get_weight(self, holding_type, row):
+        """Decodes only the percent weighting of a row, i.e. to check it against a HoldingsFilter before decoding
+        the rest of the row.
+
+        :param holding_type: The row's holding type.
+        :param row: A row of the holdings file.
+        :returns: The row's percent weighting, or None if the schema doesn't have one.
+        """
+        decode_weight = self.decoders_by_type[holding_type].get('percent_weighting')
+        return decode_weight(row) if decode_weight is not None else None
+
+def compile_field(field, header=None):
+    """Compiles a Field into a function that reads and converts the field's value from a row.
+
+    :param field: The Field to compile.
+    :param header: The list of column names in the file's header, used to resolve columns given by name.
+    :returns: A function that accepts a row and returns the field's value.
+    """
+    columns = field.columns if isinstance(field.columns, tuple) else (field.columns,)
+    indexes = [resolve_column(column, header) for column in columns]
+    converter = field.converter
+    if not indexes:
+        return lambda row: converter()
+    if len(indexes) == 1:
+        get_value = itemgetter(indexes[0])
+        if converter is None:
+            return get_value
+        return lambda row: converter(get_value(row))
+    get_values = itemgetter(*indexes)
+    if converter is None:
+        return get_values
+    return lambda row: converter(*get_values(row))
+
+def resolve_column(column, header):
+    """Resolves a column given by index or header name to its position in a row.
+
+    :raises HoldingsFormatException: If the header doesn't have the column, i.e. because the provider renamed it.
+    """
+    if isinstance(column, int):
+        return column
+    if header is None:
+        raise HoldingsFormatException('Column "{}" is given by name, but the file has no header'.format(column))
+    try:
+        return header.index(column)
+    except ValueError:
+        raise HoldingsFormatException('The holdings file has no "{}" column'.format(column)) from None
+
+def detect_schema(schemas, header=None, row=None):
+    """Finds the schema of a holdings file by its fingerprint.
+
+    :param schemas: The list of RowSchemas to check, in order.
+    :param header: The list of column names in the file's header, for formats with one.
+    :param row: The first row of the file.
+    :returns: The first matching RowSchema, or None if the file's format isn't recognized.
+    """
+    for schema in schemas:
+        if schema.matches(header, row):
+            return schema
+    return None
+
+@lru_cache(maxsize=4096)
+def convert_date_string(date_string, date_format):
+    """A memoized datetime.strptime(), since holdings files repeat the same few hundred dates many times over."""
+    return datetime.strptime(date_string, date_format)
+
+def date_converter(date_format):
+    """Returns a converter that parses a date string of the given format with convert_date_string()."""
+    return lambda date_string: convert_date_string(date_string, date_format)
+
+def memoized_converter(converter, maxsize=4096):
+    """Wraps a converter of strings (i.e. a number parser) in an LRU cache."""
+    return lru_cache(maxsize=maxsize)(converter)
+
+def valid_or_none(is_valid):
+    """Returns a converter that passes values through if they pass the given check, and otherwise leaves the field
+    unset."""
+    return lambda value: value if is_valid(value) else None
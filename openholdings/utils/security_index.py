@@ -0,0 +1,226 @@
+"""
+An inverted index of security -> the funds that hold it, across every fund that's been fetched.
+
+Each holding is indexed under each of its identifiers (ISIN, CUSIP, SEDOL, and ticker without its exchange suffix),
+so a security can be looked up by whichever identifier is at hand, regardless of which identifiers its funds'
+providers fill in.  It's also indexed under the identifiers derived from them, as the security master does: a holding
+that only has a US or Canadian ISIN can be found by its CUSIP, and one that only has a CUSIP by its US ISIN.  The
+index remembers which keys each fund was indexed under, so re-indexing a fund after it's re-fetched only touches that
+fund's postings instead of rebuilding the index.
+"""
+
+import os
+import pickle
+import tempfile
+import threading
+from collections import namedtuple
+from .validation import compute_isin_check_digit, is_valid_isin, is_valid_cusip, is_valid_sedol, normalize_ticker
+
+Posting = namedtuple('Posting', ['fund', 'weight', 'market_value'])
+"""A fund's position in a security: the fund's ticker, and the security's percent weighting and market value in it."""
+
+# Holding field -> the kind of key it's indexed under
+KEY_FIELDS = (('identifier_isin', 'isin'), ('identifier_cusip', 'cusip'), ('identifier_sedol', 'sedol'),
+    ('ticker', 'ticker'))
+
+# Countries whose ISINs are formed from the security's CUSIP
+CUSIP_COUNTRIES = ('US', 'CA')
+
+# Version of the format indexes are saved in
+INDEX_FORMAT_VERSION = 1
+
+class SecurityIndex:
+    """A thread-safe inverted index of (key kind, identifier) -> the funds holding the security, with their weights."""
+
+    def __init__(self):
+        self._postings = {}  # Key -> {fund ticker: (weight, market value)}
+        self._fund_keys = {}  # Fund ticker -> the keys it has postings under
+        self._lock = threading.Lock()
+
+    def update(self, fund, holdings):
+        """Indexes a fund's holdings, replacing any postings from the fund's previous holdings.
+
+        Holdings of the same security (i.e. two share classes listed under the same ticker) are combined into one
+        posting, with their weights and market values summed.
+
+        :param fund: The fund's ticker.
+        :param holdings: An iterable of the fund's Holdings.
+        """
+        fund = fund.upper()
+        fund_postings = {}
+        for holding in holdings:
+            for key in get_security_keys(holding):
+                posting = fund_postings.get(key)
+                if posting is None:
+                    fund_postings[key] = (holding.percent_weighting, holding.market_value)
+                else:
+                    fund_postings[key] = (add(posting[0], holding.percent_weighting),
+                        add(posting[1], holding.market_value))
+
+        with self._lock:
+            self._remove_fund(fund)
+            for key, posting in fund_postings.items():
+                key_postings = self._postings.get(key)
+                if key_postings is None:
+                    key_postings = self._postings[key] = {}
+                key_postings[fund] = posting
+            self._fund_keys[fund] = list(fund_postings)
+
+    def update_from_results(self, fetch_results):
+        """Indexes the holdings of every fund fetched successfully, i.e. by HoldingsFetcher.fetch_many().
+
+        :param fetch_results: An iterable of FetchResults.  Funds that failed to fetch are left as they were.
+        :returns: The number of funds indexed.
+        """
+        indexed_count = 0
+        for result in fetch_results:
+            if result.error is None:
+                self.update(result.ticker, result.holdings)
+                indexed_count += 1
+        return indexed_count
+
+    def remove(self, fund):
+        """Removes every posting of a fund.
+
+        :param fund: The fund's ticker.
+        :returns: True if the fund was indexed.
+        """
+        with self._lock:
+            return self._remove_fund(fund.upper())
+
+    def lookup(self, identifier, kind=None):
+        """Finds the funds holding a security.
+
+        :param identifier: An ISIN, CUSIP, SEDOL, or ticker of the security.
+        :param kind: The kind of identifier: 'isin', 'cusip', 'sedol', or 'ticker'.  If omitted, it's inferred from
+            the identifier's format and check digit, with anything that isn't a valid ISIN, CUSIP, or SEDOL treated
+            as a ticker.
+        :returns: A list of Postings, in order of descending weight.
+        """
+        kind = kind or get_identifier_kind(identifier)
+        key = (kind, normalize_identifier(kind, identifier))
+        with self._lock:
+            key_postings = self._postings.get(key)
+            postings = [Posting(fund, weight, market_value)
+                for fund, (weight, market_value) in key_postings.items()] if key_postings else []
+        postings.sort(key=lambda posting: posting.weight if posting.weight is not None else float('-inf'),
+            reverse=True)
+        return postings
+
+    def funds(self):
+        """Returns a list of the tickers of every indexed fund."""
+        with self._lock:
+            return list(self._fund_keys)
+
+    def __contains__(self, fund):
+        return fund.upper() in self._fund_keys
+
+    def __len__(self):
+        return len(self._fund_keys)
+
+    def save(self, path):
+        """Writes the index to a file, atomically replacing it if it exists.
+
+        :param path: The path of the file to write.
+        """
+        with self._lock:
+            contents = pickle.dumps((INDEX_FORMAT_VERSION, self._postings, self._fund_keys),
+                protocol=pickle.HIGHEST_PROTOCOL)
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(contents)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Reads an index written by save().
+
+        The file is unpickled, so only load index files from trusted sources.
+
+        :param path: The path of the file to read.
+        :returns: A SecurityIndex.
+        :raises ValueError: If the file wasn't written by a compatible version of save().
+        """
+        with open(path, 'rb') as index_file:
+            contents = pickle.load(index_file)
+        if not isinstance(contents, tuple) or len(contents) != 3 or contents[0] != INDEX_FORMAT_VERSION:
+            raise ValueError('Unrecognized security index file: {}'.format(path))
+        index = cls()
+        _, index._postings, index._fund_keys = contents
+        return index
+
+    def _remove_fund(self, fund):
+        keys = self._fund_keys.pop(fund, None)
+        if keys is None:
+            return False
+        for key in keys:
+            key_postings = self._postings[key]
+            del key_postings[fund]
+            if not key_postings:
+                del self._postings[key]
+        return True
+
+def add(value, other_value):
+    if value is None or other_value is None:
+        return value if other_value is None else other_value
+    return value + other_value
+
+def get_security_keys(holding):
+    """Returns the (key kind, normalized identifier) keys a holding is indexed under, including derived keys."""
+    keys = []
+    for field, kind in KEY_FIELDS:
+        value = getattr(holding, field, None)
+        if value:
+            value = normalize_identifier(kind, value)
+            if value:
+                keys.append((kind, value))
+    return keys + derive_keys(keys)
+
+def derive_keys(keys):
+    """Derives the keys implied by a security's keys that it doesn't already have: the US ISIN of a CUSIP, and the
+    CUSIP of a US or Canadian ISIN.
+
+    :param keys: A list of (key kind, normalized identifier) keys.
+    :returns: A list of the derived keys.
+    """
+    kinds = {kind for kind, _ in keys}
+    derived_keys = []
+    for kind, identifier in keys:
+        if kind == 'cusip' and 'isin' not in kinds and is_valid_cusip(identifier):
+            derived_keys.append(('isin', cusip_to_isin(identifier)))
+        elif kind == 'isin' and 'cusip' not in kinds and identifier[:2] in CUSIP_COUNTRIES \
+                and is_valid_isin(identifier):
+            derived_keys.append(('cusip', identifier[2:11]))
+    return derived_keys
+
+def cusip_to_isin(cusip, country='US'):
+    """Forms the ISIN of a security from its CUSIP.
+
+    :param cusip: The security's nine-character CUSIP.
+    :param country: The two-letter country code of the ISIN.
+    :returns: The ISIN, i.e. 'US0378331005' for the CUSIP '037833100'.
+    """
+    base = country + cusip
+    return base + str(compute_isin_check_digit(base))
+
+def normalize_identifier(kind, identifier):
+    identifier = identifier.strip().upper()
+    if kind == 'ticker':
+        return normalize_ticker(identifier)
+    return identifier
+
+def get_identifier_kind(identifier):
+    """Infers the kind of an identifier ('isin', 'cusip', 'sedol', or 'ticker') from its format and check digit."""
+    identifier = identifier.strip().upper()
+    if is_valid_isin(identifier):
+        return 'isin'
+    if is_valid_cusip(identifier):
+        return 'cusip'
+    if is_valid_sedol(identifier):
+        return 'sedol'
+    return 'ticker'
@@ -0,0 +1,255 @@
+"""
+A security master: a cross-reference of the identifiers of every security seen in any fund's holdings, assigning
+each security a small integer ID so that holdings of the same security in different funds (and from different
+providers) can be joined and aggregated as arrays indexed by ID.
+
+Providers fill in identifiers inconsistently: iShares gives a CUSIP, ISIN, and SEDOL, while Invesco, SPDR, VanEck, and
+Vanguard mostly give only a ticker and name.  Each holding is identified by every identifier it has, so once one
+fund's holding ties a security's ISIN to its ticker, another fund's holding that only has the ticker is given the same
+ID.  Identifiers are also derived from each other where that's exact: a US ISIN is 'US' + CUSIP + check digit, and the
+CUSIP of a US or Canadian security is the middle nine characters of its ISIN.
+
+Every key of every security maps directly to its ID, so lookups from any identifier are a single dictionary access.
+When a holding reveals that two IDs are the same security, the one found by the holding's less preferred identifier is
+merged into the other: its keys are re-pointed, and its ID becomes an alias of the surviving one (see
+canonical_id()).  Two IDs are never merged if their ISINs, CUSIPs, or tickers differ, so a security's share classes
+(i.e. GOOGL and GOOG) keep their own IDs.  Names aren't unique across share classes and issues, so a holding is only
+identified by its name when it has no other identifier.
+"""
+
+import os
+import pickle
+import tempfile
+import threading
+from ..models import Cash
+from .security_index import derive_keys, get_identifier_kind, normalize_identifier
+
+# Holding field -> the kind of key it identifies a security by, in order of preference
+SECURITY_KEY_FIELDS = (('identifier_isin', 'isin'), ('identifier_cusip', 'cusip'), ('identifier_sedol', 'sedol'),
+    ('ticker', 'ticker'), ('name', 'name'))
+
+# Kinds of keys a security has only one of, so two securities with different values of them aren't the same.  A
+# security may be listed under several SEDOLs (one per exchange), so SEDOLs aren't among them.
+CONFLICTING_KEY_KINDS = ('isin', 'cusip', 'ticker')
+
+# Version of the format security masters are saved in
+MASTER_FORMAT_VERSION = 1
+
+class SecurityMaster:
+    """A thread-safe cross-reference of (key kind, identifier) -> security ID, learned from funds' holdings."""
+
+    def __init__(self):
+        self._ids = {}  # (key kind, identifier) -> security ID
+        self._keys = []  # Security ID -> list of its keys, or None if it was merged into another ID
+        self._identifiers = []  # Security ID -> {key kind: identifier} of the first of each kind given by a holding
+        self._aliases = {}  # Merged security ID -> the ID it was merged into
+        self._lock = threading.RLock()
+
+    def get_id(self, holding):
+        """Returns the ID of a holding's security, learning any of its identifiers that aren't known yet."""
+        return self.get_id_for_keys(get_security_keys(holding))
+
+    def get_id_for_keys(self, keys):
+        """Returns the ID of the security with the given (key kind, identifier) keys, assigning a new one if none of
+        the keys are known.  Keys that aren't known yet are tied to the ID, along with the keys derived from them.
+
+        :param keys: A list of the security's normalized keys, i.e. from get_security_keys().
+        :returns: The security's ID.
+        """
+        derived_keys = derive_keys(keys)
+        key_identifiers = {kind: identifier for kind, identifier in reversed(keys) if kind in CONFLICTING_KEY_KINDS}
+        with self._lock:
+            candidate_ids = []
+            for key in keys + derived_keys:
+                security_id = self._ids.get(key)
+                if security_id is not None and security_id not in candidate_ids \
+                        and is_compatible(self._identifiers[security_id], key_identifiers):
+                    candidate_ids.append(security_id)
+
+            if candidate_ids:
+                security_id = candidate_ids[0]
+                for other_id in candidate_ids[1:]:
+                    if is_compatible(self._identifiers[security_id], self._identifiers[other_id]):
+                        self._merge(other_id, security_id)
+            else:
+                security_id = len(self._keys)
+                self._keys.append([])
+                self._identifiers.append({})
+
+            identifiers = self._identifiers[security_id]
+            for key in keys:
+                kind, identifier = key
+                identifiers.setdefault(kind, identifier)
+                self._add_key(key, security_id)
+            for key in derived_keys:
+                if key[0] not in identifiers or identifiers[key[0]] == key[1]:
+                    self._add_key(key, security_id)
+            return security_id
+
+    def update(self, holdings):
+        """Learns the identifiers of a fund's holdings.
+
+        :param holdings: An iterable of Holdings.
+        :returns: A list of the ID of each holding's security.
+        """
+        return [self.get_id(holding) for holding in holdings]
+
+    def update_from_results(self, fetch_results):
+        """Learns the identifiers of the holdings of every fund fetched successfully, i.e. by
+        HoldingsFetcher.fetch_many().
+
+        :param fetch_results: An iterable of FetchResults.  Funds that failed to fetch are skipped.
+        :returns: The number of funds learned from.
+        """
+        updated_count = 0
+        for result in fetch_results:
+            if result.error is None:
+                self.update(result.holdings)
+                updated_count += 1
+        return updated_count
+
+    def lookup(self, identifier, kind=None):
+        """Finds the ID of a security.
+
+        :param identifier: An ISIN, CUSIP, SEDOL, ticker, or name of the security.
+        :param kind: The kind of identifier: 'isin', 'cusip', 'sedol', 'ticker', or 'name'.  If omitted, it's
+            inferred from the identifier's format and check digit, with anything that isn't a valid ISIN, CUSIP, or
+            SEDOL treated as a ticker.
+        :returns: The security's ID, or None if the identifier isn't known.
+        """
+        kind = kind or get_identifier_kind(identifier)
+        key = (kind, normalize_name(identifier) if kind == 'name' else normalize_identifier(kind, identifier))
+        with self._lock:
+            security_id = self._ids.get(key)
+            if security_id is None:
+                for derived_key in derive_keys([key]):
+                    security_id = self._ids.get(derived_key)
+                    if security_id is not None:
+                        break
+            return security_id
+
+    def canonical_id(self, security_id):
+        """Returns the ID a security ID was merged into, or the ID itself if it wasn't merged.
+
+        IDs returned before two securities were found to be the same remain valid, but refer to the merged security
+        through this alias.
+        """
+        with self._lock:
+            while security_id in self._aliases:
+                security_id = self._aliases[security_id]
+            return security_id
+
+    def canonical_ids(self):
+        """Returns a list of the canonical ID of every ID assigned, indexed by ID, for re-keying arrays built before
+        IDs were merged."""
+        with self._lock:
+            return [self.canonical_id(security_id) for security_id in range(len(self._keys))]
+
+    @property
+    def merge_count(self):
+        """The number of times two IDs have been merged.  Holders of security IDs can compare it with the count when
+        they last re-keyed their IDs to tell whether any of them have become aliases."""
+        return len(self._aliases)
+
+    def get_identifiers(self, security_id):
+        """Returns a dictionary of key kind -> the identifier of that kind a security was first seen with, i.e.
+        {'isin': 'US0378331005', 'cusip': '037833100', 'ticker': 'AAPL', 'name': 'APPLE INC'}."""
+        with self._lock:
+            return dict(self._identifiers[self.canonical_id(security_id)])
+
+    def get_keys(self, security_id):
+        """Returns a list of every (key kind, identifier) key a security is known by, including derived keys."""
+        with self._lock:
+            return list(self._keys[self.canonical_id(security_id)])
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def __len__(self):
+        """The number of IDs assigned, including those merged into other IDs, i.e. the size of an array indexed by
+        security ID."""
+        return len(self._keys)
+
+    def save(self, path):
+        """Writes the security master to a file, atomically replacing it if it exists.
+
+        :param path: The path of the file to write.
+        """
+        with self._lock:
+            contents = pickle.dumps((MASTER_FORMAT_VERSION, self._ids, self._keys, self._identifiers, self._aliases),
+                protocol=pickle.HIGHEST_PROTOCOL)
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(contents)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Reads a security master written by save().
+
+        The file is unpickled, so only load files from trusted sources.
+
+        :param path: The path of the file to read.
+        :returns: A SecurityMaster.
+        :raises ValueError: If the file wasn't written by a compatible version of save().
+        """
+        with open(path, 'rb') as master_file:
+            contents = pickle.load(master_file)
+        if not isinstance(contents, tuple) or len(contents) != 5 or contents[0] != MASTER_FORMAT_VERSION:
+            raise ValueError('Unrecognized security master file: {}'.format(path))
+        master = cls()
+        _, master._ids, master._keys, master._identifiers, master._aliases = contents
+        return master
+
+    def _add_key(self, key, security_id):
+        if key not in self._ids:
+            self._ids[key] = security_id
+            self._keys[security_id].append(key)
+
+    def _merge(self, security_id, target_id):
+        """Merges a security ID into another, re-pointing its keys."""
+        for key in self._keys[security_id]:
+            self._ids[key] = target_id
+        self._keys[target_id].extend(self._keys[security_id])
+        for kind, identifier in self._identifiers[security_id].items():
+            self._identifiers[target_id].setdefault(kind, identifier)
+        self._keys[security_id] = None
+        self._identifiers[security_id] = {}
+        self._aliases[security_id] = target_id
+
+def is_compatible(identifiers, other_identifiers):
+    """Checks whether two sets of identifiers could be of the same security, i.e. their ISINs, CUSIPs, and tickers
+    agree."""
+    for kind in CONFLICTING_KEY_KINDS:
+        identifier = identifiers.get(kind)
+        other_identifier = other_identifiers.get(kind)
+        if identifier is not None and other_identifier is not None and identifier != other_identifier:
+            return False
+    return True
+
+def get_security_keys(holding):
+    """Returns the (key kind, normalized identifier) keys of a holding's security, in SECURITY_KEY_FIELDS order.
+
+    Cash holdings are identified only by their currency, since providers name them inconsistently.  Other holdings
+    are only identified by their name if they have no other identifier.
+    """
+    if isinstance(holding, Cash):
+        return [('cash', holding.currency or 'USD')]
+    keys = []
+    for field, kind in SECURITY_KEY_FIELDS:
+        if kind == 'name' and keys:
+            break
+        value = getattr(holding, field, None)
+        if value:
+            value = normalize_name(value) if kind == 'name' else normalize_identifier(kind, value)
+            if value:
+                keys.append((kind, value))
+    return keys
+
+def normalize_name(name):
+    return ' '.join(name.upper().split())
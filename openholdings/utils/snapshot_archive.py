@@ -0,0 +1,473 @@
+"""
+An append-only archive of daily holdings snapshots, read through memory-mapped, zero-copy column views.
+
+Each snapshot is keyed by (provider, ticker, as-of date) and stored as one columnar segment holding the columns of a
+HoldingsTable: the asset class codes, one array of doubles per numeric field, and one dictionary-encoded column per
+string field (integer codes plus the column's distinct values).  Segments are appended to a single data file, and a
+line describing each one is appended to an index file once its segment has been written, so a crash mid-append
+leaves at most some unreferenced bytes at the end of the data file.  Snapshots are never rewritten; appending a
+snapshot for a key that's already archived supersedes the earlier one.
+
+Holdings rarely change from one day to the next, so most columns of a fund's snapshot (its names, tickers, and
+identifiers in particular) are byte-for-byte identical to the previous day's.  Rather than writing such a column
+again, a segment's column directory points at the copy in the earlier segment, so a year of a fund's snapshots only
+stores each distinct column once.
+
+Reading a snapshot maps just the range of the data file its columns are in and wraps the columns in memoryviews, so
+nothing is decoded or copied until it's accessed, and only the pages of the columns that are read are touched.  The
+mapping belongs to the snapshot and is released when the snapshot (and every view of its columns) is freed.  Column
+arrays are stored in the machine's native byte order.
+
+Several processes may share an archive.  Appends hold an exclusive lock on the archive's lock file, and read the
+index lines other processes have appended before writing, so every segment is appended after (and can share columns
+with) the fund's latest snapshot, whichever process wrote it.  Snapshots appended by other processes are visible to
+reads once refresh() or append() has been called.
+"""
+
+import os
+import json
+import mmap
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import date, datetime
+from ..models import Equity, Bond, Future, Cash, HoldingsTable
+from ..models.holdings_table import DictionaryColumn, NUMERIC_COLUMNS, STRING_COLUMNS
+from .holding_factory import HOLDING_TYPE_FIELDS, create_holding_from_fields
+from .holdings_diff import diff_holdings
+
+SEGMENT_MAGIC = b'OHSG'
+SEGMENT_VERSION = 1
+
+# Magic, version, row count, and column count
+SEGMENT_HEADER = struct.Struct('<4sHxxII')
+
+# Offset of a column's data in the data file (possibly inside an earlier segment), and its length in bytes
+COLUMN_ENTRY = struct.Struct('<QQ')
+
+# Row count and number of distinct values at the start of a string column
+STRING_COLUMN_HEADER = struct.Struct('<II')
+
+# Columns are laid out in this order in every segment
+SEGMENT_COLUMNS = ('asset_class',) + NUMERIC_COLUMNS + STRING_COLUMNS
+
+# Asset class code -> holding type, in the order of HoldingsTable's ASSET_CLASSES
+ASSET_CLASS_TYPES = (Equity, Bond, Future, Cash)
+
+# Byte boundary each column is aligned to, so numeric columns can be viewed as arrays of doubles in place
+ALIGNMENT = 8
+
+class SnapshotArchive:
+    """An append-only, memory-mapped store of funds' holdings snapshots.  It's safe to use from several threads."""
+
+    def __init__(self, path):
+        """
+        :param path: The directory to keep the archive in.  It's created if it doesn't exist.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.data_path = os.path.join(path, 'segments.bin')
+        self.index_path = os.path.join(path, 'index.jsonl')
+        self.lock_path = os.path.join(path, 'archive.lock')
+        self._segments = {}  # (provider, ticker, as-of date) -> (offset, length) of the segment
+        self._dates = {}  # (provider, ticker) -> sorted list of the dates the fund has snapshots for
+        self._latest_keys = {}  # (provider, ticker) -> key of the most recently appended snapshot
+        self._index_position = 0  # Offset in the index file of the first line that hasn't been read
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def append(self, provider, ticker, holdings, as_of=None):
+        """Archives a fund's holdings as of a date.
+
+        :param provider: The name of the fund's provider.
+        :param ticker: The fund's ticker.
+        :param holdings: An iterable of Holdings, or a HoldingsTable.
+        :param as_of: The date (or datetime, of which only the date is kept) the holdings are as of.  Defaults to
+            today.
+        :raises TypeError: If as_of isn't a date.
+        """
+        table = holdings if isinstance(holdings, HoldingsTable) else HoldingsTable.from_holdings(holdings, ticker)
+        key = (provider, ticker.upper(), normalize_as_of(as_of) if as_of is not None else date.today())
+        columns = encode_table_columns(table)
+        with self._lock, lock_file(self.lock_path):
+            self._load_index()  # Snapshots other processes have appended since the index was last read
+            base_segment = self._segments.get(self._latest_keys.get(key[:2]))
+            with open(self.data_path, 'ab') as data_file:
+                offset = data_file.seek(0, os.SEEK_END)
+                if base_segment is None:
+                    segment = encode_segment(offset, len(table), columns)
+                else:
+                    with open(self.data_path, 'rb') as base_file:
+                        base_columns = read_segment_directory(base_file, *base_segment)[1]
+                        segment = encode_segment(offset, len(table), columns, base_columns,
+                            lambda base_offset, base_length: read_range(base_file, base_offset, base_length))
+                data_file.write(segment)
+                data_file.flush()
+                os.fsync(data_file.fileno())
+            # The segment only becomes part of the archive once its index line is written
+            index_line = json.dumps({'provider': key[0], 'ticker': key[1], 'as_of': key[2].isoformat(),
+                'offset': offset, 'length': len(segment)}) + '\n'
+            with open(self.index_path, 'ab') as index_file:
+                if index_file.tell() > self._index_position:
+                    index_file.write(b'\n')  # Terminate a line left partially written by a crash
+                index_file.write(index_line.encode('utf-8'))
+                self._index_position = index_file.tell()
+            self._add_segment(key, offset, len(segment))
+
+    def refresh(self):
+        """Reads the snapshots that other processes have appended to the archive since it was opened."""
+        with self._lock:
+            self._load_index()
+
+    def get(self, provider, ticker, as_of=None):
+        """Reads a fund's archived snapshot without copying or decoding any of it.
+
+        :param provider: The name of the fund's provider.
+        :param ticker: The fund's ticker.
+        :param as_of: The date of the snapshot.  Defaults to the fund's latest snapshot.
+        :returns: An ArchivedSnapshot, or None if the fund has no snapshot as of the date.
+        :raises TypeError: If as_of isn't a date.
+        """
+        ticker = ticker.upper()
+        with self._lock:
+            if as_of is not None:
+                key = (provider, ticker, normalize_as_of(as_of))
+            else:
+                dates = self._dates.get((provider, ticker))
+                key = (provider, ticker, dates[-1]) if dates else None
+            segment = self._segments.get(key) if key is not None else None
+        if segment is None:
+            return None
+        with open(self.data_path, 'rb') as data_file:
+            row_count, column_entries = read_segment_directory(data_file, *segment)
+            # Columns shared with earlier snapshots may lie before the segment, so map the span of all of them
+            ranges = column_entries + [segment]
+            start = min(offset for offset, _ in ranges) // mmap.ALLOCATIONGRANULARITY * mmap.ALLOCATIONGRANULARITY
+            end = max(offset + length for offset, length in ranges)
+            data_map = mmap.mmap(data_file.fileno(), end - start, access=mmap.ACCESS_READ, offset=start)
+        view = memoryview(data_map)
+        views = {column: view[offset - start:offset - start + length] for column, (offset, length)
+            in zip(SEGMENT_COLUMNS, column_entries)}
+        return ArchivedSnapshot(key, row_count, views)
+
+    def diff(self, provider, ticker, old_as_of, new_as_of=None, **diff_options):
+        """Diffs a fund's archived snapshots as of two dates.  See diff_holdings().
+
+        :param provider: The name of the fund's provider.
+        :param ticker: The fund's ticker.
+        :param old_as_of: The date of the earlier snapshot.
+        :param new_as_of: The date of the later snapshot.  Defaults to the fund's latest snapshot.
+        :param diff_options: Keyword arguments passed on to diff_holdings(), i.e. weight_tolerance.
+        :returns: A list of HoldingChanges.
+        :raises KeyError: If the fund has no snapshot as of either date.
+        """
+        old_snapshot = self.get(provider, ticker, old_as_of)
+        new_snapshot = self.get(provider, ticker, new_as_of)
+        if old_snapshot is None or new_snapshot is None:
+            raise KeyError((provider, ticker, old_as_of if old_snapshot is None else new_as_of))
+        return diff_holdings(old_snapshot, new_snapshot, **diff_options)
+
+    def as_of_dates(self, provider, ticker):
+        """Returns the sorted list of dates a fund has archived snapshots for."""
+        with self._lock:
+            return list(self._dates.get((provider, ticker.upper()), ()))
+
+    def keys(self):
+        """Returns a list of the (provider, ticker, as-of date) keys of every archived snapshot."""
+        with self._lock:
+            return list(self._segments)
+
+    def __contains__(self, key):
+        provider, ticker, as_of = key
+        with self._lock:
+            return (provider, ticker.upper(), normalize_as_of(as_of)) in self._segments
+
+    def __len__(self):
+        return len(self._segments)
+
+    def close(self):
+        """Closes the archive.  Nothing is held open between calls, and each snapshot releases its own mapping of the
+        data file once it's freed, so this only exists to let the archive be used as a context manager."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _load_index(self):
+        # Reads the index lines appended since the index was last read
+        try:
+            data_size = os.path.getsize(self.data_path)
+        except FileNotFoundError:
+            data_size = 0
+        try:
+            with open(self.index_path, mode='rb') as index_file:
+                index_file.seek(self._index_position)
+                for line in index_file:
+                    if not line.endswith(b'\n'):
+                        break  # A line that's still being written, or was left partially written by a crash
+                    self._index_position += len(line)
+                    try:
+                        entry = json.loads(line)
+                        as_of = datetime.strptime(entry['as_of'], '%Y-%m-%d').date()
+                        key = (entry['provider'], entry['ticker'], as_of)
+                        offset, length = entry['offset'], entry['length']
+                    except (ValueError, KeyError, TypeError):
+                        continue  # A line left partially written by a crash, and terminated by the next append
+                    if offset + length <= data_size:
+                        self._add_segment(key, offset, length)
+        except FileNotFoundError:
+            pass
+
+    def _add_segment(self, key, offset, length):
+        self._segments[key] = (offset, length)
+        dates = self._dates.setdefault(key[:2], [])
+        index = bisect_left(dates, key[2])
+        if index == len(dates) or dates[index] != key[2]:
+            dates.insert(index, key[2])
+        self._latest_keys[key[:2]] = key
+
+def normalize_as_of(as_of):
+    """Returns the date of a snapshot's as-of date or datetime.
+
+    :raises TypeError: If as_of is neither a date nor a datetime.
+    """
+    if isinstance(as_of, datetime):
+        return as_of.date()
+    if isinstance(as_of, date):
+        return as_of
+    raise TypeError('as_of must be a date, not {}'.format(type(as_of).__name__))
+
+@contextmanager
+def lock_file(lock_path):
+    """Holds an exclusive lock on a lock file, blocking until any other process holding it releases it.
+
+    :param lock_path: The path of the lock file, which is created if it doesn't exist.
+    """
+    with open(lock_path, 'a+b') as lock:
+        if os.name == 'nt':
+            import msvcrt
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+def read_range(data_file, offset, length):
+    """Reads a range of bytes from a file, by seeking to it.  The file object shouldn't be shared between threads.
+
+    :param data_file: A binary file object open for reading.
+    :param offset: The offset of the first byte to read.
+    :param length: The number of bytes to read.
+    :returns: Up to `length` bytes, fewer if the file ends first.
+    """
+    data_file.seek(offset)
+    return data_file.read(length)
+
+def read_segment_directory(data_file, offset, length):
+    """Reads a segment's header and column directory from the data file.
+
+    :param data_file: The data file, open for reading in binary mode.
+    :param offset: The offset of the segment in the data file.
+    :param length: The length of the segment in bytes.
+    :returns: A (row count, column entries) tuple, where column entries is a list of the (offset, length) of each
+        column in the data file, in SEGMENT_COLUMNS order.
+    :raises ValueError: If there isn't a segment at the offset.
+    """
+    directory_size = SEGMENT_HEADER.size + len(SEGMENT_COLUMNS) * COLUMN_ENTRY.size
+    directory = read_range(data_file, offset, min(directory_size, length))
+    if len(directory) < directory_size:
+        raise ValueError('Unrecognized snapshot segment at offset {}'.format(offset))
+    magic, version, row_count, column_count = SEGMENT_HEADER.unpack_from(directory)
+    if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION or column_count != len(SEGMENT_COLUMNS):
+        raise ValueError('Unrecognized snapshot segment at offset {}'.format(offset))
+    column_entries = [COLUMN_ENTRY.unpack_from(directory, SEGMENT_HEADER.size + i * COLUMN_ENTRY.size)
+        for i in range(column_count)]
+    return row_count, column_entries
+
+def encode_table_columns(table):
+    """Encodes each column of a HoldingsTable into the bytes stored in a segment, in SEGMENT_COLUMNS order."""
+    columns = [table.asset_class.tobytes()]
+    for column in NUMERIC_COLUMNS:
+        columns.append(table.numeric_columns[column].tobytes())
+    for column in STRING_COLUMNS:
+        columns.append(encode_string_column(table.string_columns[column]))
+    return columns
+
+def encode_string_column(dictionary_column):
+    """Encodes a DictionaryColumn as its row count and number of distinct values, followed by the code of each row,
+    the end offset of each distinct value's UTF-8 bytes, and the concatenated UTF-8 bytes of the values."""
+    encoded_values = [value.encode('utf-8') for value in dictionary_column.values]
+    value_ends = array('I')
+    end = 0
+    for encoded_value in encoded_values:
+        end += len(encoded_value)
+        value_ends.append(end)
+    return b''.join([STRING_COLUMN_HEADER.pack(len(dictionary_column), len(encoded_values)),
+        dictionary_column.codes.tobytes(), value_ends.tobytes()] + encoded_values)
+
+def encode_segment(offset, row_count, columns, base_columns=None, read_bytes=None):
+    """Lays out a segment to be written at the given offset of the data file.
+
+    Columns that are identical to the corresponding column of the base segment (the fund's previous snapshot) aren't
+    written again; the segment's directory points at the base's copy instead.
+
+    :param offset: The offset in the data file the segment will be written at.
+    :param row_count: The number of holdings in the snapshot.
+    :param columns: The encoded bytes of each column, in SEGMENT_COLUMNS order.
+    :param base_columns: The (offset, length) directory entries of the base segment's columns, if there is one.
+    :param read_bytes: A function that accepts an offset and length and returns those bytes of the data file.
+    :returns: The bytes of the segment, padded to a multiple of ALIGNMENT.
+    """
+    directory_size = SEGMENT_HEADER.size + len(columns) * COLUMN_ENTRY.size
+    column_entries = []
+    column_data = []
+    end = offset + pad_length(directory_size)
+    for column_index, column in enumerate(columns):
+        if base_columns is not None:
+            base_offset, base_length = base_columns[column_index]
+            if base_length == len(column) and read_bytes(base_offset, base_length) == column:
+                column_entries.append((base_offset, base_length))
+                continue
+        column_entries.append((end, len(column)))
+        column_data.append(column + bytes(pad_length(len(column)) - len(column)))
+        end += pad_length(len(column))
+
+    segment = bytearray(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, row_count, len(columns)))
+    for column_offset, column_length in column_entries:
+        segment += COLUMN_ENTRY.pack(column_offset, column_length)
+    segment += bytes(pad_length(directory_size) - directory_size)
+    for data in column_data:
+        segment += data
+    return bytes(segment)
+
+def pad_length(length):
+    return (length + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+class ArchivedStringColumn:
+    """A dictionary-encoded string column of an archived snapshot, viewed in place in the data file.
+
+    Has the same interface as a HoldingsTable's DictionaryColumn: a code of -1 represents a missing value.
+    """
+
+    def __init__(self, view):
+        row_count, value_count = STRING_COLUMN_HEADER.unpack_from(view)
+        codes_end = STRING_COLUMN_HEADER.size + row_count * 4
+        value_ends_end = codes_end + value_count * 4
+        self.codes = view[STRING_COLUMN_HEADER.size:codes_end].cast('i')
+        """The code of each row's value, as an index into `values`."""
+
+        self._value_ends = view[codes_end:value_ends_end].cast('I')
+        self._value_bytes = view[value_ends_end:]
+        self._values = None
+
+    @property
+    def values(self):
+        """The distinct values of the column, decoded on first access."""
+        if self._values is None:
+            self._values = [self.get_value(code) for code in range(len(self._value_ends))]
+        return self._values
+
+    def get_value(self, code):
+        start = self._value_ends[code - 1] if code > 0 else 0
+        return str(self._value_bytes[start:self._value_ends[code]], 'utf-8')
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+        if code < 0:
+            return None
+        return self._values[code] if self._values is not None else self.get_value(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+class ArchivedSnapshot:
+    """A fund's holdings as of one date, read from a SnapshotArchive.
+
+    Columns are memoryviews into the archive's memory-mapped data file, with the same names and types as the
+    columns of a HoldingsTable: arrays of doubles for numeric fields (NaN where the field doesn't apply), an
+    ArchivedStringColumn for each string field, and codes into ASSET_CLASSES for the 'asset_class' column.
+    """
+
+    def __init__(self, key, row_count, views):
+        self.provider, self.ticker, self.as_of = key
+        self.row_count = row_count
+        self.asset_class = views['asset_class'].cast('b')
+        self.numeric_columns = {column: views[column].cast('d') for column in NUMERIC_COLUMNS}
+        self.string_columns = {column: ArchivedStringColumn(views[column]) for column in STRING_COLUMNS}
+
+    def __len__(self):
+        return self.row_count
+
+    def __getitem__(self, column):
+        if column == 'asset_class':
+            return self.asset_class
+        if column in self.numeric_columns:
+            return self.numeric_columns[column]
+        return self.string_columns[column]
+
+    def to_numpy(self):
+        """Converts the snapshot into a dictionary of column name -> NumPy array.
+
+        Numeric columns and the asset class code column are views of the memory-mapped data file.  String columns
+        are decoded into object arrays, with None for missing values.  Requires NumPy to be installed.
+
+        :returns: A dictionary of column name -> numpy.ndarray.
+        """
+        import numpy as np
+        columns = {'asset_class': np.frombuffer(self.asset_class, dtype=np.int8)}
+        for column, values in self.numeric_columns.items():
+            columns[column] = np.frombuffer(values, dtype=np.float64)
+        for column, values in self.string_columns.items():
+            codes = np.frombuffer(values.codes, dtype=np.int32)
+            decoded = np.array(values.values + [None], dtype=object)
+            columns[column] = decoded[codes]  # Code -1 selects the trailing None
+        return columns
+
+    def to_table(self):
+        """Copies the snapshot into an in-memory HoldingsTable."""
+        table = HoldingsTable(self.ticker)
+        table.asset_class = array('b', self.asset_class)
+        for column, values in self.numeric_columns.items():
+            table.numeric_columns[column] = array('d', values)
+        for column, values in self.string_columns.items():
+            table.string_columns[column] = DictionaryColumn.from_codes(array('i', values.codes), values.values)
+        return table
+
+    def to_holdings(self):
+        """Rebuilds the snapshot's Holding objects.
+
+        Only the fields stored in a HoldingsTable are restored, so fields like a bond's maturity date are None.
+
+        :returns: A list of Equity, Bond, Future, and Cash objects.
+        """
+        holdings = []
+        for row in range(self.row_count):
+            fields = {column: values[row] for column, values in self.string_columns.items()}
+            for column, values in self.numeric_columns.items():
+                value = values[row]
+                fields[column] = value if value == value else None  # NaN marks a missing value
+            holdings.append(create_archived_holding(self.asset_class[row], fields))
+        return holdings
+
+def create_archived_holding(asset_class_code, fields):
+    """Constructs a holding of the archived asset class from its fields, or lets the holding factory decide the
+    type of holdings that weren't of any of the asset classes."""
+    if asset_class_code < 0:
+        return create_holding_from_fields(fields)
+    holding_type = ASSET_CLASS_TYPES[asset_class_code]
+    type_fields = HOLDING_TYPE_FIELDS[holding_type]
+    return holding_type(fields.get('name'),
+        **{field: value for field, value in fields.items() if value is not None and field in type_fields})
@@ -0,0 +1,41 @@
+import requests
+from openpyxl import load_workbook
+from .file_util import read_file_prefix
+
+# Every .xlsx file is a ZIP archive, which begins with this signature
+XLSX_SIGNATURE = b'PK\x03\x04'
+
+def iter_sheet_rows(spreadsheet_file):
+    """Reads the rows of a spreadsheet's active sheet as tuples of cell values, in a single forward pass.
+
+    The workbook is opened in openpyxl's read-only mode, which parses the sheet's XML as it's iterated instead of
+    building every cell of the workbook in memory up front.  Callers that stop iterating early (i.e. at the end of a
+    table) never parse the rest of the sheet, and closing the generator closes the workbook.
+
+    :param spreadsheet_file: A binary file object containing an .xlsx spreadsheet.
+    :returns: A generator of tuples of cell values, with None for empty cells.
+    """
+    wb = load_workbook(filename=spreadsheet_file, read_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def get_cell_value(row, column_index):
+    """Returns the value of a cell in a row read by iter_sheet_rows(), or None if the row ends before the column.
+
+    Rows read in read-only mode aren't padded with empty cells when the sheet's dimensions are missing or wrong, so
+    a row can be shorter than the table it's part of.
+    """
+    return row[column_index] if column_index < len(row) else None
+
+def is_holdings_spreadsheet(url):
+    """Checks whether a URL serves a spreadsheet by downloading only its first few bytes.
+
+    :param url: The URL of a possible holdings file.
+    :returns: True if the URL serves an .xlsx file.
+    """
+    try:
+        return read_file_prefix(url, len(XLSX_SIGNATURE)) == XLSX_SIGNATURE
+    except requests.RequestException:
+        return False
@@ -1,4 +1,4 @@
-import re
+from .validation import normalize_ticker
 
 def convert_percentage_string_to_float(percentage_string):
     """Converts a string of the form 'xx.xx%' to its equivalent decimal value.
@@ -30,10 +30,4 @@ def remove_ticker_suffix(ticker):
     :param ticker: A string in the form of a ticker symbol, i.e. 'GOOG', 'KO', '2914 JP'
     :returns: The ticker string with the suffix removed, i.e. 'GOOG', 'KO', '2914'
     """
-    prefix = ticker.split(' ')[0]
-
-    # Remove any trailing special characters that might be left behind
-    while not re.match(r'^[0-9A-Z]$', prefix[-1]):
-        prefix = prefix[:-1]
-    
-    return prefix
\ No newline at end of file
+    return normalize_ticker(ticker)
\ No newline at end of file
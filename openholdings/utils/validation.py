@@ -0,0 +1,154 @@
+"""
+Validation of the security identifiers and ticker symbols found in holdings files.
+
+Patterns are compiled once when the module is imported.  The CUSIP, SEDOL, and ISIN validators check each
+identifier's check digit as well as its format, so values that merely look like identifiers (i.e. '-' or a
+truncated code) are rejected.  Each validator also has a batch counterpart that validates a whole column of
+identifiers in one call, checking each distinct value only once.
+"""
+
+import re
+from functools import lru_cache
+
+PERCENTAGE_PATTERN = re.compile(r'-?\d*(.\d+)?%')
+TICKER_SYMBOL_PATTERN = re.compile(r'^[A-Z0-9/]{1,7}(\s+[ABC])?(\s+[A-Z]{1,3})?$')
+CUSIP_PATTERN = re.compile(r'^([\w\d]{6})([\w\d]{2})([\w\d]{1})$')
+SEDOL_PATTERN = re.compile(r'^[0-9BCDFGHJKLMNPQRSTVWXYZ]{6}\d$')
+ISIN_PATTERN = re.compile(r'^[A-Z]{2}[0-9A-Z]{9}\d$')
+TICKER_SUFFIX_PATTERN = re.compile(r'[^0-9A-Z]+$')
+
+# Weights applied to the first six characters of a SEDOL when computing its check digit
+SEDOL_WEIGHTS = (1, 3, 1, 7, 3, 9)
+
+# Values of the special characters allowed in a CUSIP, after the digits (0-9) and letters (10-35)
+CUSIP_SPECIAL_CHARACTER_VALUES = {'*': 36, '@': 37, '#': 38}
+
+def get_character_value(character):
+    """Returns the value of an identifier character: 0-9 for digits, and 10-35 for the letters A-Z."""
+    if character.isdigit():
+        return ord(character) - 48
+    return ord(character) - 55
+
+def compute_cusip_check_digit(base):
+    """Computes the check digit of a CUSIP from its first eight characters.
+
+    :param base: The first eight characters of the CUSIP.
+    :returns: The check digit as an integer.
+    """
+    total = 0
+    for index, character in enumerate(base):
+        value = CUSIP_SPECIAL_CHARACTER_VALUES.get(character)
+        if value is None:
+            value = get_character_value(character)
+        if index % 2 == 1:
+            value *= 2
+        total += value // 10 + value % 10
+    return (10 - total % 10) % 10
+
+def compute_sedol_check_digit(base):
+    """Computes the check digit of a SEDOL from its first six characters.
+
+    :param base: The first six characters of the SEDOL.
+    :returns: The check digit as an integer.
+    """
+    total = sum(get_character_value(character) * weight for character, weight in zip(base, SEDOL_WEIGHTS))
+    return (10 - total % 10) % 10
+
+def compute_isin_check_digit(base):
+    """Computes the check digit of an ISIN from its first eleven characters using the Luhn algorithm.
+
+    :param base: The two-letter country code and nine-character national identifier of the ISIN.
+    :returns: The check digit as an integer.
+    """
+    digits = ''.join(str(get_character_value(character)) for character in base)
+    total = 0
+    # Double every other digit starting from the rightmost, since the check digit will be appended to its right
+    for index, digit in enumerate(reversed(digits)):
+        value = ord(digit) - 48
+        if index % 2 == 0:
+            value *= 2
+        total += value // 10 + value % 10
+    return (10 - total % 10) % 10
+
+def is_valid_cusip(value):
+    """Checks whether a string is a CUSIP identifier with a correct check digit.
+
+    :param value: A string to evaluate.
+    :returns: True if the string is a valid CUSIP."""
+    if not isinstance(value, str) or len(value) != 9 or not value[8].isdigit():
+        return False
+    base = value[:8].upper()
+    if not all(character.isalnum() or character in CUSIP_SPECIAL_CHARACTER_VALUES for character in base):
+        return False
+    return compute_cusip_check_digit(base) == int(value[8])
+
+def is_valid_sedol(value):
+    """Checks whether a string is a SEDOL identifier with a correct check digit.
+
+    :param value: A string to evaluate.
+    :returns: True if the string is a valid SEDOL."""
+    if not isinstance(value, str) or not SEDOL_PATTERN.match(value):
+        return False
+    return compute_sedol_check_digit(value[:6]) == int(value[6])
+
+def is_valid_isin(value):
+    """Checks whether a string is an ISIN identifier with a correct check digit.
+
+    :param value: A string to evaluate.
+    :returns: True if the string is a valid ISIN."""
+    if not isinstance(value, str) or not ISIN_PATTERN.match(value):
+        return False
+    return compute_isin_check_digit(value[:11]) == int(value[11])
+
+def validate_column(values, validator):
+    """Validates a column of values, running the validator only once for each distinct value.
+
+    :param values: An iterable of values, i.e. the CUSIPs of every holding in a fund.
+    :param validator: A function that accepts a value and returns whether it's valid.
+    :returns: A list of booleans, True where the value at the same position is valid.
+    """
+    results = {}
+    validity = []
+    for value in values:
+        is_valid = results.get(value)
+        if is_valid is None:
+            is_valid = results[value] = bool(validator(value))
+        validity.append(is_valid)
+    return validity
+
+def validate_cusips(values):
+    """Validates a column of CUSIPs.  See validate_column()."""
+    return validate_column(values, is_valid_cusip)
+
+def validate_sedols(values):
+    """Validates a column of SEDOLs.  See validate_column()."""
+    return validate_column(values, is_valid_sedol)
+
+def validate_isins(values):
+    """Validates a column of ISINs.  See validate_column()."""
+    return validate_column(values, is_valid_isin)
+
+def validate_ticker_symbols(values):
+    """Validates a column of ticker symbols.  See validate_column()."""
+    return validate_column(values, is_ticker_symbol)
+
+def is_ticker_symbol(value):
+    """Checks whether a string is a possibly valid stock ticker symbol.
+
+    Examples: 'GOOG', 'BRK/B', '263750 KS', 'EMBRAC B SS'
+
+    :param value: A string to evaluate.
+    :returns: True if string is in the form of a valid stock ticker symbol.
+    """
+    return TICKER_SYMBOL_PATTERN.match(value) is not None
+
+@lru_cache(maxsize=65536)
+def normalize_ticker(ticker):
+    """Removes the exchange suffix from a ticker, along with any special characters left trailing it.
+
+    Results are memoized, since the same tickers appear over and over across funds.
+
+    :param ticker: A string in the form of a ticker symbol, i.e. 'GOOG', 'KO', '2914 JP', 'BRK/B UN'
+    :returns: The ticker string with the suffix removed, i.e. 'GOOG', 'KO', '2914', 'BRK/B'
+    """
+    return TICKER_SUFFIX_PATTERN.sub('', ticker.split(' ')[0])
@@ -0,0 +1,139 @@
+"""
+A pool of warm Selenium browsers for fetchers that have to scrape a rendered page.
+
+Launching Chrome takes seconds, so rather than starting a browser for each fetch and quitting it afterwards, fetchers
+borrow a browser from the pool and return it when they're done.  Browsers are launched on first use, up to the
+pool's size, and kept running for later fetches until the pool is closed (at the latest, when the process exits).
+"""
+
+import os
+import atexit
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+# Maximum number of browsers kept running by the shared pool
+POOL_SIZE = 3
+
+def create_chrome_driver():
+    """Launches a headless Chrome browser.
+
+    The Chrome driver executable's path is read from the 'CHROME_DRIVER_PATH' environment variable.
+
+    :returns: A selenium.webdriver.Chrome instance.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--headless")
+    chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    return webdriver.Chrome(executable_path=os.environ['CHROME_DRIVER_PATH'], options=chrome_options)
+
+class WebDriverPool:
+    """A thread-safe pool of WebDrivers that are kept running between uses."""
+
+    def __init__(self, max_size=POOL_SIZE, create_driver=create_chrome_driver):
+        """
+        :param max_size: The maximum number of drivers running at once.  Callers wait for a driver to be returned
+            once this many are in use.
+        :param create_driver: A function that launches a new driver.
+        """
+        self.max_size = max_size
+        self.create_driver = create_driver
+        self._idle_drivers = []
+        self._driver_count = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def driver(self):
+        """Borrows a driver for the duration of a with block.
+
+        If the block raises an exception, the driver is assumed to be in an unknown state, so it's quit rather than
+        returned to the pool.
+
+        :returns: A context manager yielding a WebDriver.
+        """
+        driver = self.acquire()
+        try:
+            yield driver
+        except BaseException:
+            self.discard(driver)
+            raise
+        self.release(driver)
+
+    def acquire(self):
+        """Takes an idle driver from the pool, launching a new one if there are none and the pool isn't full.
+
+        :returns: A WebDriver, which should be given back with release() or discard().
+        """
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError('WebDriver pool is closed')
+                if self._idle_drivers:
+                    return self._idle_drivers.pop()
+                if self._driver_count < self.max_size:
+                    self._driver_count += 1
+                    break
+                self._condition.wait()
+        try:
+            return self.create_driver()
+        except BaseException:
+            with self._condition:
+                self._driver_count -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, driver):
+        """Returns a driver to the pool so that it can be reused."""
+        with self._condition:
+            if not self._closed:
+                self._idle_drivers.append(driver)
+                self._condition.notify()
+                return
+        quit_driver(driver)
+
+    def discard(self, driver):
+        """Quits a driver that shouldn't be reused, making room in the pool for a new one."""
+        with self._condition:
+            self._driver_count -= 1
+            self._condition.notify()
+        quit_driver(driver)
+
+    def close(self):
+        """Quits every idle driver.  Drivers that are in use are quit as soon as they're returned."""
+        with self._condition:
+            self._closed = True
+            idle_drivers, self._idle_drivers = self._idle_drivers, []
+            self._driver_count -= len(idle_drivers)
+            self._condition.notify_all()
+        for driver in idle_drivers:
+            quit_driver(driver)
+
+def quit_driver(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass  # The browser may have already crashed or exited
+
+_webdriver_pool = None
+_webdriver_pool_lock = threading.Lock()
+
+def get_webdriver_pool():
+    """Returns the WebDriverPool shared by every fetcher in the process, creating it on first use."""
+    global _webdriver_pool
+    with _webdriver_pool_lock:
+        if _webdriver_pool is None:
+            _webdriver_pool = WebDriverPool()
+            atexit.register(_webdriver_pool.close)
+        return _webdriver_pool
+
+def close_webdriver_pool():
+    """Quits every browser in the shared pool.  A new pool is created the next time one is needed."""
+    global _webdriver_pool
+    with _webdriver_pool_lock:
+        webdriver_pool, _webdriver_pool = _webdriver_pool, None
+    if webdriver_pool is not None:
+        webdriver_pool.close()
@@ -21,5 +21,9 @@ setuptools.setup(
         "Operating System :: OS Independent",
     ],
     packages=setuptools.find_packages(),
+    extras_require={
+        # Fund overlap (openholdings.utils.fund_overlap) and look-through exposure (openholdings.look_through)
+        "analytics": ["numpy", "scipy"],
+    },
     python_requires=">=3.6",
 )
\ No newline at end of file
@@ -0,0 +1,107 @@
+import threading
+import time
+import unittest
+from unittest import mock
+from openholdings import holdingsfetcher
+from openholdings.exceptions import FundNotFoundException
+from openholdings.fetchers.registry import FundRecord
+from openholdings.holdingsfetcher import HoldingsFetcher
+from openholdings.models import Equity
+from openholdings.utils.holdings_cache import HoldingsCache
+
+FUND_RECORDS = {ticker: FundRecord(ticker, provider, None) for ticker, provider in (
+    ('IVV', 'ishares'), ('IWM', 'ishares'), ('AGG', 'ishares'), ('EFA', 'ishares'),
+    ('VOO', 'vanguard'), ('VTI', 'vanguard'), ('BND', 'vanguard'),
+    ('QQQ', 'invesco'),
+)}
+
+# Funds that are only found by probing their provider
+DISCOVERED_FUND_RECORDS = {'SPY': FundRecord('SPY', 'spdr', None)}
+
+def lookup_fund(ticker, discover=True):
+    fund_record = FUND_RECORDS.get(ticker.upper())
+    if fund_record is None:
+        raise FundNotFoundException(ticker)
+    return fund_record
+
+def discover_fund(ticker):
+    return DISCOVERED_FUND_RECORDS.get(ticker.upper())
+
+class FetchManyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.in_flight = {}
+        self.max_in_flight = {}
+        self.max_total_in_flight = 0
+        self.downloaded = []
+        self.lock = threading.Lock()
+        for name, replacement in (('lookup_fund', lookup_fund), ('discover_fund', discover_fund),
+                ('_download_fund', self.download_fund)):
+            patcher = mock.patch.object(holdingsfetcher, name, side_effect=replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def download_fund(self, fund_record, cache=None, lazy=False, holdings_filter=None, archive=None):
+        provider = fund_record.provider
+        with self.lock:
+            self.in_flight[provider] = self.in_flight.get(provider, 0) + 1
+            self.max_in_flight[provider] = max(self.max_in_flight.get(provider, 0), self.in_flight[provider])
+            self.max_total_in_flight = max(self.max_total_in_flight, sum(self.in_flight.values()))
+            self.downloaded.append(fund_record.ticker)
+        try:
+            time.sleep(0.02)
+            if fund_record.ticker == 'AGG':
+                raise ConnectionError('Holdings file unavailable')
+            holdings = [Equity(fund_record.ticker + ' holding', ticker='X', percent_weighting=1.0)]
+            if cache is not None and holdings_filter is None:
+                cache.put(provider, fund_record.ticker, holdings)
+            return holdings
+        finally:
+            with self.lock:
+                self.in_flight[provider] -= 1
+
+class TestFetchMany(FetchManyTestCase):
+
+    def test_limits_requests_per_provider(self):
+        results = list(HoldingsFetcher.fetch_many(list(FUND_RECORDS), max_workers=8, per_host_limit=2))
+
+        self.assertEqual(sorted(result.ticker for result in results), sorted(FUND_RECORDS))
+        self.assertEqual(max(self.max_in_flight.values()), 2)
+        # Different providers are fetched from at the same time
+        self.assertGreater(self.max_total_in_flight, 2)
+
+    def test_reports_errors_without_aborting_batch(self):
+        results = {result.ticker: result
+            for result in HoldingsFetcher.fetch_many(['IVV', 'AGG', 'spy', 'NOPE', 'VOO'], per_host_limit=1)}
+
+        self.assertEqual(sorted(results), ['AGG', 'IVV', 'NOPE', 'VOO', 'spy'])
+        self.assertIsInstance(results['AGG'].error, ConnectionError)
+        self.assertIsNone(results['AGG'].holdings)
+        self.assertIsInstance(results['NOPE'].error, FundNotFoundException)
+        # Funds missing from the funds lists are downloaded once their provider is found
+        self.assertIsNone(results['spy'].error)
+        self.assertEqual(results['spy'].holdings[0].name, 'SPY holding')
+        self.assertEqual(results['IVV'].holdings[0].name, 'IVV holding')
+
+    def test_callback_receives_every_result(self):
+        results = []
+        self.assertIsNone(HoldingsFetcher.fetch_many(['IVV', 'VOO', 'QQQ'], callback=results.append))
+        self.assertEqual(sorted(result.ticker for result in results), ['IVV', 'QQQ', 'VOO'])
+
+    def test_serves_cached_funds_without_downloading(self):
+        cache = HoldingsCache()
+        list(HoldingsFetcher.fetch_many(['IVV', 'VOO'], cache=cache))
+        results = list(HoldingsFetcher.fetch_many(['IVV', 'VOO', 'QQQ'], cache=cache))
+
+        self.assertEqual(sorted(self.downloaded), ['IVV', 'QQQ', 'VOO'])
+        self.assertEqual(sorted(result.ticker for result in results), ['IVV', 'QQQ', 'VOO'])
+
+    def test_stopping_early_cancels_unstarted_funds(self):
+        results = HoldingsFetcher.fetch_many(['IVV', 'IWM', 'AGG', 'EFA'], max_workers=1, per_host_limit=1)
+        next(results)
+        results.close()
+
+        self.assertLess(len(self.downloaded), 4)
+
+if __name__ == '__main__':
+    unittest.main()
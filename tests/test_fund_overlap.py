@@ -0,0 +1,37 @@
+import random
+import unittest
+from unittest import mock
+import numpy as np
+from openholdings.models import Equity
+from openholdings.utils.fund_overlap import FundOverlap
+
+METRICS = ('weight', 'jaccard', 'cosine')
+
+def create_holdings(rng, count):
+    return [Equity('Security {}'.format(index), ticker='S{}'.format(index), percent_weighting=rng.random() / 10)
+        for index in rng.sample(range(60), count)]
+
+class TestFundOverlap(unittest.TestCase):
+
+    def test_updates_match_recomputed_matrices(self):
+        rng = random.Random(0)
+        fund_overlap = FundOverlap()
+        for fund in 'ABCDE':
+            fund_overlap.update(fund, create_holdings(rng, 20))
+        for metric in METRICS:
+            fund_overlap.overlap_matrix(metric)
+
+        # Replace, add, and empty funds, including funds that gain securities no fund held before
+        with mock.patch.object(FundOverlap, 'weight_matrix', autospec=True,
+                side_effect=FundOverlap.weight_matrix) as weight_matrix:
+            for _ in range(40):
+                fund_overlap.update(rng.choice('ABCDEFGH'), create_holdings(rng, rng.randint(0, 25)))
+        self.assertEqual(weight_matrix.call_count, 0)
+
+        self.assertEqual((fund_overlap._columns != fund_overlap.weight_matrix().tocsc()).nnz, 0)
+        for metric in METRICS:
+            with self.subTest(metric=metric):
+                np.testing.assert_allclose(fund_overlap.overlap_matrix(metric), fund_overlap._compute_matrix(metric))
+
+if __name__ == '__main__':
+    unittest.main()
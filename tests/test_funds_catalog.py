@@ -0,0 +1,137 @@
+import os
+import json
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+from openholdings.fetchers import registry
+from openholdings.fetchers.registry import FundRecord, is_catalog_stale, read_catalog
+from openholdings.offline.utils import catalog_writing
+
+FUNDS_LISTS = {
+    'ishares_funds.csv': [('IVV', 'https://www.ishares.com/us/products/239726/'),
+        ('AGG', 'https://www.ishares.com/us/products/239458/')],
+    'vanguard_funds.csv': [('VOO', 'https://investor.vanguard.com/etf/profile/VOO'),
+        ('IVV', 'https://investor.vanguard.com/etf/profile/IVV')],
+}
+
+class FundsCatalogTestCase(unittest.TestCase):
+    """Builds catalogs out of funds lists in a temporary folder rather than the package's `offline` folder."""
+
+    def setUp(self):
+        offline_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(offline_dir.cleanup)
+        self.offline_path = offline_dir.name
+        get_funds_list_path = lambda file_name: os.path.join(self.offline_path, file_name)
+        for module in (registry, catalog_writing):
+            patcher = mock.patch.object(module, 'get_funds_list_path', side_effect=get_funds_list_path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for csv_file_name, funds in FUNDS_LISTS.items():
+            self.write_funds_list(csv_file_name, funds)
+        self.catalog_path = os.path.join(self.offline_path, registry.CATALOG_FILE_NAME)
+
+    def write_funds_list(self, csv_file_name, funds, modified_time=None):
+        path = os.path.join(self.offline_path, csv_file_name)
+        with open(path, mode='w', encoding='utf-8') as funds_file:
+            funds_file.write('Ticker,URL\n' + ''.join('{},{}\n'.format(ticker, url) for ticker, url in funds))
+        if modified_time is not None:
+            self.set_modified_time(csv_file_name, modified_time)
+
+    def set_modified_time(self, file_name, modified_time):
+        os.utime(os.path.join(self.offline_path, file_name), ns=(modified_time, modified_time))
+
+    def refresh_provider(self, provider, csv_file_name, funds):
+        # As the download scripts do, the new funds list is written before it's applied to the catalog
+        self.write_funds_list(csv_file_name, funds)
+        return catalog_writing.refresh_catalog_provider(provider, funds)
+
+    def build_catalog(self):
+        catalog_writing.build_catalog()
+        self.set_modified_time(registry.CATALOG_FILE_NAME, 2 * 10 ** 18)
+        return read_catalog(self.catalog_path)
+
+class TestCatalogStaleness(FundsCatalogTestCase):
+
+    def test_fresh_catalog_is_used(self):
+        catalog = self.build_catalog()
+        self.assertFalse(is_catalog_stale(catalog, self.catalog_path))
+
+        fund_index, revisions = registry.build_fund_index()
+        self.assertEqual(fund_index['IVV'], FundRecord('IVV', 'ishares', FUNDS_LISTS['ishares_funds.csv'][0][1]))
+        self.assertEqual(fund_index['VOO'].provider, 'vanguard')
+        self.assertEqual(revisions, {'ishares': 1, 'vanguard': 1})
+
+    def test_funds_list_touched_but_unchanged_isnt_stale(self):
+        catalog = self.build_catalog()
+        self.set_modified_time('ishares_funds.csv', 3 * 10 ** 18)
+        self.assertFalse(is_catalog_stale(catalog, self.catalog_path))
+
+    def test_funds_list_edited_after_catalog_is_stale(self):
+        catalog = self.build_catalog()
+        self.write_funds_list('vanguard_funds.csv', FUNDS_LISTS['vanguard_funds.csv'] + [('VTI', 'https://x/VTI')],
+            modified_time=3 * 10 ** 18)
+        self.assertTrue(is_catalog_stale(catalog, self.catalog_path))
+
+        with warnings.catch_warnings(record=True) as caught_warnings:
+            warnings.simplefilter('always')
+            fund_index, revisions = registry.build_fund_index()
+        self.assertEqual(len(caught_warnings), 1)
+        self.assertIn('VTI', fund_index)
+        self.assertEqual(revisions, {})
+
+    def test_removed_or_added_funds_list_is_stale(self):
+        catalog = self.build_catalog()
+        os.remove(os.path.join(self.offline_path, 'vanguard_funds.csv'))
+        self.assertTrue(is_catalog_stale(catalog, self.catalog_path))
+
+        catalog = self.build_catalog()
+        self.assertFalse(is_catalog_stale(catalog, self.catalog_path))
+        self.write_funds_list('vanguard_funds.csv', FUNDS_LISTS['vanguard_funds.csv'], modified_time=3 * 10 ** 18)
+        self.assertTrue(is_catalog_stale(catalog, self.catalog_path))
+
+    def test_catalog_of_another_format_is_stale(self):
+        catalog = self.build_catalog()
+        self.assertTrue(is_catalog_stale(dict(catalog, format=1), self.catalog_path))
+        self.assertTrue(is_catalog_stale(dict(catalog, providers=['ishares']), self.catalog_path))
+
+class TestCatalogRefresh(FundsCatalogTestCase):
+
+    def test_checksums_are_recorded(self):
+        catalog = self.build_catalog()
+        self.assertEqual(catalog['checksums']['ishares'],
+            registry.get_funds_list_checksum(os.path.join(self.offline_path, 'ishares_funds.csv')))
+        self.assertIsNone(catalog['checksums']['spdr'])
+
+    def test_unchanged_funds_list_leaves_catalog_as_is(self):
+        self.build_catalog()
+        with open(self.catalog_path, 'rb') as catalog_file:
+            contents = catalog_file.read()
+
+        changes = self.refresh_provider('ishares', 'ishares_funds.csv', FUNDS_LISTS['ishares_funds.csv'])
+        self.assertEqual(changes, {'added': [], 'removed': [], 'renamed': [], 'moved': []})
+        with open(self.catalog_path, 'rb') as catalog_file:
+            self.assertEqual(catalog_file.read(), contents)
+
+    def test_changes_bump_version_and_provider_revisions(self):
+        self.build_catalog()
+        ishares_funds = [('IUSB', 'https://www.ishares.com/us/products/239458/'),
+            ('IEFA', 'https://www.ishares.com/us/products/244049/')]
+
+        changes = self.refresh_provider('ishares', 'ishares_funds.csv', ishares_funds)
+        self.assertEqual(changes, {'added': ['IEFA'], 'removed': ['IVV'], 'renamed': [('AGG', 'IUSB')], 'moved': []})
+        with open(self.catalog_path, encoding='utf-8') as catalog_file:
+            catalog = json.load(catalog_file)
+        self.assertEqual(catalog['version'], 2)
+        # IVV passes to Vanguard, whose funds changed too
+        self.assertEqual(catalog['revisions'], {'ishares': 2, 'vanguard': 2})
+        owners = dict(zip(catalog['tickers'], (catalog['providers'][index] for index in catalog['provider_ids'])))
+        self.assertEqual(owners, {'IEFA': 'ishares', 'IUSB': 'ishares', 'IVV': 'vanguard', 'VOO': 'vanguard'})
+
+        changes = self.refresh_provider('vanguard', 'vanguard_funds.csv', [('VOO', 'https://investor.vanguard.com/VOO'),
+            ('IVV', 'https://investor.vanguard.com/etf/profile/IVV')])
+        self.assertEqual(changes['moved'], ['VOO'])
+        self.assertEqual(catalog_writing.load_catalog()[:2], (3, {'ishares': 2, 'vanguard': 3}))
+
+if __name__ == '__main__':
+    unittest.main()
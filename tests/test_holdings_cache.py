@@ -0,0 +1,96 @@
+import unittest
+from datetime import date
+from unittest import mock
+from openholdings import holdingsfetcher
+from openholdings.fetchers.registry import FundRecord
+from openholdings.holdingsfetcher import HoldingsFetcher
+from openholdings.models import Equity
+from openholdings.utils import holdings_cache
+from openholdings.utils.holdings_cache import HoldingsCache, CacheStats, estimate_holdings_size
+
+def create_holdings(count=3):
+    return [Equity('Security {}'.format(index), ticker='S{}'.format(index), percent_weighting=0.01)
+        for index in range(count)]
+
+class TestHoldingsCache(unittest.TestCase):
+
+    def test_serves_fresh_entries_as_new_lists(self):
+        cache = HoldingsCache()
+        holdings = create_holdings()
+        cache.put('vanguard', 'voo', holdings)
+
+        cached = cache.get('vanguard', 'VOO')
+        self.assertEqual(cached, holdings)
+        self.assertIsNot(cached, holdings)
+        cached.pop()
+        self.assertEqual(len(cache.get('vanguard', 'VOO')), 3)
+        self.assertIsNone(cache.get('vanguard', 'VTI'))
+        self.assertEqual(cache.stats()[:4], (2, 1, 0, 1))
+
+    def test_keys_by_as_of_date_and_laziness(self):
+        cache = HoldingsCache()
+        cache.put('vanguard', 'VOO', create_holdings(), as_of=date(2024, 3, 1))
+
+        self.assertIsNotNone(cache.get('vanguard', 'VOO', as_of=date(2024, 3, 1)))
+        self.assertIsNone(cache.get('vanguard', 'VOO', as_of=date(2024, 3, 4)))
+        self.assertIsNone(cache.get('vanguard', 'VOO', as_of=date(2024, 3, 1), lazy=True))
+
+    def test_expires_entries_after_ttl(self):
+        cache = HoldingsCache(ttl=60)
+        with mock.patch.object(holdings_cache, 'time') as clock:
+            clock.monotonic.return_value = 1000.0
+            cache.put('vanguard', 'VOO', create_holdings())
+            clock.monotonic.return_value = 1059.0
+            self.assertIsNotNone(cache.get('vanguard', 'VOO'))
+            clock.monotonic.return_value = 1060.0
+            self.assertIsNone(cache.get('vanguard', 'VOO'))
+        self.assertEqual(cache.stats().entries, 0)
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = HoldingsCache(max_entries=2)
+        cache.put('vanguard', 'VOO', create_holdings())
+        cache.put('vanguard', 'VTI', create_holdings())
+        cache.get('vanguard', 'VOO')
+        cache.put('vanguard', 'BND', create_holdings())
+
+        self.assertIsNone(cache.get('vanguard', 'VTI'))
+        self.assertIsNotNone(cache.get('vanguard', 'VOO'))
+        self.assertEqual(cache.stats().evictions, 1)
+
+        size = estimate_holdings_size(create_holdings(100))
+        cache = HoldingsCache(max_memory=size * 3 // 2)
+        cache.put('vanguard', 'VOO', create_holdings(100))
+        cache.put('vanguard', 'VTI', create_holdings(100))
+        self.assertEqual(cache.stats(), CacheStats(0, 0, 1, 1, size))
+
+    def test_invalidates_matching_entries(self):
+        cache = HoldingsCache()
+        cache.put('vanguard', 'VOO', create_holdings())
+        cache.put('vanguard', 'VOO', create_holdings(), lazy=True)
+        cache.put('vanguard', 'VTI', create_holdings(), as_of=date(2024, 3, 1))
+        cache.put('ishares', 'IVV', create_holdings())
+
+        self.assertEqual(cache.invalidate(ticker='voo'), 2)
+        self.assertEqual(cache.invalidate(provider='vanguard', as_of=date(2024, 3, 1)), 1)
+        self.assertEqual(cache.stats().entries, 1)
+        cache.clear()
+        self.assertEqual(cache.stats()[3:], (0, 0))
+
+    def test_fetcher_is_served_from_cache(self):
+        fund_record = FundRecord('VOO', 'vanguard', None)
+        fetcher = mock.Mock()
+        fetcher.fetch.return_value = create_holdings()
+        with mock.patch.object(holdingsfetcher, 'lookup_fund', return_value=fund_record), \
+                mock.patch.object(holdingsfetcher, '_create_fetcher', return_value=fetcher):
+            cache = HoldingsCache()
+            first = HoldingsFetcher('VOO', cache=cache).fetch()
+            second = HoldingsFetcher('VOO', cache=cache).fetch()
+            top = HoldingsFetcher('VOO', cache=cache).fetch(top_n=1)
+
+        self.assertEqual(fetcher.fetch.call_count, 1)
+        self.assertEqual(second, first)
+        self.assertEqual(len(top), 1)
+        self.assertEqual(cache.stats()[:2], (2, 1))
+
+if __name__ == '__main__':
+    unittest.main()
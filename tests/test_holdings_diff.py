@@ -0,0 +1,67 @@
+import unittest
+from openholdings.models import Equity, Bond, HoldingsTable
+from openholdings.utils.holdings_diff import diff_holdings
+
+OLD_HOLDINGS = [
+    Equity('Apple Inc.', ticker='AAPL', identifier_isin='US0378331005', percent_weighting=0.0693, num_shares=1000),
+    Equity('Microsoft Corp.', ticker='MSFT UN', percent_weighting=0.0587, num_shares=500),
+    Equity('Exxon Mobil Corp.', ticker='XOM', identifier_cusip='30231G102', percent_weighting=0.0120, num_shares=300),
+    Bond('United States Treasury Note 2.25% 15-Feb-2027', identifier_cusip='912828V98', percent_weighting=0.0102,
+        quantity_held=3690000),
+]
+
+NEW_HOLDINGS = [
+    # The ISIN is left out, but the ticker still matches
+    Equity('Apple Inc.', ticker='AAPL', percent_weighting=0.0701, num_shares=1000),
+    Equity('Microsoft Corp.', ticker='MSFT', percent_weighting=0.0587, num_shares=500),
+    Bond('United States Treasury Note 2.25% 15-Feb-2027', identifier_cusip='912828V98', percent_weighting=0.0102,
+        quantity_held=3700000),
+    Equity('NVIDIA Corp.', ticker='NVDA', percent_weighting=0.0310, num_shares=250),
+]
+
+class TestDiffHoldings(unittest.TestCase):
+
+    def test_reports_added_removed_and_changed_holdings(self):
+        changes = diff_holdings(OLD_HOLDINGS, NEW_HOLDINGS)
+
+        self.assertEqual([(change.change, change.key, change.old_index, change.new_index) for change in changes], [
+            ('changed', ('ticker', 'AAPL'), 0, 0),
+            ('changed', ('cusip', '912828V98'), 3, 2),
+            ('added', ('ticker', 'NVDA'), None, 3),
+            ('removed', ('cusip', '30231G102'), 2, None),
+        ])
+        apple, treasury, nvidia, exxon = changes
+        self.assertAlmostEqual(apple.weight_delta, 0.0008)
+        self.assertEqual(apple.shares_delta, 0)
+        self.assertEqual(treasury.shares_delta, 10000)
+        self.assertEqual((nvidia.weight_delta, nvidia.shares_delta), (0.0310, 250))
+        self.assertEqual((exxon.name, exxon.weight_delta, exxon.shares_delta), ('Exxon Mobil Corp.', -0.0120, -300))
+
+    def test_tolerances_and_unchanged_holdings(self):
+        changes = diff_holdings(OLD_HOLDINGS, NEW_HOLDINGS, weight_tolerance=0.001, shares_tolerance=10000)
+        self.assertEqual([change.change for change in changes], ['added', 'removed'])
+
+        changes = diff_holdings(OLD_HOLDINGS, NEW_HOLDINGS, include_unchanged=True)
+        self.assertEqual([change.change for change in changes], ['changed', 'unchanged', 'changed', 'added', 'removed'])
+        self.assertEqual(changes[1].key, ('ticker', 'MSFT'))
+
+    def test_duplicate_keys_are_matched_once(self):
+        old_holdings = [Equity('Cash Collateral', percent_weighting=0.01),
+            Equity('Cash Collateral', percent_weighting=0.02)]
+        new_holdings = [Equity('Cash Collateral', percent_weighting=0.02)]
+
+        changes = diff_holdings(old_holdings, new_holdings)
+        self.assertEqual([(change.change, change.old_index) for change in changes], [('changed', 0), ('removed', 1)])
+
+    def test_tables_diff_like_holdings(self):
+        expected = diff_holdings(OLD_HOLDINGS, NEW_HOLDINGS, include_unchanged=True)
+        changes = diff_holdings(HoldingsTable.from_holdings(OLD_HOLDINGS), HoldingsTable.from_holdings(NEW_HOLDINGS),
+            include_unchanged=True)
+
+        self.assertEqual([change[:5] for change in changes], [change[:5] for change in expected])
+        for change, expected_change in zip(changes, expected):
+            self.assertAlmostEqual(change.weight_delta, expected_change.weight_delta)
+            self.assertEqual(change.shares_delta, expected_change.shares_delta)
+
+if __name__ == '__main__':
+    unittest.main()
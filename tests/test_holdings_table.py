@@ -0,0 +1,37 @@
+import os
+import unittest
+from openholdings.fetchers.ishares import IShares
+from openholdings.look_through import LookThrough
+from openholdings.models import HoldingsTable
+from openholdings.models.holdings_table import ASSET_CLASSES
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def parse_ishares_fixture(name, lazy):
+    fetcher = IShares()
+    fetcher.lazy = lazy
+    with open(os.path.join(FIXTURES_PATH, name), 'rb') as holdings_file:
+        return fetcher.parse_holdings_file(holdings_file)
+
+class TestLazyHoldingAssetClasses(unittest.TestCase):
+
+    def test_table_from_lazy_holdings_keeps_asset_classes(self):
+        for name in ('ishares_stock.json', 'ishares_futures.json', 'ishares_bond.json'):
+            with self.subTest(fixture=name):
+                lazy_holdings = parse_ishares_fixture(name, lazy=True)
+                table = HoldingsTable.from_holdings(lazy_holdings)
+                self.assertNotIn(-1, list(table['asset_class']))
+                self.assertEqual([ASSET_CLASSES[code] for code in table['asset_class']],
+                    [type(holding).__name__.replace('Lazy', '') for holding in lazy_holdings])
+                eager_table = HoldingsTable.from_holdings(parse_ishares_fixture(name, lazy=False))
+                self.assertEqual(list(table['asset_class']), list(eager_table['asset_class']))
+
+    def test_look_through_reports_base_asset_classes_of_lazy_holdings(self):
+        look_through = LookThrough()
+        look_through._compose(parse_ishares_fixture('ishares_futures.json', lazy=True), {})
+        asset_classes = {security[3] for security in look_through._securities if security is not None}
+        self.assertTrue(asset_classes)
+        self.assertTrue(asset_classes.issubset(ASSET_CLASSES), asset_classes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import asyncio
+import hashlib
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from openholdings.fetchers import fetcher as fetcher_module
+from openholdings.fetchers.ishares import IShares
+from openholdings.utils import file_util
+from openholdings.utils.http_cache import HttpCache
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+class HoldingsFileServer(ThreadingHTTPServer):
+    """A local server of holdings files that honours If-None-Match and records the requests it receives."""
+
+    def __init__(self, files):
+        super().__init__(('127.0.0.1', 0), HoldingsFileHandler)
+        self.files = files  # Path -> body
+        self.requests = []  # (path, If-None-Match header) of every request
+
+    def url(self, path):
+        return 'http://127.0.0.1:{}{}'.format(self.server_address[1], path)
+
+class HoldingsFileHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('If-None-Match')))
+        body = self.server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"{}"'.format(hashlib.sha256(body).hexdigest()[:16])
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class HttpCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = HoldingsFileServer({'/a.csv': b'a' * 100, '/b.csv': b'b' * 100, '/c.csv': b'c' * 100})
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.session = requests.Session()
+        self.addCleanup(self.session.close)
+
+    def open(self, http_cache, path):
+        body_file, content_hash = http_cache.open(self.server.url(path), self.session, (5, 5), 64)
+        with body_file:
+            return body_file.read(), content_hash
+
+class TestHttpCache(HttpCacheTestCase):
+
+    def test_serves_fresh_files_without_requests(self):
+        http_cache = HttpCache(self.cache_dir.name, ttl=3600)
+        first = self.open(http_cache, '/a.csv')
+        second = self.open(http_cache, '/a.csv')
+
+        self.assertEqual(first, (b'a' * 100, hashlib.sha256(b'a' * 100).hexdigest()))
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_revalidates_expired_files_with_etag(self):
+        http_cache = HttpCache(self.cache_dir.name, ttl=0)
+        first = self.open(http_cache, '/a.csv')
+        second = self.open(http_cache, '/a.csv')
+
+        self.assertEqual(second, first)
+        (_, first_etag), (_, second_etag) = self.server.requests
+        self.assertIsNone(first_etag)
+        self.assertIsNotNone(second_etag)
+
+    def test_downloads_changed_files_again(self):
+        http_cache = HttpCache(self.cache_dir.name, ttl=0)
+        self.open(http_cache, '/a.csv')
+        self.server.files['/a.csv'] = b'changed'
+
+        self.assertEqual(self.open(http_cache, '/a.csv'), (b'changed', hashlib.sha256(b'changed').hexdigest()))
+
+    def test_evicts_least_recently_used_bodies(self):
+        http_cache = HttpCache(self.cache_dir.name, ttl=3600, max_size=250)
+        _, a_hash = self.open(http_cache, '/a.csv')
+        _, b_hash = self.open(http_cache, '/b.csv')
+        # Make the bodies' last use unambiguous, since file times may be coarse
+        os.utime(os.path.join(http_cache.bodies_dir, a_hash), (1, 1))
+        os.utime(os.path.join(http_cache.bodies_dir, b_hash), (2, 2))
+        _, c_hash = self.open(http_cache, '/c.csv')
+
+        self.assertEqual(sorted(os.listdir(http_cache.bodies_dir)), sorted([b_hash, c_hash]))
+        # The evicted URL is downloaded again, unconditionally
+        self.assertEqual(self.open(http_cache, '/a.csv')[0], b'a' * 100)
+        self.assertEqual(self.server.requests[-1], ('/a.csv', None))
+
+    def test_async_downloads_go_through_cache(self):
+        file_util.enable_http_cache(self.cache_dir.name, ttl=0)
+        self.addCleanup(file_util.disable_http_cache)
+
+        async def download_twice():
+            try:
+                first = await file_util.download_holdings_document_async(self.server.url('/a.csv'))
+                second = await file_util.download_holdings_document_async(self.server.url('/a.csv'))
+                return first, second
+            finally:
+                await file_util.close_async_session()
+
+        first, second = asyncio.run(download_twice())
+        self.assertEqual(first, (b'a' * 100, hashlib.sha256(b'a' * 100).hexdigest()))
+        self.assertEqual(second, first)
+        self.assertIsNotNone(self.server.requests[1][1])
+
+class TestParsedFileMemo(HttpCacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with open(os.path.join(FIXTURES_PATH, 'ishares_stock.json'), 'rb') as holdings_file:
+            self.server.files['/ishares.json'] = holdings_file.read()
+        fetcher_module._parsed_files.clear()
+
+    def test_unchanged_file_is_parsed_once_into_independent_holdings(self):
+        fetcher = IShares()
+        url = self.server.url('/ishares.json')
+        with mock.patch.object(IShares, 'parse_holdings_file', autospec=True,
+                side_effect=IShares.parse_holdings_file) as parse_holdings_file:
+            first = fetcher.download_and_parse(url)
+            second = fetcher.download_and_parse(url)
+
+        self.assertEqual(parse_holdings_file.call_count, 1)
+        self.assertEqual([vars_of(holding) for holding in first], [vars_of(holding) for holding in second])
+        self.assertIsNot(first[0], second[0])
+        first[0].name = 'Modified'
+        self.assertNotEqual(fetcher.download_and_parse(url)[0].name, 'Modified')
+
+def vars_of(holding):
+    return {slot: getattr(holding, slot) for cls in type(holding).__mro__ for slot in getattr(cls, '__slots__', ())}
+
+if __name__ == '__main__':
+    unittest.main()
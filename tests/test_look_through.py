@@ -0,0 +1,111 @@
+import unittest
+from unittest import mock
+from openholdings import look_through
+from openholdings.holdingsfetcher import FetchResult, HoldingsFetcher
+from openholdings.models import Equity, Bond, Cash
+from openholdings.look_through import LookThrough
+
+FUND_HOLDINGS = {
+    'VOO': [
+        Equity('Apple Inc.', ticker='AAPL', sector='Information Technology', percent_weighting=0.6),
+        Equity('Microsoft Corp.', ticker='MSFT', sector='Information Technology', percent_weighting=0.4),
+    ],
+    'AOR': [
+        Equity('Vanguard S&P 500 ETF', ticker='VOO', percent_weighting=0.5),
+        Bond('United States Treasury Note 2.25% 15-Feb-2027', identifier_cusip='912828V98', percent_weighting=0.4),
+        Cash('USD Cash', currency='USD', percent_weighting=0.1),
+    ],
+    # Funds that hold each other
+    'CYCA': [
+        Equity('Cycle B', ticker='CYCB', percent_weighting=0.5),
+        Equity('Exxon Mobil Corp.', ticker='XOM', sector='Energy', percent_weighting=0.5),
+    ],
+    'CYCB': [
+        Equity('Cycle A', ticker='CYCA', percent_weighting=0.5),
+        Equity('Chevron Corp.', ticker='CVX', sector='Energy', percent_weighting=0.5),
+    ],
+    # Funds that identify the same security differently
+    'TICK': [Equity('Apple Inc.', ticker='AAPL', percent_weighting=1.0)],
+    'ISIN': [Equity('Apple Inc.', identifier_isin='US0378331005', percent_weighting=1.0)],
+    'BOTH': [Equity('Apple Inc.', ticker='AAPL', identifier_isin='US0378331005', percent_weighting=1.0)],
+}
+
+class LookThroughTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fetched_batches = []
+        fund_index = dict.fromkeys(list(FUND_HOLDINGS) + ['GONE'])
+        patcher = mock.patch.object(look_through, 'get_fund_index', return_value=fund_index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(HoldingsFetcher, 'fetch_many', side_effect=self.fetch_many)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch_many(self, tickers, **kwargs):
+        self.fetched_batches.append(list(tickers))
+        for ticker in tickers:
+            if ticker in FUND_HOLDINGS:
+                yield FetchResult(ticker, FUND_HOLDINGS[ticker], None)
+            else:
+                yield FetchResult(ticker, None, ConnectionError(ticker))
+
+def get_weights(exposure):
+    return {security.ticker or security.name: round(security.weight, 10) for security in exposure.by_security()}
+
+class TestLookThrough(LookThroughTestCase):
+
+    def test_expands_funds_held_by_funds(self):
+        exposure = LookThrough().resolve({'AOR': 100.0, 'voo': 100.0})
+
+        self.assertEqual(self.fetched_batches, [['AOR', 'VOO']])
+        self.assertEqual(get_weights(exposure), {'AAPL': 0.45, 'MSFT': 0.3,
+            'United States Treasury Note 2.25% 15-Feb-2027': 0.2, 'USD Cash': 0.05})
+        self.assertAlmostEqual(exposure.by_security(top_n=1)[0].value, 90.0)
+        self.assertEqual({sector: round(weight, 10) for sector, weight in exposure.by_sector().items()},
+            {'Information Technology': 0.75, None: 0.25})
+        self.assertEqual({asset_class: round(weight, 10) for asset_class, weight in exposure.by_asset_class().items()},
+            {'Equity': 0.75, 'Bond': 0.2, 'Cash': 0.05})
+
+    def test_fetches_nested_funds_a_level_at_a_time(self):
+        resolver = LookThrough()
+        resolver.fund_exposure('AOR')
+        resolver.fund_exposure('VOO')
+
+        self.assertEqual(self.fetched_batches, [['AOR'], ['VOO']])
+
+    def test_cuts_cycles_independently_of_resolution_order(self):
+        for first, second in (('CYCA', 'CYCB'), ('CYCB', 'CYCA')):
+            with self.subTest(first=first):
+                resolver = LookThrough()
+                exposures = {ticker: get_weights(resolver.fund_exposure(ticker)) for ticker in (first, second)}
+
+                self.assertEqual(exposures['CYCA'], {'XOM': 0.5, 'CVX': 0.25, 'CYCA': 0.25})
+                self.assertEqual(exposures['CYCB'], {'CVX': 0.5, 'XOM': 0.25, 'CYCB': 0.25})
+
+    def test_limits_depth_of_expansion(self):
+        exposure = LookThrough(max_depth=0).fund_exposure('AOR')
+        self.assertEqual(get_weights(exposure)['VOO'], 0.5)
+
+    def test_merged_securities_are_combined(self):
+        resolver = LookThrough()
+        before = resolver.resolve({'TICK': 1.0, 'ISIN': 1.0})
+        self.assertEqual(sorted(get_weights(before).values()), [0.5, 0.5])
+
+        # Fetching BOTH teaches the security master that the ticker and ISIN are the same security
+        after = resolver.resolve({'TICK': 1.0, 'ISIN': 1.0, 'BOTH': 1.0})
+        self.assertEqual(resolver.security_ids.merge_count, 1)
+        self.assertEqual(len(after.by_security()), 1)
+        self.assertAlmostEqual(after.by_security()[0].weight, 1.0)
+        self.assertEqual(after.by_security()[0].ticker, 'AAPL')
+
+    def test_unfetchable_funds_are_counted_as_securities(self):
+        resolver = LookThrough()
+        exposure = resolver.resolve({'VOO': 1.0, 'GONE': 1.0, 'NOTAFUND': 2.0})
+
+        self.assertEqual(get_weights(exposure), {'NOTAFUND': 0.5, 'GONE': 0.25, 'AAPL': 0.15, 'MSFT': 0.1})
+        self.assertEqual(list(resolver.unresolved), ['GONE'])
+        self.assertIsInstance(resolver.unresolved['GONE'], ConnectionError)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import json
+import math
+import os
+import unittest
+from datetime import date, datetime
+from io import BytesIO
+from openholdings.exceptions import HoldingsFormatException
+from openholdings.fetchers.etfmg import Etfmg
+from openholdings.fetchers.invesco import Invesco
+from openholdings.fetchers.ishares import IShares
+from openholdings.models import HoldingsTable
+from openholdings.fetchers.schemas import ISHARES_STOCK_SCHEMA, parse_future_expiration_date_from_description
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Holdings file fixture -> the fetcher that parses it.  Fixtures are excerpts of real funds' files, covering each
+# branch of their formats: cash sweeps and margin, futures with and without an expiry month, missing and placeholder
+# identifiers and tickers, exchange suffixes, and ETFMG's SEDOLs in the CUSIP column.  Each fixture has an
+# .expected.json counterpart listing the holdings the row-by-row parsers that preceded the compiled schemas read
+# from it.
+FORMAT_FIXTURES = {
+    'ishares_stock.json': IShares,
+    'ishares_futures.json': IShares,
+    'ishares_bond.json': IShares,
+    'ishares_commodities.json': IShares,
+    'etfmg_stock.csv': Etfmg,
+    'etfmg_bond.csv': Etfmg,
+    'invesco.csv': Invesco,
+}
+
+def serialize_holding(holding):
+    """Converts a holding into its type name and a dictionary of its fields that are set, with dates as strings."""
+    fields = {}
+    for cls in type(holding).__mro__:
+        for field in getattr(cls, '__slots__', ()):
+            value = getattr(holding, field, None) if not field.startswith('_') else None
+            if value is not None:
+                fields[field] = value.isoformat() if isinstance(value, (date, datetime)) else value
+    return {'type': type(holding).__name__.replace('Lazy', ''), 'fields': fields}
+
+def parse_fixture(fetcher_class, name, lazy=False):
+    fetcher = fetcher_class()
+    fetcher.lazy = lazy
+    with open(os.path.join(FIXTURES_PATH, name), 'rb') as holdings_file:
+        return fetcher.parse_holdings_file(holdings_file)
+
+def load_expected_holdings(name):
+    expected_name = name.rsplit('.', 1)[0] + '.expected.json'
+    with open(os.path.join(FIXTURES_PATH, expected_name), encoding='utf-8') as expected_file:
+        return json.load(expected_file)
+
+class TestCompiledSchemas(unittest.TestCase):
+
+    def test_decoders_match_previous_parsers(self):
+        for name, fetcher_class in FORMAT_FIXTURES.items():
+            for lazy in (False, True):
+                with self.subTest(fixture=name, lazy=lazy):
+                    holdings = parse_fixture(fetcher_class, name, lazy)
+                    self.assertEqual([serialize_holding(holding) for holding in holdings], load_expected_holdings(name))
+
+    def test_tables_match_decoded_holdings(self):
+        for name, fetcher_class in FORMAT_FIXTURES.items():
+            with self.subTest(fixture=name):
+                with open(os.path.join(FIXTURES_PATH, name), 'rb') as holdings_file:
+                    table = fetcher_class().read_table_from_file(holdings_file, 'TEST')
+                expected_table = HoldingsTable.from_holdings(parse_fixture(fetcher_class, name), 'TEST')
+                self.assertEqual(len(table), len(expected_table))
+                self.assertEqual(list(table['asset_class']), list(expected_table['asset_class']))
+                for column, values in expected_table.numeric_columns.items():
+                    self.assertEqual([None if math.isnan(value) else value for value in table[column]],
+                        [None if math.isnan(value) else value for value in values], column)
+                for column, values in expected_table.string_columns.items():
+                    self.assertEqual([table[column][index] for index in range(len(table))],
+                        [values[index] for index in range(len(values))], column)
+
+    def test_etfmg_identifiers_and_tickers(self):
+        holdings = {holding.name: holding for holding in parse_fixture(Etfmg, 'etfmg_stock.csv')}
+        # A SEDOL in the CUSIP column
+        self.assertEqual((holdings['CURALEAF HOLDINGS INC'].identifier_cusip,
+            holdings['CURALEAF HOLDINGS INC'].identifier_sedol), (None, 'BKP7ZH7'))
+        self.assertEqual(holdings['CURALEAF HOLDINGS INC'].ticker, 'CURA')
+        # A swap without a valid ticker or any identifier
+        self.assertEqual((holdings['AMPLIFY US CANNABIS SWAP'].ticker,
+            holdings['AMPLIFY US CANNABIS SWAP'].identifier_cusip), (None, None))
+
+    def test_missing_column_raises_format_exception(self):
+        holdings_csv = (b'Fund Ticker,Security Identifier,Holding Ticker,Shares/Par Value,MarketValue,Name\r\n'
+            b'QQQ,037833100,AAPL    ,"173,811,294","$39,318,860,418.74",Apple Inc\r\n')
+        for lazy in (False, True):
+            with self.subTest(lazy=lazy):
+                fetcher = Invesco()
+                fetcher.lazy = lazy
+                with self.assertRaisesRegex(HoldingsFormatException, 'Weight'):
+                    fetcher.parse_holdings_file(BytesIO(holdings_csv))
+
+    def test_future_without_expiration_suffix(self):
+        self.assertEqual(parse_future_expiration_date_from_description('S&P500 EMINI MAR 21'), datetime(2021, 3, 1))
+        self.assertIsNone(parse_future_expiration_date_from_description('S&P500 EMINI'))
+        self.assertIsNone(parse_future_expiration_date_from_description('GOLD'))
+
+    def test_lazy_future_without_expiration_suffix(self):
+        row = ['ESZ', 'S&P500 EMINI', 'Financials', 'Futures', 'USD', {'raw': 2.0}, {'raw': 50.0}, {'raw': 3},
+            '-', '-', '-', 'x', 'x', 'x', 'x', 'x', 'x', 'x']
+        compiled_schema = ISHARES_STOCK_SCHEMA.compile()
+        self.assertIsNone(compiled_schema.view(row).contract_expiry_date)
+        self.assertIsNone(compiled_schema.decode(row).contract_expiry_date)
+
+if __name__ == '__main__':
+    unittest.main()
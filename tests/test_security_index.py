@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from openholdings.holdingsfetcher import FetchResult
+from openholdings.models import Equity
+from openholdings.utils.security_index import SecurityIndex, Posting
+
+class TestSecurityIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SecurityIndex()
+        self.index.update('voo', [
+            Equity('Apple Inc.', ticker='AAPL', identifier_isin='US0378331005', percent_weighting=0.0693,
+                market_value=25038930848.95),
+            Equity('Shopify Inc.', ticker='SHOP', identifier_isin='CA82509L1076', percent_weighting=0.0051),
+        ])
+        self.index.update('QQQ', [
+            Equity('Apple Inc.', ticker='AAPL UW', identifier_cusip='037833100', percent_weighting=0.0881,
+                market_value=17702046373.2),
+        ])
+
+    def test_looks_up_by_any_identifier(self):
+        expected = [Posting('QQQ', 0.0881, 17702046373.2), Posting('VOO', 0.0693, 25038930848.95)]
+        for identifier in ('AAPL', 'aapl', '037833100', 'US0378331005'):
+            with self.subTest(identifier=identifier):
+                self.assertEqual(self.index.lookup(identifier), expected)
+
+    def test_derives_cusip_of_us_and_canadian_isins(self):
+        self.assertEqual([posting.fund for posting in self.index.lookup('82509L107')], ['VOO'])
+        self.assertEqual([posting.fund for posting in self.index.lookup('82509L107', kind='cusip')], ['VOO'])
+        # Other countries' ISINs aren't formed from a CUSIP
+        self.index.update('EFA', [Equity('Nestle SA', identifier_isin='CH0038863350', percent_weighting=0.02)])
+        self.assertEqual(self.index.lookup('003886335', kind='cusip'), [])
+
+    def test_combines_holdings_of_same_security(self):
+        self.index.update('VTI', [
+            Equity('Alphabet Inc. Class A', ticker='GOOGL', percent_weighting=0.01, market_value=100.0),
+            Equity('Alphabet Inc. Class A', ticker='GOOGL', percent_weighting=0.02, market_value=None),
+        ])
+        self.assertEqual(self.index.lookup('GOOGL'), [Posting('VTI', 0.03, 100.0)])
+
+    def test_reindexing_replaces_fund_postings(self):
+        self.index.update('QQQ', [Equity('Microsoft Corp.', ticker='MSFT', percent_weighting=0.0974)])
+
+        self.assertEqual([posting.fund for posting in self.index.lookup('AAPL')], ['VOO'])
+        self.assertEqual([posting.fund for posting in self.index.lookup('037833100')], ['VOO'])
+        self.assertEqual([posting.fund for posting in self.index.lookup('MSFT')], ['QQQ'])
+        self.assertTrue(self.index.remove('qqq'))
+        self.assertFalse(self.index.remove('QQQ'))
+        self.assertEqual(self.index.lookup('MSFT'), [])
+        self.assertEqual(self.index.funds(), ['VOO'])
+
+    def test_skips_failed_fetch_results(self):
+        indexed_count = self.index.update_from_results([
+            FetchResult('IVV', [Equity('Apple Inc.', ticker='AAPL', percent_weighting=0.07)], None),
+            FetchResult('XYZ', None, ValueError('unavailable')),
+        ])
+        self.assertEqual(indexed_count, 1)
+        self.assertIn('ivv', self.index)
+        self.assertNotIn('XYZ', self.index)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.pickle')
+            self.index.save(path)
+            loaded = SecurityIndex.load(path)
+            with open(path, 'wb') as index_file:
+                index_file.write(b'\x80\x04N.')
+            with self.assertRaises(ValueError):
+                SecurityIndex.load(path)
+
+        self.assertEqual(loaded.lookup('82509L107'), self.index.lookup('82509L107'))
+        self.assertEqual(sorted(loaded.funds()), ['QQQ', 'VOO'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from openholdings.models import Equity, Cash
+from openholdings.utils.security_master import SecurityMaster
+
+class TestSecurityMaster(unittest.TestCase):
+
+    def setUp(self):
+        self.master = SecurityMaster()
+
+    def test_derives_isin_of_cusip(self):
+        isin_id = self.master.get_id(Equity('Apple Inc.', identifier_isin='US0378331005'))
+        cusip_id = self.master.get_id(Equity('Apple Inc.', identifier_cusip='037833100'))
+
+        self.assertEqual(cusip_id, isin_id)
+        self.assertEqual(self.master.lookup('037833100'), isin_id)
+        self.assertIn(('cusip', '037833100'), self.master.get_keys(isin_id))
+
+    def test_merges_ids_found_to_be_same_security(self):
+        ticker_id = self.master.get_id(Equity('Apple Inc.', ticker='AAPL UW'))
+        isin_id = self.master.get_id(Equity('Apple Inc.', identifier_isin='US0378331005'))
+        self.assertNotEqual(ticker_id, isin_id)
+        self.assertEqual(self.master.merge_count, 0)
+
+        # This holding ties the ISIN to the ticker, so the ticker's ID is merged into the ISIN's
+        both_id = self.master.get_id(Equity('Apple Inc.', ticker='AAPL', identifier_isin='US0378331005'))
+        self.assertEqual(both_id, isin_id)
+        self.assertEqual(self.master.merge_count, 1)
+        self.assertEqual(self.master.canonical_id(ticker_id), isin_id)
+        self.assertEqual(self.master.canonical_ids(), [isin_id, isin_id])
+        self.assertEqual(self.master.lookup('AAPL'), isin_id)
+        self.assertEqual(self.master.get_identifiers(ticker_id), {'isin': 'US0378331005', 'ticker': 'AAPL'})
+        self.assertEqual(len(self.master), 2)
+
+    def test_keeps_share_classes_apart(self):
+        class_a_id = self.master.get_id(Equity('Alphabet Inc.', ticker='GOOGL', identifier_isin='US02079K3059'))
+        class_c_id = self.master.get_id(Equity('Alphabet Inc.', ticker='GOOG', identifier_isin='US02079K1079'))
+        # A holding whose ticker and ISIN belong to different securities is neither of them, and doesn't merge them
+        mixed_id = self.master.get_id(Equity('Alphabet Inc.', ticker='GOOGL', identifier_isin='US02079K1079'))
+
+        self.assertNotEqual(class_a_id, class_c_id)
+        self.assertNotIn(mixed_id, (class_a_id, class_c_id))
+        self.assertEqual(self.master.merge_count, 0)
+        self.assertEqual(self.master.lookup('GOOGL'), class_a_id)
+        self.assertEqual(self.master.lookup('US02079K1079'), class_c_id)
+        # Names only identify holdings without any other identifier
+        self.assertIsNone(self.master.lookup('Alphabet Inc.', kind='name'))
+        name_id = self.master.get_id(Equity('Alphabet Inc.'))
+        self.assertNotIn(name_id, (class_a_id, class_c_id))
+        self.assertEqual(self.master.lookup('ALPHABET  INC.', kind='name'), name_id)
+
+    def test_identifies_cash_by_currency(self):
+        usd_ids = self.master.update([Cash('USD Cash', currency='USD'), Cash('US Dollar', currency='USD')])
+        euro_id = self.master.get_id(Cash('Euro', currency='EUR'))
+        self.assertEqual(usd_ids[0], usd_ids[1])
+        self.assertNotEqual(euro_id, usd_ids[0])
+
+    def test_save_and_load(self):
+        ticker_id = self.master.get_id(Equity('Apple Inc.', ticker='AAPL'))
+        self.master.get_id(Equity('Apple Inc.', identifier_isin='US0378331005'))
+        self.master.get_id(Equity('Apple Inc.', ticker='AAPL', identifier_isin='US0378331005'))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'master.pickle')
+            self.master.save(path)
+            loaded = SecurityMaster.load(path)
+
+        self.assertEqual(loaded.merge_count, 1)
+        self.assertEqual(loaded.canonical_id(ticker_id), self.master.canonical_id(ticker_id))
+        self.assertEqual(loaded.lookup('037833100'), self.master.lookup('037833100'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+from openholdings.models import Equity, Bond, Cash
+from openholdings.utils.snapshot_archive import SnapshotArchive
+
+def create_holdings(apple_weight=0.0693):
+    return [
+        Equity('Apple Inc.', ticker='AAPL', identifier_cusip='037833100', identifier_isin='US0378331005',
+            percent_weighting=apple_weight, market_value=25038930848.95, num_shares=168420151),
+        Equity('Microsoft Corp.', ticker='MSFT', identifier_cusip='594918104', identifier_isin='US5949181045',
+            percent_weighting=0.0587, market_value=21224305917.12, num_shares=84326212),
+        Bond('United States Treasury Note 2.25% 15-Feb-2027', identifier_cusip='912828V98',
+            coupon_rate=2.25, percent_weighting=0.0102, market_value=3690000000.0),
+        Cash('USD Cash', currency='USD', percent_weighting=0.0011, market_value=397000000.0),
+    ]
+
+class SnapshotArchiveTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+        self.path = self.archive_dir.name
+
+class TestSnapshotArchive(SnapshotArchiveTestCase):
+
+    def test_round_trips_holdings(self):
+        archive = SnapshotArchive(self.path)
+        archive.append('vanguard', 'voo', create_holdings(), as_of=date(2024, 3, 1))
+
+        snapshot = archive.get('vanguard', 'VOO', date(2024, 3, 1))
+        self.assertEqual((snapshot.provider, snapshot.ticker, snapshot.as_of), ('vanguard', 'VOO', date(2024, 3, 1)))
+        self.assertEqual(len(snapshot), 4)
+        holdings = snapshot.to_holdings()
+        self.assertEqual([type(holding) for holding in holdings], [Equity, Equity, Bond, Cash])
+        self.assertEqual([holding.name for holding in holdings], [holding.name for holding in create_holdings()])
+        self.assertEqual(holdings[0].ticker, 'AAPL')
+        self.assertEqual(holdings[0].identifier_isin, 'US0378331005')
+        self.assertEqual(holdings[0].percent_weighting, 0.0693)
+        self.assertEqual(holdings[3].currency, 'USD')
+        self.assertIsNone(archive.get('vanguard', 'VOO', date(2024, 3, 2)))
+        self.assertIsNone(archive.get('vanguard', 'VTI'))
+
+    def test_unchanged_columns_are_stored_once(self):
+        archive = SnapshotArchive(self.path)
+        archive.append('vanguard', 'VOO', create_holdings(), as_of=date(2024, 3, 1))
+        first_size = os.path.getsize(archive.data_path)
+        archive.append('vanguard', 'VOO', create_holdings(apple_weight=0.0701), as_of=date(2024, 3, 4))
+        second_size = os.path.getsize(archive.data_path)
+
+        # Only the directory and the changed weighting column are written for the second day
+        self.assertLess(second_size - first_size, first_size / 2)
+        old, new = archive.get('vanguard', 'VOO', date(2024, 3, 1)), archive.get('vanguard', 'VOO', date(2024, 3, 4))
+        self.assertEqual(new.string_columns['name'].values, old.string_columns['name'].values)
+        self.assertEqual(new['percent_weighting'][0], 0.0701)
+        self.assertEqual(old['percent_weighting'][0], 0.0693)
+
+    def test_latest_snapshot_is_by_date_not_append_order(self):
+        archive = SnapshotArchive(self.path)
+        for as_of in (date(2024, 3, 4), date(2024, 3, 1), date(2024, 3, 5), date(2024, 3, 4)):
+            archive.append('vanguard', 'VOO', create_holdings(), as_of=as_of)
+
+        self.assertEqual(archive.as_of_dates('vanguard', 'voo'), [date(2024, 3, 1), date(2024, 3, 4), date(2024, 3, 5)])
+        self.assertEqual(archive.get('vanguard', 'VOO').as_of, date(2024, 3, 5))
+        self.assertEqual(len(archive), 3)
+
+    def test_datetimes_are_archived_as_dates(self):
+        archive = SnapshotArchive(self.path)
+        archive.append('vanguard', 'VOO', create_holdings(), as_of=datetime(2024, 3, 1, 16, 30))
+        archive.append('vanguard', 'VOO', create_holdings(), as_of=date(2024, 3, 4))
+
+        for reopened in (archive, SnapshotArchive(self.path)):
+            self.assertEqual(reopened.as_of_dates('vanguard', 'VOO'), [date(2024, 3, 1), date(2024, 3, 4)])
+            self.assertIn(('vanguard', 'VOO', datetime(2024, 3, 1, 9, 0)), reopened)
+            self.assertEqual(reopened.get('vanguard', 'VOO', datetime(2024, 3, 1)).as_of, date(2024, 3, 1))
+
+    def test_rejects_as_of_that_isnt_a_date(self):
+        archive = SnapshotArchive(self.path)
+        with self.assertRaises(TypeError):
+            archive.append('vanguard', 'VOO', create_holdings(), as_of='2024-03-01')
+        with self.assertRaises(TypeError):
+            archive.get('vanguard', 'VOO', '2024-03-01')
+        self.assertEqual(archive.keys(), [])
+
+    def test_ignores_partially_written_index_line(self):
+        archive = SnapshotArchive(self.path)
+        archive.append('vanguard', 'VOO', create_holdings(), as_of=date(2024, 3, 1))
+        with open(archive.index_path, 'ab') as index_file:
+            index_file.write(b'{"provider": "vanguard", "ticker": "VOO", "as_of": "2024-03-0')
+
+        reopened = SnapshotArchive(self.path)
+        self.assertEqual(reopened.keys(), [('vanguard', 'VOO', date(2024, 3, 1))])
+        reopened.append('vanguard', 'VOO', create_holdings(), as_of=date(2024, 3, 4))
+        self.assertEqual(SnapshotArchive(self.path).as_of_dates('vanguard', 'VOO'),
+            [date(2024, 3, 1), date(2024, 3, 4)])
+
+    def test_archives_shared_by_several_writers(self):
+        first_writer = SnapshotArchive(self.path)
+        second_writer = SnapshotArchive(self.path)
+        first_writer.append('vanguard', 'VOO', create_holdings(), as_of=date(2024, 3, 1))
+        first_size = os.path.getsize(first_writer.data_path)
+        second_writer.append('vanguard', 'VOO', create_holdings(apple_weight=0.0701), as_of=date(2024, 3, 4))
+
+        # The second writer read the first's snapshot before appending, so its segment shares unchanged columns
+        self.assertLess(os.path.getsize(first_writer.data_path) - first_size, first_size / 2)
+        self.assertEqual(second_writer.as_of_dates('vanguard', 'VOO'), [date(2024, 3, 1), date(2024, 3, 4)])
+        self.assertEqual(first_writer.as_of_dates('vanguard', 'VOO'), [date(2024, 3, 1)])
+        first_writer.refresh()
+        self.assertEqual(first_writer.as_of_dates('vanguard', 'VOO'), [date(2024, 3, 1), date(2024, 3, 4)])
+        self.assertEqual(first_writer.get('vanguard', 'VOO')['percent_weighting'][0], 0.0701)
+
+    def test_diffs_snapshots(self):
+        archive = SnapshotArchive(self.path)
+        archive.append('vanguard', 'VOO', create_holdings(), as_of=date(2024, 3, 1))
+        archive.append('vanguard', 'VOO', create_holdings(apple_weight=0.0701), as_of=date(2024, 3, 4))
+
+        changes = archive.diff('vanguard', 'VOO', date(2024, 3, 1))
+        self.assertEqual([change.name for change in changes], ['Apple Inc.'])
+        with self.assertRaises(KeyError):
+            archive.diff('vanguard', 'VOO', date(2024, 2, 1))
+
+if __name__ == '__main__':
+    unittest.main()
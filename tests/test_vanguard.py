@@ -0,0 +1,78 @@
+import json
+import os
+import unittest
+import requests
+from openholdings.exceptions import HoldingsFormatException
+from openholdings.fetchers.vanguard import Vanguard
+from openholdings.models import Equity, Cash
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_PATH, name), encoding='utf-8') as fixture_file:
+        return json.load(fixture_file)
+
+class TestParseApiHoldingsPage(unittest.TestCase):
+
+    def test_parses_stock_page(self):
+        holdings, total_count = Vanguard().parse_api_holdings_page(load_fixture('vanguard_stock_page.json'), Equity)
+
+        self.assertEqual(total_count, 4)
+        self.assertEqual([holding.name for holding in holdings],
+            ['Apple Inc.', 'Microsoft Corp.', 'Berkshire Hathaway Inc. Class B', 'Alphabet Inc. Class A'])
+        apple = holdings[0]
+        self.assertIsInstance(apple, Equity)
+        self.assertEqual(apple.ticker, 'AAPL')
+        self.assertEqual(apple.percent_weighting, 0.0693)
+        self.assertEqual(apple.num_shares, 168420151)
+        self.assertEqual(apple.market_value, 25038930848.95)
+        self.assertEqual((apple.identifier_cusip, apple.identifier_isin, apple.identifier_sedol),
+            ('037833100', 'US0378331005', '2046251'))
+        # Numbers may be given as JSON numbers rather than strings
+        self.assertEqual(holdings[1].percent_weighting, 0.0587)
+        self.assertEqual(holdings[1].num_shares, 84326212)
+        # Placeholder identifiers are dropped
+        self.assertEqual((holdings[2].identifier_cusip, holdings[2].identifier_isin, holdings[2].identifier_sedol),
+            (None, None, None))
+
+    def test_parses_empty_tab(self):
+        self.assertEqual(Vanguard().parse_api_holdings_page({'size': 0, 'fund': {}}, Cash), ([], 0))
+
+    def test_rejects_unexpected_shapes(self):
+        for holdings_page in ([], {'fund': {'entity': [{'ticker': 'AAPL'}]}},
+                {'fund': {'entity': [{'longName': 'Apple Inc.', 'percentWeight': 'n/a'}]}}, {'fund': 'none'}):
+            with self.assertRaises(HoldingsFormatException):
+                Vanguard().parse_api_holdings_page(holdings_page, Equity)
+
+class TestFetchFallback(unittest.TestCase):
+
+    def test_falls_back_to_browser_on_format_error(self):
+        fetcher = Vanguard()
+        fetcher.fetch_from_api = lambda ticker: raise_error(HoldingsFormatException('changed'))
+        fetcher.fetch_with_browser = lambda ticker: [Equity('Apple Inc.', ticker='AAPL')]
+
+        self.assertEqual([holding.ticker for holding in fetcher.fetch('VOO')], ['AAPL'])
+
+    def test_chains_api_error_to_browser_error(self):
+        fetcher = Vanguard()
+        api_error = requests.ConnectionError('unreachable')
+        fetcher.fetch_from_api = lambda ticker: raise_error(api_error)
+        fetcher.fetch_with_browser = lambda ticker: raise_error(KeyError('CHROME_DRIVER_PATH'))
+
+        with self.assertRaises(KeyError) as context:
+            fetcher.fetch('VOO')
+        self.assertIs(context.exception.__cause__, api_error)
+
+    def test_does_not_hide_programming_errors(self):
+        fetcher = Vanguard()
+        fetcher.fetch_from_api = lambda ticker: raise_error(AttributeError('bug'))
+        fetcher.fetch_with_browser = lambda ticker: self.fail('The browser fallback should not be used')
+
+        with self.assertRaises(AttributeError):
+            fetcher.fetch('VOO')
+
+def raise_error(error):
+    raise error
+
+if __name__ == '__main__':
+    unittest.main()